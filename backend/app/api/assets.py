@@ -1,23 +1,54 @@
 """
 资产接口
 """
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
+from starlette.datastructures import UploadFile as StarletteUploadFile
+from starlette.formparsers import MultiPartParser, MultiPartException
+from starlette.requests import ClientDisconnect
+from app.core.config import settings
+from app.core.images import THUMBNAIL_FORMATS
+from app.core.media import media_file_response, RangeFileResponse, RangeNotSatisfiable, parse_range
+from app.core.media_proxy import get_proxy_client
+from app.core.auth import Principal
+from app.core.security import sign_media_url
 from app.db.database import get_db
 from app.db.models import User
 from app.schemas.assets import (
     VideoAssetResponse, DownloadUrlResponse, MediaUploadResponse,
-    ProjectResponse, CreateProjectRequest, UpdateProjectRequest
+    ProjectResponse, CreateProjectRequest, UpdateProjectRequest,
+    CreateUploadSessionRequest, UploadSessionResponse
 )
 from app.schemas.common import ResponseModel
 from app.services.asset_service import AssetService
-from app.api.dependencies import get_current_user
-from typing import Optional
-import uuid
+from app.services.thumbnail_service import ThumbnailService, thumbnail_urls
+from app.services.upload_service import UploadService, UploadTooLarge, UploadOffsetMismatch
+from app.services.video_cache_service import (
+    VideoCacheService, STATIC_DIR, local_path_from_url, local_video_path, record_access
+)
+from app.workers.video_downloader import video_downloader, stream_fills
+from app.api.dependencies import get_current_user, get_principal
+from typing import AsyncIterator, Optional
+import time
 import os
 
 router = APIRouter(prefix="/api/v1/assets", tags=["资产"])
 
+# 代理播放时透传的源站响应头
+PROXY_RESPONSE_HEADERS = (
+    "content-length", "content-range", "accept-ranges", "content-encoding", "etag", "last-modified"
+)
+
+
+def _cache_etag(video) -> Optional[str]:
+    """本地缓存文件的 ETag（内容 SHA-256，多实例一致）"""
+    return f'"{video.cache_sha256}"' if video.cache_sha256 else None
+
+
+def _signed_cache_headers(exp: int) -> dict:
+    """签名地址的响应可以按 URL 缓存到签名过期"""
+    return {"Cache-Control": f"public, max-age={max(exp - int(time.time()), 0)}"}
+
 
 # ==================== 视频资产 ====================
 
@@ -97,12 +128,20 @@ async def get_video(
     **需要登录**：是
     
     **权限**：只能查看自己的视频
+    
+    **签名地址**：返回 stream_url / download_url（带 uid、exp、sig 参数），
+    播放器用它请求时只做签名校验，不再解析 JWT 和查询用户；过期后重新获取详情即可
     """
     service = AssetService(db)
     
     try:
         video = service.get_video(video_id, current_user.user_id)
         video_data = VideoAssetResponse.model_validate(video)
+        expires_at, signature = sign_media_url(video.video_id, current_user.user_id)
+        query = f"uid={current_user.user_id}&exp={expires_at}&sig={signature}"
+        video_data.stream_url = f"{router.prefix}/videos/{video.video_id}/stream?{query}"
+        video_data.download_url = f"{router.prefix}/videos/{video.video_id}/download?{query}"
+        video_data.url_expires_at = expires_at
         
         return ResponseModel(code=200, message="success", data=video_data)
         
@@ -114,84 +153,62 @@ async def get_video(
 async def stream_video(
     video_id: int,
     request: Request,
-    token: Optional[str] = Query(None), # 允许 token 通过 Query 传递
+    # 凭证由 AuthMiddleware 解析，以下参数只用于接口文档
+    token: Optional[str] = Query(None, description="兼容旧客户端通过 Query 传递 JWT，新客户端使用签名地址"),
+    uid: Optional[int] = Query(None, description="签名地址：用户ID"),
+    exp: Optional[int] = Query(None, description="签名地址：过期时间戳"),
+    sig: Optional[str] = Query(None, description="签名地址：签名"),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db)
 ):
     """
     在线播放视频（通过后端代理或本地流）
     
-    **需要登录**：是（支持 Header Auth 或 Query Param Token）
+    **需要登录**：是（签名地址，或 Header Auth / Query Param Token）
+    
+    **签名地址**：使用视频详情接口返回的 stream_url 时只校验签名；视频已缓存到本地时不访问数据库
     
     **功能**：
-    - 如果视频已缓存到本地，直接返回本地文件流
-    - 如果未缓存，通过后端代理流式传输，解决CORS和网络不稳定问题
+    - 支持 Range 请求（206），拖动进度条只传输需要的部分
+    - 如果视频已缓存到本地，直接返回本地文件流（缓存文件校验完成后才会启用，不会读到未写完的文件），支持 If-Range 校验；
+      MEDIA_DELIVERY_MODE=accel 时返回 X-Accel-Redirect 由 nginx 发送
+    - 如果未缓存，边回源写入本地缓存边播放；同一视频同时播放时共用一条回源连接（拖动到尚未下载的位置时等下载写到该处），之后的播放直接走本地文件
+    - 无法写缓存时（其他进程正在下载、缓存已放弃、源站未返回文件大小时的 Range 请求）通过后端代理流式传输并透传源站的 206 响应，解决CORS和网络不稳定问题
+    - 本地文件丢失时回源播放，并重新登记缓存下载
     """
-    # 手动鉴权逻辑
-    # 1. 优先尝试从 Depends(get_current_user) 获取（但这里为了避开 Depends 抛出 401，我们手动处理）
-    # 2. 尝试从 Query Param 获取
-    from app.core.security import get_current_user_from_token
-    
-    user = None
-    auth_header = request.headers.get("Authorization")
-    if auth_header and auth_header.startswith("Bearer "):
-        try:
-            user = await get_current_user_from_token(auth_header.split(" ")[1], db)
-        except:
-            pass
-            
-    if not user and token:
-        try:
-            user = await get_current_user_from_token(token, db)
-        except:
-            pass
-            
-    if not user:
-        raise HTTPException(status_code=401, detail="未认证")
+    user_id = principal.user_id
+    
+    # 签名地址 + 已缓存：直接发送本地文件，不访问数据库（文件校验完成后才会落到正式路径）
+    if principal.source == "signed":
+        file_path = local_video_path(video_id)
+        if os.path.exists(file_path):
+            record_access(video_id, hit=True)
+            return media_file_response(
+                file_path, STATIC_DIR, media_type="video/mp4", headers=_signed_cache_headers(exp)
+            )
 
     service = AssetService(db)
-    current_user = user # 兼容后续代码
     
     try:
         print(f"🎯 Stream request video_id={video_id}")
         print(f"   - Origin: {request.headers.get('origin')}")
         print(f"   - Referer: {request.headers.get('referer')}")
         print(f"   - Range: {request.headers.get('range')}")
-        print(f"   - Token(query): {'yes' if token else 'no'} | Token(header): {'yes' if auth_header else 'no'}")
+        print(f"   - Auth: {principal.source}")
         
         # 获取视频详情
-        video = service.get_video(video_id, current_user.user_id)
+        video = service.get_video(video_id, user_id)
         
-        # 1. 检查是否是本地路径（以/static/开头）
-        if video.watermarked_play_url and video.watermarked_play_url.startswith("/static/"):
-            # 构造本地文件绝对路径
-            import os
-            
-            backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-            rel_path = video.watermarked_play_url.replace("/static/", "", 1)
-            file_path = os.path.join(backend_dir, "static", rel_path)
-            
+        # 1. 检查是否已缓存到本地（以/static/开头，文件完整落盘后才会切换到本地路径）
+        file_path = local_path_from_url(video.watermarked_play_url)
+        if file_path:
             if os.path.exists(file_path):
-                from fastapi.responses import FileResponse
-                return FileResponse(file_path, media_type="video/mp4")
-            else:
-                print(f"⚠️ 本地文件不存在: {file_path}，尝试从供应商重新获取URL")
-                # 尝试从供应商重新获取URL
-                if video.vendor_video_id:
-                    try:
-                        from app.services.task_service import TaskService
-                        # 注意：这里需要重新初始化 service，或者重构代码以共享 service 实例
-                        # 简单起见，我们假设 AssetService 无法直接调用 TaskService，
-                        # 但我们可以直接使用 Adapter
-                        from app.services.sora_api import SoraAdapter
-                        adapter = SoraAdapter()
-                        detail = await adapter.get_video_detail(video.vendor_video_id)
-                        parsed = adapter.parse_video_response(detail)
-                        if parsed.get("watermarked_play_url"):
-                            video.watermarked_play_url = parsed.get("watermarked_play_url")
-                            # 可选：更新回数据库？暂时不更新，避免反复覆写
-                            print(f"✅ 已恢复远程URL: {video.watermarked_play_url}")
-                    except Exception as e:
-                        print(f"❌ 恢复远程URL失败: {e}")
+                record_access(video.video_id, hit=True)
+                return media_file_response(file_path, STATIC_DIR, media_type="video/mp4", etag=_cache_etag(video))
+            
+            print(f"⚠️ 本地文件不存在: {file_path}，回源播放并重新缓存")
+            if VideoCacheService(db).mark_missing(video):
+                video_downloader.wake()
         
         # 2. 如果是远程URL，使用后端代理流式传输 (Proxy Stream)
         # 这样解决CORS和ORB拦截问题
@@ -201,59 +218,95 @@ async def stream_video(
             print(f"❌ 无法播放: URL无效或文件丢失 - {video_url}")
             raise ValueError("视频文件不可用")
             
-        import httpx
         from fastapi.responses import StreamingResponse
+        record_access(video.video_id, hit=False)
+        range_header = request.headers.get("range")
+        
+        # 挂到缓存下载上，已写入缓存的区间直接从 .part 文件读取
+        fill = None
+        if not request.headers.get("if-range"):
+            fill = await video_downloader.attach(video.video_id)
+        if fill is not None and (fill.total is not None or not range_header):
+            status_code = 200
+            start, end = 0, None
+            response_headers = {}
+            if fill.total is not None:
+                try:
+                    byte_range = parse_range(range_header, fill.total)
+                except RangeNotSatisfiable:
+                    return Response(status_code=416, headers={"Content-Range": f"bytes */{fill.total}"})
+                start, end = byte_range or (0, fill.total - 1)
+                response_headers["Accept-Ranges"] = "bytes"
+                response_headers["Content-Length"] = str(end - start + 1)
+                if byte_range is not None:
+                    status_code = 206
+                    response_headers["Content-Range"] = f"bytes {start}-{end}/{fill.total}"
+            
+            # 拖动到尚未下载到的位置时也跟读：等下载写到该区间再发送，不为拖动单独回源
+            print(f"📼 Streaming while caching: video={video.video_id} range={range_header} written={fill.written}")
+            
+            async def iter_fill():
+                try:
+                    async for chunk in fill.iter_bytes(start, end):
+                        yield chunk
+                except Exception as e:
+                    # 已发送 Content-Length：抛出异常中断连接，客户端才能发现内容不完整并重试
+                    print(f"❌ Stream fill exception: {e}")
+                    raise
+            
+            return StreamingResponse(
+                iter_fill(),
+                status_code=status_code,
+                media_type=fill.content_type,
+                headers=response_headers
+            )
+        
         print(f"🔀 Proxying stream from remote: {video_url}")
+        stream_fills.inc(result="proxied")
         
-        # 准备 Headers (转发 Range)
+        # 准备 Headers (转发 Range / If-Range，源站的 206 原样返回)
         headers = {}
-        range_header = request.headers.get("range")
-        if range_header:
-            headers["Range"] = range_header
+        for name in ("range", "if-range"):
+            if name in request.headers:
+                headers[name] = request.headers[name]
         
-        client = httpx.AsyncClient(timeout=120.0, verify=False, follow_redirects=True)
+        client = get_proxy_client()
         req = client.build_request("GET", video_url, headers=headers)
         
         try:
             r = await client.send(req, stream=True)
-            # 不使用 raise_for_status，因为 206 也是正常响应
             print(f"   - Remote response: status={r.status_code}, type={r.headers.get('content-type')}, length={r.headers.get('content-length')}")
+            if r.status_code >= 400 and r.status_code != 416:
+                await r.aclose()
+                raise ValueError(f"源站返回 {r.status_code}")
             
             async def iter_file():
                 try:
-                    async for chunk in r.aiter_bytes():
+                    # 原始字节透传，与转发的 Content-Length / Content-Encoding 保持一致
+                    async for chunk in r.aiter_raw():
                         yield chunk
                 except Exception as e:
+                    # 已转发 Content-Length：中断连接，不能让截断的响应正常结束
                     print(f"❌ Stream proxy exception: {e}")
+                    raise
                 finally:
                     await r.aclose()
-                    await client.aclose()
-            
-            # 转发响应头
-            response_headers = {}
-            # 注意：不转发 Content-Length，因为流式传输可能导致长度不一致，让浏览器自动处理 Chunked
-            # if "content-length" in r.headers:
-            #     response_headers["Content-Length"] = r.headers["content-length"]
-            
-            # 重要：不转发 Content-Range 和 Accept-Ranges，因为我们的代理可能不支持 Range 请求的完美透传
-            # 这会导致浏览器认为支持 Range，但实际流式传输时断开，从而引发 ERR_ABORTED
-            # if "content-range" in r.headers:
-            #    response_headers["Content-Range"] = r.headers["content-range"]
-            # if "accept-ranges" in r.headers:
-            #    response_headers["Accept-Ranges"] = r.headers["accept-ranges"]
             
-            if "content-type" in r.headers:
-                response_headers["Content-Type"] = r.headers["content-type"]
+            # 转发响应头（206 时包含 Content-Range，播放器据此拖动进度条）
+            response_headers = {
+                name: r.headers[name]
+                for name in PROXY_RESPONSE_HEADERS
+                if name in r.headers
+            }
             
             return StreamingResponse(
                 iter_file(),
-                status_code=200, # 强制返回 200，不返回 206 Partial Content，避免浏览器期待 Range 支持
+                status_code=r.status_code,
                 media_type=r.headers.get("content-type", "video/mp4"),
                 headers=response_headers
             )
             
         except Exception as e:
-            await client.aclose()
             print(f"❌ Stream setup exception: {e}")
             # Fallback: 直接重定向到远程URL，绕过代理问题
             try:
@@ -274,57 +327,65 @@ async def stream_video(
 @router.get("/videos/{video_id}/download", response_model=None)
 async def download_video(
     video_id: int,
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    # 凭证由 AuthMiddleware 解析，以下参数只用于接口文档
+    token: Optional[str] = Query(None, description="兼容旧客户端通过 Query 传递 JWT，新客户端使用签名地址"),
+    uid: Optional[int] = Query(None, description="签名地址：用户ID"),
+    exp: Optional[int] = Query(None, description="签名地址：过期时间戳"),
+    sig: Optional[str] = Query(None, description="签名地址：签名"),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db)
 ):
     """
     下载视频（通过后端代理）
     
-    **需要登录**：是
+    **需要登录**：是（签名地址，或 Header Auth）
     
     **功能**：
     - 代理下载供应商视频，解决CORS和强制下载问题
     - 强制浏览器弹出下载框
     """
+    user_id = principal.user_id
+    filename = f"skyriff_video_{video_id}.mp4"
+    
+    # 签名地址 + 已缓存：不访问数据库
+    if principal.source == "signed":
+        file_path = local_video_path(video_id)
+        if os.path.exists(file_path):
+            record_access(video_id, hit=True)
+            return media_file_response(
+                file_path, STATIC_DIR, media_type="video/mp4", filename=filename, headers=_signed_cache_headers(exp)
+            )
+    
     service = AssetService(db)
     
     try:
         # 获取视频详情（鉴权）
-        video = service.get_video(video_id, current_user.user_id)
+        video = service.get_video(video_id, user_id)
         
         # 1. 优先使用本地文件（如果存在）
-        if video.watermarked_play_url and video.watermarked_play_url.startswith("/static/"):
-            import os
-            backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-            rel_path = video.watermarked_play_url.replace("/static/", "", 1)
-            file_path = os.path.join(backend_dir, "static", rel_path)
-            
+        file_path = local_path_from_url(video.watermarked_play_url)
+        if file_path:
             if os.path.exists(file_path):
-                from fastapi.responses import FileResponse
-                return FileResponse(file_path, media_type="video/mp4", filename=f"skyriff_video_{video_id}.mp4")
-            else:
-                 # 尝试恢复
-                 if video.vendor_video_id:
-                     try:
-                         from app.services.sora_api import SoraAdapter
-                         adapter = SoraAdapter()
-                         detail = await adapter.get_video_detail(video.vendor_video_id)
-                         parsed = adapter.parse_video_response(detail)
-                         if parsed.get("watermarked_play_url"):
-                             video.watermarked_play_url = parsed.get("watermarked_play_url")
-                     except:
-                         pass
+                record_access(video.video_id, hit=True)
+                return media_file_response(
+                    file_path, STATIC_DIR, media_type="video/mp4", filename=filename, etag=_cache_etag(video)
+                )
+            
+            # 本地文件丢失：回源下载并重新缓存
+            if VideoCacheService(db).mark_missing(video):
+                video_downloader.wake()
 
         # 2. 如果是远程URL，使用代理下载
         video_url = video.watermarked_play_url
         if not video_url or video_url.startswith("/static/"):
             raise ValueError("视频文件不可用")
             
-        import httpx
         from fastapi.responses import StreamingResponse
         
-        # 使用专用 client 以支持 header 转发
-        client = httpx.AsyncClient(timeout=120.0, verify=False, follow_redirects=True)
+        record_access(video.video_id, hit=False)
+        
+        client = get_proxy_client()
         req = client.build_request("GET", video_url)
         
         try:
@@ -342,12 +403,11 @@ async def download_video(
                     async for chunk in r.aiter_bytes():
                         yield chunk
                 except Exception as e:
+                    # 已发送 Content-Length：中断连接，不能让截断的下载正常结束
                     print(f"❌ Download proxy exception: {e}")
+                    raise
                 finally:
                     await r.aclose()
-                    await client.aclose()
-                        
-            filename = f"skyriff_video_{video_id}.mp4"
             
             return StreamingResponse(
                 iter_file(),
@@ -355,7 +415,6 @@ async def download_video(
                 headers=headers
             )
         except Exception as e:
-            await client.aclose()
             print(f"❌ Download setup exception: {e}")
             raise HTTPException(status_code=500, detail="无法连接到下载源")
         
@@ -368,9 +427,68 @@ async def download_video(
 
 # ==================== 媒体上传 ====================
 
-@router.post("/media/upload", response_model=ResponseModel)
+# multipart 表单中除文件内容外的开销上限（分隔符、表单头）
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+# 从临时文件读取上传内容的块大小
+UPLOAD_READ_SIZE = 64 * 1024
+
+
+async def _limited_body(request: Request, limit: int) -> AsyncIterator[bytes]:
+    """逐块读取请求体，超过上限立即中止（不等整个请求体接收完）"""
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > limit:
+            raise UploadTooLarge(f"文件过大，最大{settings.MEDIA_UPLOAD_MAX_BYTES // 1024 // 1024}MB")
+        yield chunk
+
+
+def _media_upload_data(media) -> MediaUploadResponse:
+    return MediaUploadResponse(
+        asset_id=media.asset_id,
+        asset_type=media.asset_type,
+        file_url=media.file_url,
+        file_size_bytes=media.file_size_bytes,
+        width=media.width,
+        height=media.height,
+        sha256=media.sha256,
+        thumbnail_urls=thumbnail_urls(media),
+        created_at=media.created_at
+    )
+
+
+def _upload_session_data(session) -> UploadSessionResponse:
+    return UploadSessionResponse(
+        upload_id=session.upload_id,
+        offset=session.received_bytes,
+        total_bytes=session.total_bytes,
+        chunk_size=settings.MEDIA_UPLOAD_CHUNK_BYTES,
+        status=session.status,
+        expires_at=session.expires_at,
+        asset_id=session.asset_id
+    )
+
+
+@router.post(
+    "/media/upload",
+    response_model=ResponseModel,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": ["file"],
+                        "properties": {"file": {"type": "string", "format": "binary"}}
+                    }
+                }
+            }
+        }
+    }
+)
 async def upload_media(
-    file: UploadFile = File(...),
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -381,11 +499,13 @@ async def upload_media(
     
     **支持格式**：jpg, jpeg, png, webp
     
-    **最大大小**：10MB
+    **最大大小**：10MB（接收过程中超过上限立即返回 413，不会读完整个文件）
     
     **用途**：图生视频的参考图
     
-    **请求方式**：multipart/form-data
+    **请求方式**：multipart/form-data，文件字段名 file
+    
+    **弱网环境**：移动端建议使用分块上传接口 /media/uploads（可断点续传）
     
     **响应示例**：
     ```json
@@ -398,74 +518,241 @@ async def upload_media(
             "file_url": "https://storage.example.com/uploads/abc.jpg",
             "file_size_bytes": 102400,
             "width": 1024,
-            "height": 768
+            "height": 768,
+            "sha256": "9f86d0818...",
+            "thumbnail_urls": {
+                "128": "/api/v1/assets/media/thumbs/9f86d0818.../128.webp",
+                "256": "/api/v1/assets/media/thumbs/9f86d0818.../256.webp",
+                "512": "/api/v1/assets/media/thumbs/9f86d0818.../512.webp"
+            }
         }
     }
     ```
     """
-    # 校验文件类型
-    allowed_types = ["image/jpeg", "image/jpg", "image/png", "image/webp"]
-    if file.content_type not in allowed_types:
-        raise HTTPException(status_code=400, detail="不支持的文件格式")
-    
-    # 读取文件
-    content = await file.read()
-    file_size = len(content)
-    
-    # 校验文件大小（10MB）
-    if file_size > 10 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="文件过大，最大10MB")
-    
-    # 生成唯一文件名
-    ext = os.path.splitext(file.filename)[1]
-    filename = f"{uuid.uuid4()}{ext}"
-    
-    # 保存文件（简化版：本地存储）
-    # TODO: 生产环境应使用OSS（阿里云/腾讯云）
-    from app.core.config import settings
-    upload_dir = settings.UPLOAD_DIR
-    os.makedirs(upload_dir, exist_ok=True)
-    
-    file_path = os.path.join(upload_dir, filename)
-    with open(file_path, "wb") as f:
-        f.write(content)
-    
-    # 生成文件URL（简化版：相对路径）
-    # TODO: 生产环境应返回CDN URL
-    file_url = f"/uploads/{filename}"
-    
-    # 获取图片尺寸（简化版：跳过）
-    # TODO: 使用PIL获取真实尺寸
-    width = None
-    height = None
-    
-    # 创建媒体资产记录
-    service = AssetService(db)
-    media = service.create_media_asset(
-        user_id=current_user.user_id,
-        asset_type="image",
-        file_url=file_url,
-        file_size_bytes=file_size,
-        mime_type=file.content_type,
-        width=width,
-        height=height
-    )
+    limit = settings.MEDIA_UPLOAD_MAX_BYTES + MULTIPART_OVERHEAD_BYTES
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > limit:
+        raise HTTPException(status_code=413, detail=f"文件过大，最大{settings.MEDIA_UPLOAD_MAX_BYTES // 1024 // 1024}MB")
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise HTTPException(status_code=400, detail="请使用 multipart/form-data 上传")
+    
+    # 解析表单：文件内容超过 1MB 的部分由 Starlette 落到临时文件，不占用内存
+    try:
+        form = await MultiPartParser(
+            request.headers, _limited_body(request, limit), max_files=1, max_fields=10
+        ).parse()
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except MultiPartException as e:
+        raise HTTPException(status_code=400, detail=e.message)
     
-    return ResponseModel(
-        code=200,
-        message="上传成功",
-        data=MediaUploadResponse(
-            asset_id=media.asset_id,
-            asset_type=media.asset_type,
-            file_url=media.file_url,
-            file_size_bytes=media.file_size_bytes,
-            width=media.width,
-            height=media.height,
-            created_at=media.created_at
+    try:
+        file = form.get("file")
+        if not isinstance(file, StarletteUploadFile):
+            raise HTTPException(status_code=400, detail="缺少文件")
+        
+        async def chunks():
+            while True:
+                data = await file.read(UPLOAD_READ_SIZE)
+                if not data:
+                    break
+                yield data
+        
+        media = await UploadService(db).upload_image(
+            user_id=current_user.user_id,
+            chunks=chunks(),
+            original_filename=file.filename,
+            mime_type=file.content_type
+        )
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        await form.close()
+    
+    return ResponseModel(code=200, message="上传成功", data=_media_upload_data(media))
+
+
+@router.post("/media/uploads", response_model=ResponseModel)
+async def create_upload_session(
+    request_data: CreateUploadSessionRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    创建分块上传会话（断点续传）
+    
+    **需要登录**：是
+    
+    **流程**：
+    1. 创建会话，拿到 upload_id 和建议的 chunk_size
+    2. 依次 PATCH /media/uploads/{upload_id}，请求头 Upload-Offset 为本块起始偏移，请求体为本块原始字节
+    3. 断线后 GET /media/uploads/{upload_id} 查询 offset，从该位置继续
+    4. 全部上传后 POST /media/uploads/{upload_id}/complete，返回与单次上传相同的媒体资产
+    """
+    try:
+        session = UploadService(db).create_session(
+            user_id=current_user.user_id,
+            filename=request_data.filename,
+            mime_type=request_data.mime_type,
+            total_bytes=request_data.total_bytes,
+            sha256=request_data.sha256
         )
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return ResponseModel(code=200, message="success", data=_upload_session_data(session))
+
+
+@router.get("/media/uploads/{upload_id}", response_model=ResponseModel)
+async def get_upload_session(
+    upload_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    查询分块上传进度（断线重连后据 offset 续传）
+    
+    **需要登录**：是
+    """
+    try:
+        session = UploadService(db).get_session(upload_id, current_user.user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    return ResponseModel(code=200, message="success", data=_upload_session_data(session))
+
+
+@router.patch("/media/uploads/{upload_id}", response_model=ResponseModel)
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    offset: Optional[int] = Query(None, ge=0, description="本块起始偏移（也可用 Upload-Offset 请求头）"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    上传一个分块
+    
+    **需要登录**：是
+    
+    **请求体**：本块原始字节（application/offset+octet-stream 或 application/octet-stream）
+    
+    **偏移**：必须等于服务端已接收的字节数，不一致时返回 409（响应头 Upload-Offset 为正确偏移）。
+    连接中途断开时已收到的部分会保留
+    """
+    service = UploadService(db)
+    try:
+        session = service.get_session(upload_id, current_user.user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    header_offset = request.headers.get("upload-offset")
+    if header_offset is not None:
+        if not header_offset.isdigit():
+            raise HTTPException(status_code=400, detail="Upload-Offset 格式错误")
+        offset = int(header_offset)
+    if offset is None:
+        raise HTTPException(status_code=400, detail="缺少 Upload-Offset")
+    
+    try:
+        await service.write_chunk(session, offset, request.stream())
+    except UploadOffsetMismatch as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Upload-Offset": str(e.offset)})
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ClientDisconnect:
+        # 已收到的部分已确认，客户端重连后查询偏移续传
+        return Response(status_code=400)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return ResponseModel(code=200, message="success", data=_upload_session_data(session))
+
+
+@router.post("/media/uploads/{upload_id}/complete", response_model=ResponseModel)
+async def complete_upload_session(
+    upload_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    完成分块上传，创建媒体资产（重复调用返回同一资产）
+    
+    **需要登录**：是
+    
+    **校验**：已接收字节数等于声明大小；创建会话时提供了 sha256 则校验内容，不符时会话重置为从 0 上传
+    """
+    service = UploadService(db)
+    try:
+        session = service.get_session(upload_id, current_user.user_id)
+        media = await service.complete(session)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return ResponseModel(code=200, message="上传成功", data=_media_upload_data(media))
+
+
+@router.get("/media/thumbs/{sha256}/{name}", response_model=None)
+async def get_media_thumbnail(
+    sha256: str,
+    name: str,
+    db: Session = Depends(get_db)
+):
+    """
+    获取图片缩略图
+
+    **需要登录**：否（地址由内容 SHA-256 决定，来自上传响应的 thumbnail_urls）
+
+    **文件名**：<尺寸>.<格式>，尺寸为 128 / 256 / 512（长边），格式为 webp / jpg
+
+    **缓存**：内容不变地址不变，响应带一年的 immutable Cache-Control，可由 CDN / nginx 缓存
+    """
+    size, _, ext = name.partition(".")
+    if not size.isdigit():
+        raise HTTPException(status_code=404, detail="缩略图不存在")
+    try:
+        path = await ThumbnailService(db).get_thumbnail(sha256, int(size), ext)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    return RangeFileResponse(
+        path,
+        media_type=THUMBNAIL_FORMATS[ext][1],
+        etag=f'"{sha256}-{size}-{ext}"',
+        headers={"Cache-Control": "public, max-age=31536000, immutable"},
+        zero_copy=settings.MEDIA_DELIVERY_MODE == "sendfile"
     )
 
 
+@router.delete("/media/{asset_id}", response_model=ResponseModel)
+async def delete_media(
+    asset_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    删除媒体资产
+
+    **需要登录**：是
+
+    **注意**：相同内容的文件只存储一份，最后一个引用它的资产删除后才删除文件；
+    待提交任务使用中的参考图不能删除
+    """
+    service = AssetService(db)
+
+    try:
+        service.delete_media_asset(asset_id, current_user.user_id)
+
+        return ResponseModel(code=200, message="删除成功", data=None)
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 # ==================== 项目管理 ====================
 
 @router.get("/projects", response_model=ResponseModel)
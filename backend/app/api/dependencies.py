@@ -1,85 +1,81 @@
 """
 API依赖注入
 """
-from fastapi import Depends, HTTPException, status, Query
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
-from sqlalchemy.orm import Session
 from app.core.config import settings
-from app.db.database import get_db
+from app.core.auth import ANONYMOUS, Principal, resolve_principal
+from app.core.auth_cache import load_user_async
 from app.db.models import User
 from typing import Optional
 
+# 凭证由 AuthMiddleware 统一解析；oauth2_scheme 只用于在 OpenAPI 文档中声明 Bearer 认证
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login", auto_error=False)
 
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+async def _principal(request: Request) -> Principal:
+    return getattr(request.state, "principal", None) or await resolve_principal(request.scope)
+
+
+async def get_principal(
+    request: Request,
+    token: Optional[str] = Depends(oauth2_scheme)
+) -> Principal:
+    """
+    获取当前请求的认证结果 (强制验证)
+    
+    只读取 AuthMiddleware 的解析结果，不访问数据库；只需要 user_id 的高频接口（轮询、播放）用它
+    """
+    principal = await _principal(request)
+    if principal.error == "bad_signature":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="播放地址无效或已过期")
+    if principal.error == "banned":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="账号已被禁用")
+    if not principal.authenticated:
+        print(f"❌ Auth failed: {principal.error or 'No token provided'}")
+        raise _credentials_exception()
+    return principal
+
+
+async def get_principal_optional(
+    request: Request,
+    token: Optional[str] = Depends(oauth2_scheme)
+) -> Principal:
+    """获取当前请求的认证结果 (可选验证，未登录或凭证无效时返回匿名)"""
+    principal = await _principal(request)
+    return principal if principal.authenticated else ANONYMOUS
+
+
 async def get_current_user(
-    token: Optional[str] = Depends(oauth2_scheme),
-    query_token: Optional[str] = Query(None, alias="token"),
-    db: Session = Depends(get_db)
+    principal: Principal = Depends(get_principal)
 ) -> User:
     """
     获取当前登录用户 (强制验证)
-    """
-    # 优先使用 Header 中的 token，如果没有则尝试 Query 中的 token
-    final_token = token or query_token
-    
-    # print(f"DEBUG: Auth check. Header: {'Yes' if token else 'No'}, Query: {'Yes' if query_token else 'No'}")
     
-    if not final_token:
-        print("❌ Auth failed: No token provided")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    try:
-        return await _get_user_from_token(final_token, db)
-    except Exception as e:
-        print(f"❌ Auth failed: {e}")
-        raise
+    直接使用 AuthMiddleware 解析时加载的用户快照，不占用接口的数据库会话；
+    返回的 User 不属于任何会话，只用于读取，需要修改用户时请在会话中重新查询
+    """
+    user = principal.user or await load_user_async(principal.user_id)
+    if user is None:
+        raise _credentials_exception()
+    return user
+
 
 async def get_current_user_optional(
-    token: Optional[str] = Depends(oauth2_scheme),
-    query_token: Optional[str] = Query(None, alias="token"),
-    db: Session = Depends(get_db)
+    principal: Principal = Depends(get_principal_optional)
 ) -> Optional[User]:
     """
     获取当前登录用户 (可选验证)
     如果未登录或Token无效，返回 None (而不是抛出401)
     这允许用户在 Token 过期时仍然访问公共接口（如 feed），而不会被强制登出
     """
-    final_token = token or query_token
-    
-    if not final_token:
-        return None
-        
-    try:
-        return await _get_user_from_token(final_token, db)
-    except HTTPException:
-        # 如果 Token 验证失败（过期、无效等），静默失败，视为未登录
+    if not principal.authenticated:
         return None
-
-async def _get_user_from_token(token: str, db: Session) -> User:
-    """
-    内部辅助函数：解析 Token 并获取用户
-    """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-        
-    user = db.query(User).filter(User.user_id == int(user_id)).first()
-    if user is None:
-        raise credentials_exception
-        
-    return user
+    return principal.user or await load_user_async(principal.user_id)
@@ -2,8 +2,8 @@
 社交接口（关注系统）
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from app.db.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import get_async_db
 from app.db.models import User
 from app.schemas.social import FollowResponse, UserBriefResponse
 from app.schemas.common import ResponseModel
@@ -18,7 +18,7 @@ router = APIRouter(prefix="/api/v1/social", tags=["社交"])
 async def follow_user(
     user_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     关注用户
@@ -38,10 +38,8 @@ async def follow_user(
     }
     ```
     """
-    service = SocialService(db)
-    
     try:
-        service.follow_user(current_user.user_id, user_id)
+        await db.run_sync(lambda session: SocialService(session).follow_user(current_user.user_id, user_id))
         return ResponseModel(code=200, message="关注成功", data=None)
         
     except ValueError as e:
@@ -52,17 +50,15 @@ async def follow_user(
 async def unfollow_user(
     user_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     取消关注
     
     **需要登录**：是
     """
-    service = SocialService(db)
-    
     try:
-        service.unfollow_user(current_user.user_id, user_id)
+        await db.run_sync(lambda session: SocialService(session).unfollow_user(current_user.user_id, user_id))
         return ResponseModel(code=200, message="取消关注成功", data=None)
         
     except ValueError as e:
@@ -74,7 +70,7 @@ async def list_followers(
     user_id: int,
     cursor: Optional[int] = Query(None, description="游标（follow_id）"),
     limit: int = Query(20, ge=1, le=100, description="每页数量"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取粉丝列表
@@ -94,11 +90,10 @@ async def list_followers(
     }
     ```
     """
-    service = SocialService(db)
-    
-    follows = service.list_followers(user_id, limit, cursor)
-    
-    items = [FollowResponse.model_validate(follow) for follow in follows]
+    items = await db.run_sync(lambda session: [
+        FollowResponse.model_validate(follow)
+        for follow in SocialService(session).list_followers(user_id, limit, cursor)
+    ])
     has_more = len(items) == limit
     next_cursor = items[-1].follow_id if has_more and items else None
     
@@ -118,18 +113,17 @@ async def list_following(
     user_id: int,
     cursor: Optional[int] = Query(None, description="游标（follow_id）"),
     limit: int = Query(20, ge=1, le=100, description="每页数量"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取关注列表
     
     **需要登录**：否
     """
-    service = SocialService(db)
-    
-    follows = service.list_following(user_id, limit, cursor)
-    
-    items = [FollowResponse.model_validate(follow) for follow in follows]
+    items = await db.run_sync(lambda session: [
+        FollowResponse.model_validate(follow)
+        for follow in SocialService(session).list_following(user_id, limit, cursor)
+    ])
     has_more = len(items) == limit
     next_cursor = items[-1].follow_id if has_more and items else None
     
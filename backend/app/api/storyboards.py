@@ -2,15 +2,18 @@
 故事版接口
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.db.database import get_db
+from app.db.database import get_db, get_async_db
 from app.db.models import User
 from app.schemas.storyboards import (
     CreateStoryboardRequest, UpdateStoryboardRequest, UpdateShotOrderRequest,
     StoryboardResponse, ShotResponse, ShotRequest, BatchGenerateRequest
 )
+from app.schemas.tasks import ShotTaskStatusResponse
 from app.schemas.common import ResponseModel
 from app.services.storyboard_service import StoryboardService
+from app.services.task_service import TaskService
 from app.api.dependencies import get_current_user
 from typing import Optional
 
@@ -402,15 +405,14 @@ async def batch_generate(
     **需要登录**：是
     
     **功能**：
-    - 一次性提交所有镜头
-    - 并行创建多个任务
-    - 扣除总积分
+    - 一次性提交所有镜头，按镜头时长计费（10秒=10积分，15秒=15积分，25秒=25积分）
+    - 所有任务与一笔总额预扣在同一事务中创建，立即返回，不等待供应商
+    - 后台并发提交供应商（受提交并发上限和速率限制约束）
+    - 单个镜头提交或生成失败时只退回该镜头的积分
     
-    **业务流程**：
-    1. 计算总费用（所有镜头的duration_sec之和）
-    2. 扣除积分
-    3. 并行创建所有任务
-    4. 返回任务ID列表
+    **进度查询**：
+    - `GET /api/v1/tasks/batches/{batch_id}` 查询批次汇总和每个任务的状态
+    - `GET /api/v1/tasks/events?batch_id=...` 订阅批次任务的实时进度（SSE）
     
     **请求示例**：
     ```json
@@ -427,21 +429,18 @@ async def batch_generate(
         "code": 200,
         "message": "批量生成已提交",
         "data": {
+            "batch_id": "3f2a9c...",
             "task_ids": [101, 102, 103, 104, 105, 106, 107, 108],
             "total_cost_credits": 80,
             "shot_count": 8
         }
     }
     ```
-    
-    **费用计算**：
-    - 假设8个镜头，每个10秒 → 总费用80积分
-    - 假设8个镜头，每个15秒 → 总费用120积分
     """
     service = StoryboardService(db)
     
     try:
-        result = service.batch_generate(
+        result = await service.batch_generate(
             storyboard_id=storyboard_id,
             user_id=current_user.user_id,
             ratio=req.ratio,
@@ -456,3 +455,48 @@ async def batch_generate(
         
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/{storyboard_id}/tasks/status", response_model=ResponseModel)
+async def get_storyboard_task_status(
+    storyboard_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    查询故事版所有镜头的生成状态
+    
+    **需要登录**：是
+    
+    **功能**：
+    - 返回每个镜头最新一次生成任务的状态，替代逐个镜头轮询任务
+    - 单次查询，视频播放地址在同一查询中关联
+    - 未生成过的镜头不出现在结果中
+    
+    **响应示例**：
+    ```json
+    {
+        "code": 200,
+        "message": "success",
+        "data": {
+            "items": [
+                {"shot_id": 11, "task_id": 1001, "status": "SUCCESS", "progress": 100, "video_id": 5001, "video_url": "..."},
+                {"shot_id": 12, "task_id": 1002, "status": "IN_PROGRESS", "progress": 40}
+            ]
+        }
+    }
+    ```
+    """
+    def load_status(session: Session) -> list:
+        StoryboardService(session).get_storyboard(storyboard_id, current_user.user_id)
+        return [
+            ShotTaskStatusResponse(shot_id=shot_id, **TaskService.status_payload(task, video_url))
+            for shot_id, task, video_url in TaskService(session).get_storyboard_status(current_user.user_id, storyboard_id)
+        ]
+    
+    try:
+        items = await db.run_sync(load_status)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    return ResponseModel(code=200, message="success", data={"items": items})
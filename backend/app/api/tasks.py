@@ -1,19 +1,123 @@
 """
 任务接口
 """
-from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.db.database import get_db
+from app.core.config import settings
+from app.db.database import get_db, get_async_db, AsyncSessionLocal
+from app.core.auth import Principal
 from app.db.models import User, VideoAsset
 from app.schemas.tasks import CreateTaskRequest, TaskResponse, TaskStatusResponse
 from app.schemas.common import ResponseModel
 from app.services.task_service import TaskService
-from app.api.dependencies import get_current_user
-from typing import Optional
+from app.services.task_events import task_events, TooManyConnections
+from app.api.dependencies import get_current_user, get_principal
+from typing import List, Optional
+from datetime import datetime
+import asyncio
+import json
+import time
 
 router = APIRouter(prefix="/api/v1/tasks", tags=["任务"])
 
 
+def _build_status_response(task, video_url: Optional[str]) -> TaskStatusResponse:
+    """组装任务状态响应（进行中的任务附带预计剩余时间和建议轮询间隔）"""
+    return TaskStatusResponse(**TaskService.status_payload(task, video_url))
+
+
+def _format_event(event_id: int, data: dict) -> str:
+    return f"id: {event_id}\nevent: task\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+async def _load_snapshot(user_id: int, completed_since: Optional[datetime], batch_id: Optional[str] = None) -> List[dict]:
+    """读取用户进行中（及指定时间后结束）任务的当前状态；指定批次时读取该批次全部任务"""
+    def load(session: Session) -> List[dict]:
+        service = TaskService(session)
+        if batch_id:
+            rows = service.get_batch_status(user_id, batch_id)
+        else:
+            rows = service.get_status_snapshot(user_id, completed_since)
+        return [TaskService.status_payload(task, video_url) for task, video_url in rows]
+    
+    async with AsyncSessionLocal() as db:
+        return await db.run_sync(load)
+
+
+async def _task_event_stream(user_id: int, last_event_id: Optional[int], batch_id: Optional[str] = None):
+    """
+    SSE 事件流：先补发（缓存回放或数据库快照），再推送实时事件
+
+    同一任务只在状态/进度/视频变化时推送；定期回查数据库补齐其他进程产生的变化；
+    指定 batch_id 时只推送该批次的任务
+    """
+    try:
+        subscription = task_events.subscribe(user_id, settings.TASK_EVENTS_MAX_CONNECTIONS_PER_USER)
+    except TooManyConnections:
+        return
+    
+    sent = {}
+    
+    def should_send(data: dict) -> bool:
+        if batch_id and data.get("batch_id") != batch_id:
+            return False
+        state = (data["status"], data["progress"], data["video_id"])
+        if sent.get(data["task_id"]) == state:
+            return False
+        sent[data["task_id"]] = state
+        return True
+    
+    try:
+        yield "retry: 3000\n\n"
+        
+        replayed = task_events.replay(user_id, last_event_id) if last_event_id else None
+        if replayed is not None:
+            for event in replayed:
+                if should_send(event.data):
+                    yield _format_event(event.event_id, event.data)
+        else:
+            completed_since = (
+                datetime.utcfromtimestamp(task_events.event_time(last_event_id))
+                if last_event_id else None
+            )
+            for data in await _load_snapshot(user_id, completed_since, batch_id):
+                if should_send(data):
+                    yield _format_event(task_events.next_event_id(), data)
+        
+        last_write = last_resync = time.monotonic()
+        resync_from = datetime.utcnow()
+        while True:
+            now = time.monotonic()
+            wait = min(
+                settings.TASK_EVENTS_HEARTBEAT_SEC - (now - last_write),
+                settings.TASK_EVENTS_RESYNC_SEC - (now - last_resync)
+            )
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), max(wait, 0.01))
+                if should_send(event.data):
+                    yield _format_event(event.event_id, event.data)
+                    last_write = time.monotonic()
+            except asyncio.TimeoutError:
+                pass
+            
+            now = time.monotonic()
+            if now - last_resync >= settings.TASK_EVENTS_RESYNC_SEC:
+                checked_at = datetime.utcnow()
+                for data in await _load_snapshot(user_id, resync_from, batch_id):
+                    if should_send(data):
+                        yield _format_event(task_events.next_event_id(), data)
+                        last_write = now
+                last_resync, resync_from = now, checked_at
+            
+            if now - last_write >= settings.TASK_EVENTS_HEARTBEAT_SEC:
+                yield ": ping\n\n"
+                last_write = now
+    finally:
+        task_events.unsubscribe(subscription)
+
+
 @router.post("/create", response_model=ResponseModel)
 async def create_task(
     req: CreateTaskRequest,
@@ -27,10 +131,10 @@ async def create_task(
     
     **业务流程**：
     1. 计算费用（10秒=10积分，15秒=15积分，25秒=25积分）
-    2. 预扣积分
-    3. 调用供应商API
-    4. 创建任务记录
-    5. 返回任务ID
+    2. 创建任务记录（PENDING_SUBMIT）并预扣积分
+    3. 立即返回任务ID，不等待供应商
+    4. 后台排队获取提交名额（按用户公平排队，月卡用户优先）后提交供应商，
+       成功转为 QUEUED，失败置为 FAILURE 并退回积分
     
     **请求示例（文生视频）**：
     ```json
@@ -58,7 +162,7 @@ async def create_task(
         "message": "任务创建成功",
         "data": {
             "task_id": 1001,
-            "status": "QUEUED",
+            "status": "PENDING_SUBMIT",
             "cost_credits": 10
         }
     }
@@ -91,25 +195,177 @@ async def create_task(
         raise HTTPException(status_code=500, detail=f"创建任务失败: {str(e)}")
 
 
+@router.get("/status", response_model=ResponseModel)
+async def get_task_status_batch(
+    ids: str = Query(..., description="任务ID，逗号分隔，如 1,2,3"),
+    principal: Principal = Depends(get_principal),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    批量查询任务状态
+    
+    **需要登录**：是
+    
+    **功能**：
+    - 一次查询最多 `TASK_STATUS_BATCH_LIMIT` 个任务（默认100），替代逐个调用 `GET /tasks/{task_id}`
+    - 单条按主键的查询，视频播放地址在同一查询中关联
+    - 不存在或不属于当前用户的任务ID会被忽略
+    
+    **响应示例**：
+    ```json
+    {
+        "code": 200,
+        "message": "success",
+        "data": {
+            "items": [
+                {"task_id": 1001, "status": "SUCCESS", "progress": 100, "video_id": 5001, "video_url": "..."},
+                {"task_id": 1002, "status": "IN_PROGRESS", "progress": 40, "eta_sec": 60, "next_poll_after_sec": 15}
+            ]
+        }
+    }
+    ```
+    """
+    try:
+        task_ids = list(dict.fromkeys(int(part) for part in ids.split(",") if part.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids 格式错误，应为逗号分隔的任务ID")
+    if len(task_ids) > settings.TASK_STATUS_BATCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"单次最多查询 {settings.TASK_STATUS_BATCH_LIMIT} 个任务")
+    
+    items = await db.run_sync(lambda session: [
+        _build_status_response(task, video_url)
+        for task, video_url in TaskService(session).get_status_batch(principal.user_id, task_ids)
+    ])
+    
+    return ResponseModel(
+        code=200,
+        message="success",
+        data={"items": items}
+    )
+
+
+@router.get("/events")
+async def task_events_stream(
+    request: Request,
+    principal: Principal = Depends(get_principal),
+    last_event_id: Optional[int] = Query(None, description="断线续传：最后收到的事件ID（也可通过 Last-Event-ID 请求头传递）"),
+    batch_id: Optional[str] = Query(None, description="只推送该批次的任务（批量生成返回的 batch_id）")
+):
+    """
+    任务进度事件流（Server-Sent Events）
+    
+    **需要登录**：是（Header 或 `?token=`，浏览器 EventSource 只能用 Query Token）
+    
+    **功能**：
+    - 一个连接推送当前用户所有进行中任务的状态/进度变化，替代逐个轮询 `GET /tasks/{task_id}`
+    - 连接建立时先推送进行中任务的当前状态
+    - 断线重连时浏览器自动带上 `Last-Event-ID`，补发期间错过的变化（包括已结束的任务）
+    - 定期发送心跳注释（`: ping`）保持连接
+    - 单用户连接数有上限，超出返回 429
+    - 传 `batch_id` 时只推送该批次的任务，连接建立时推送批次内全部任务的当前状态
+    
+    **事件格式**：
+    ```
+    id: 1718000000000000
+    event: task
+    data: {"task_id": 1001, "status": "IN_PROGRESS", "progress": 40, "video_id": null, ...}
+    ```
+    
+    `data` 字段与 `GET /tasks/{task_id}` 返回的 `data` 相同
+    """
+    user_id = principal.user_id
+    
+    header_event_id = request.headers.get("Last-Event-ID")
+    if header_event_id and header_event_id.isdigit():
+        last_event_id = int(header_event_id)
+    
+    if task_events.connection_count(user_id) >= settings.TASK_EVENTS_MAX_CONNECTIONS_PER_USER:
+        raise HTTPException(status_code=429, detail="事件连接数过多，请关闭其他页面后重试")
+    
+    return StreamingResponse(
+        _task_event_stream(user_id, last_event_id, batch_id),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # 关闭 nginx 缓冲，事件即时送达
+        }
+    )
+
+
+@router.get("/batches/{batch_id}", response_model=ResponseModel)
+async def get_batch_status(
+    batch_id: str,
+    principal: Principal = Depends(get_principal),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    查询批量生成的进度
+    
+    **需要登录**：是
+    
+    **功能**：
+    - 返回批次汇总（各状态任务数、已退回积分）和每个任务的状态
+    - 单次查询，视频播放地址在同一查询中关联
+    
+    **响应示例**：
+    ```json
+    {
+        "code": 200,
+        "message": "success",
+        "data": {
+            "batch_id": "3f2a9c...",
+            "total": 3,
+            "status_counts": {"SUCCESS": 1, "IN_PROGRESS": 1, "FAILURE": 1},
+            "cost_credits": 30,
+            "refunded_credits": 10,
+            "finished": false,
+            "items": [
+                {"task_id": 1001, "batch_id": "3f2a9c...", "status": "SUCCESS", "progress": 100, "video_id": 5001}
+            ]
+        }
+    }
+    ```
+    """
+    rows = await db.run_sync(lambda session: TaskService(session).get_batch_status(principal.user_id, batch_id))
+    if not rows:
+        raise HTTPException(status_code=404, detail="批次不存在")
+    
+    status_counts = {}
+    for task, _ in rows:
+        status_counts[task.status] = status_counts.get(task.status, 0) + 1
+    
+    return ResponseModel(
+        code=200,
+        message="success",
+        data={
+            "batch_id": batch_id,
+            "total": len(rows),
+            "status_counts": status_counts,
+            "cost_credits": sum(task.cost_credits for task, _ in rows),
+            "refunded_credits": sum(task.cost_credits for task, _ in rows if task.status == "FAILURE"),
+            "finished": all(task.status not in TaskService.ACTIVE_STATUSES for task, _ in rows),
+            "items": [_build_status_response(task, video_url) for task, video_url in rows]
+        }
+    )
+
+
 @router.get("/{task_id}", response_model=ResponseModel)
 async def get_task_status(
     task_id: int,
-    background_tasks: BackgroundTasks,
-    request: Request,
-    token: Optional[str] = Query(None),
-    db: Session = Depends(get_db)
+    principal: Principal = Depends(get_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    查询任务状态（自动同步供应商状态）
+    查询任务状态
     
     **需要登录**：是
     
     **功能**：
-    - 自动查询供应商API获取最新状态
-    - 任务成功后自动创建视频资产
-    - 任务失败后自动退回积分
+    - 直接读取数据库中的任务状态，不再同步调用供应商
+    - 供应商状态由后台轮询器统一同步（成功后创建视频资产、失败后退回积分）
     
     **任务状态**：
+    - `PENDING_SUBMIT` - 提交中（尚未提交供应商）
     - `QUEUED` - 排队中
     - `IN_PROGRESS` - 生成中
     - `SUCCESS` - 成功（返回video_id）
@@ -124,51 +380,22 @@ async def get_task_status(
             "task_id": 1001,
             "status": "SUCCESS",
             "progress": 100,
-            "video_id": 5001
+            "video_id": 5001,
+            "eta_sec": null,
+            "next_poll_after_sec": null
         }
     }
     ```
-    """
-    # 手动鉴权：兼容 Header 或 Query Token
-    from app.core.security import get_current_user_from_token
-    auth_header = request.headers.get("Authorization")
-    current_user = None
-    if auth_header and auth_header.startswith("Bearer "):
-        try:
-            current_user = await get_current_user_from_token(auth_header.split(" ")[1], db)
-        except:
-            pass
-    if not current_user and token:
-        try:
-            current_user = await get_current_user_from_token(token, db)
-        except:
-            pass
-    if not current_user:
-        raise HTTPException(status_code=401, detail="未认证")
     
-    service = TaskService(db)
+    进行中的任务会返回 `eta_sec`（预计剩余秒数）和 `next_poll_after_sec`（建议下次查询间隔），
+    客户端可据此退避轮询
+    """
+    def load_status(session: Session) -> TaskStatusResponse:
+        task = TaskService(session).get_task_status(task_id, principal.user_id)
+        return _build_status_response(task, task.video_url)
     
     try:
-        task = await service.get_task_status(task_id, current_user.user_id, background_tasks)
-        
-        # 获取视频URL
-        video_url = None
-        if task.video_id:
-            video_asset = db.query(VideoAsset).filter(VideoAsset.video_id == task.video_id).first()
-            if video_asset:
-                video_url = video_asset.watermarked_play_url
-        elif hasattr(task, "video_url") and task.video_url:
-             # 如果 task 对象上已经挂载了 video_url (由 TaskService 填充)
-             video_url = task.video_url
-        
-        task_status = TaskStatusResponse(
-            task_id=task.task_id,
-            status=task.status,
-            progress=task.progress,
-            video_id=task.video_id,
-            video_url=video_url,
-            error_message=task.error_message
-        )
+        task_status = await db.run_sync(load_status)
         
         return ResponseModel(code=200, message="success", data=task_status)
         
@@ -184,7 +411,7 @@ async def list_tasks(
     cursor: Optional[int] = Query(None, description="游标（task_id）"),
     limit: int = Query(20, ge=1, le=100, description="每页数量"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取任务列表
@@ -206,24 +433,30 @@ async def list_tasks(
     }
     ```
     """
-    service = TaskService(db)
-    
-    tasks = service.list_tasks(
-        user_id=current_user.user_id,
-        status=status,
-        limit=limit,
-        cursor=cursor
-    )
+    def load_tasks(session: Session) -> List[TaskResponse]:
+        tasks = TaskService(session).list_tasks(
+            user_id=current_user.user_id,
+            status=status,
+            limit=limit,
+            cursor=cursor
+        )
+        
+        # 批量获取视频URL（一次查询）
+        video_ids = [task.video_id for task in tasks if task.video_id]
+        video_urls = dict(
+            session.query(VideoAsset.video_id, VideoAsset.watermarked_play_url).filter(
+                VideoAsset.video_id.in_(video_ids)
+            ).all()
+        ) if video_ids else {}
+        
+        items = []
+        for task in tasks:
+            item = TaskResponse.model_validate(task)
+            item.video_url = video_urls.get(task.video_id)
+            items.append(item)
+        return items
     
-    # 批量获取视频URL
-    task_items = []
-    for task in tasks:
-        item = TaskResponse.model_validate(task)
-        if task.video_id:
-            video_asset = db.query(VideoAsset).filter(VideoAsset.video_id == task.video_id).first()
-            if video_asset:
-                item.video_url = video_asset.watermarked_play_url
-        task_items.append(item)
+    task_items = await db.run_sync(load_tasks)
     
     has_more = len(task_items) == limit
     next_cursor = task_items[-1].task_id if has_more and task_items else None
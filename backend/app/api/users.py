@@ -2,13 +2,16 @@
 用户接口
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.db.database import get_db
-from app.db.models import User, UserStats as UserStatsModel
+from app.db.database import get_db, get_async_db
+from app.db.models import MediaAsset, User, UserStats as UserStatsModel
 from app.schemas.users import UserProfile, UserStats, UpdateProfileRequest
 from app.schemas.works import WorkResponse
 from app.schemas.common import ResponseModel
 from app.api.dependencies import get_current_user
+from app.core.auth_cache import invalidate_user
+from app.services.thumbnail_service import AVATAR_THUMBNAIL_SIZE, ThumbnailService, thumbnail_urls
 from app.services.work_service import WorkService
 from typing import Optional
 
@@ -100,19 +103,43 @@ async def update_my_profile(
         "avatar_url": "https://example.com/avatar.jpg"
     }
     ```
+    
+    **上传的头像**：传 avatar_asset_id（/assets/media/upload 返回的图片资产）代替 avatar_url，
+    头像地址设为该图 256px 缩略图，响应的 avatar_thumbnail_urls 包含全部尺寸
     """
+    # current_user 来自认证缓存，修改需要在会话中重新查询
+    user = db.query(User).filter(User.user_id == current_user.user_id).first()
+    
     # 更新字段
     if req.nickname is not None:
-        current_user.nickname = req.nickname
+        user.nickname = req.nickname
     if req.bio is not None:
-        current_user.bio = req.bio
+        user.bio = req.bio
     if req.avatar_url is not None:
-        current_user.avatar_url = req.avatar_url
+        user.avatar_url = req.avatar_url
+    
+    avatar_thumbnails = None
+    if req.avatar_asset_id is not None:
+        media = db.query(MediaAsset).filter(
+            MediaAsset.asset_id == req.avatar_asset_id,
+            MediaAsset.user_id == current_user.user_id
+        ).first()
+        avatar_thumbnails = thumbnail_urls(media) if media else None
+        if not avatar_thumbnails:
+            raise HTTPException(status_code=400, detail="头像图片不存在")
+        # 先生成缩略图，确保头像地址可用
+        try:
+            await ThumbnailService(db).get_thumbnail(media.blob_sha256, AVATAR_THUMBNAIL_SIZE, "webp")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        user.avatar_url = avatar_thumbnails[str(AVATAR_THUMBNAIL_SIZE)]
     
     db.commit()
-    db.refresh(current_user)
+    db.refresh(user)
+    invalidate_user(user.user_id)
     
-    profile = UserProfile.model_validate(current_user)
+    profile = UserProfile.model_validate(user)
+    profile.avatar_thumbnail_urls = avatar_thumbnails
     return ResponseModel(code=200, message="更新成功", data=profile)
 
 
@@ -160,18 +187,17 @@ async def get_user_works(
     user_id: int,
     cursor: Optional[int] = Query(None, description="游标（work_id）"),
     limit: int = Query(20, ge=1, le=50, description="每页数量"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取指定用户的作品列表
     
     **需要登录**：否
     """
-    service = WorkService(db)
-    
-    works = service.get_user_works(user_id, limit, cursor)
-    
-    items = [WorkResponse.model_validate(work) for work in works]
+    items = await db.run_sync(lambda session: [
+        WorkResponse.model_validate(work)
+        for work in WorkService(session).get_user_works(user_id, limit, cursor)
+    ])
     has_more = len(items) == limit
     next_cursor = items[-1].work_id if has_more and items else None
     
@@ -2,8 +2,8 @@
 钱包接口
 """
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from app.db.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import get_async_db
 from app.db.models import User
 from app.schemas.wallets import (
     WalletsResponse, CreditLedgerItem, 
@@ -20,7 +20,7 @@ router = APIRouter(prefix="/api/v1/wallets", tags=["钱包"])
 @router.get("/me", response_model=ResponseModel)
 async def get_my_wallets(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取当前用户三钱包余额
@@ -42,8 +42,7 @@ async def get_my_wallets(
     }
     ```
     """
-    service = WalletService(db)
-    wallets = service.get_wallets_balance(current_user.user_id)
+    wallets = await db.run_sync(lambda session: WalletService(session).get_wallets_balance(current_user.user_id))
     return ResponseModel(code=200, message="success", data=wallets)
 
 
@@ -52,7 +51,7 @@ async def get_credit_ledgers(
     cursor: Optional[int] = Query(None, description="游标（ledger_id）"),
     limit: int = Query(20, ge=1, le=100, description="每页数量"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取积分流水
@@ -85,11 +84,11 @@ async def get_credit_ledgers(
     }
     ```
     """
-    service = WalletService(db)
-    ledgers = service.get_credit_ledgers(current_user.user_id, limit, cursor)
-    
-    # 转换为Pydantic模型
-    items = [CreditLedgerItem.model_validate(ledger) for ledger in ledgers]
+    # 在会话内转换为Pydantic模型
+    items = await db.run_sync(lambda session: [
+        CreditLedgerItem.model_validate(ledger)
+        for ledger in WalletService(session).get_credit_ledgers(current_user.user_id, limit, cursor)
+    ])
     
     # 判断是否还有更多
     has_more = len(items) == limit
@@ -111,7 +110,7 @@ async def get_coin_ledgers(
     cursor: Optional[int] = Query(None, description="游标（ledger_id）"),
     limit: int = Query(20, ge=1, le=100, description="每页数量"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取金币流水
@@ -143,10 +142,10 @@ async def get_coin_ledgers(
     }
     ```
     """
-    service = WalletService(db)
-    ledgers = service.get_coin_ledgers(current_user.user_id, limit, cursor)
-    
-    items = [CoinLedgerItem.model_validate(ledger) for ledger in ledgers]
+    items = await db.run_sync(lambda session: [
+        CoinLedgerItem.model_validate(ledger)
+        for ledger in WalletService(session).get_coin_ledgers(current_user.user_id, limit, cursor)
+    ])
     has_more = len(items) == limit
     next_cursor = items[-1].ledger_id if has_more and items else None
     
@@ -0,0 +1,55 @@
+"""
+供应商回调接口
+"""
+import json
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.orm import Session
+from app.db.database import get_db
+from app.schemas.common import ResponseModel
+from app.services.task_service import TaskService
+from app.vendors.dyuapi_sora2 import DyuSora2Adapter
+
+router = APIRouter(prefix="/api/v1/webhooks", tags=["回调"])
+
+
+@router.post("/dyuapi", response_model=ResponseModel)
+async def dyuapi_callback(
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """
+    DyuAPI 任务进度/完成回调
+
+    **需要登录**：否（通过共享密钥签名校验）
+
+    **签名**：
+    - `X-Dyu-Timestamp`: Unix 秒级时间戳
+    - `X-Dyu-Signature`: `sha256=` + HMAC-SHA256(secret, "{timestamp}." + 原始请求体)
+
+    **功能**：
+    - 与轮询相同的状态迁移：状态映射、成功创建视频资产、失败退回积分
+    - 幂等：重复回调不会重复退款或重复创建资产
+    """
+    body = await request.body()
+    if not DyuSora2Adapter.verify_webhook(
+        body,
+        request.headers.get("X-Dyu-Timestamp"),
+        request.headers.get("X-Dyu-Signature")
+    ):
+        raise HTTPException(status_code=401, detail="签名校验失败")
+
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="无效的JSON")
+
+    service = TaskService(db)
+
+    try:
+        await service.handle_vendor_callback(payload)
+    except ValueError as e:
+        # 未知任务：返回成功，避免供应商无限重试
+        print(f"⚠️ 忽略回调: {e}")
+        return ResponseModel(code=200, message="ignored", data=None)
+
+    return ResponseModel(code=200, message="success", data=None)
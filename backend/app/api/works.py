@@ -1,9 +1,10 @@
 """
 作品接口
 """
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.db.database import get_db
+from app.db.database import get_async_db
 from app.db.models import User
 from app.schemas.works import (
     PublishWorkRequest, WorkResponse, CommentResponse,
@@ -13,8 +14,6 @@ from app.schemas.common import ResponseModel
 from app.services.work_service import WorkService
 from app.api.dependencies import get_current_user, get_current_user_optional
 from typing import Optional
-from typing import Optional
-from typing import Optional
 
 router = APIRouter(prefix="/api/v1/works", tags=["作品"])
 
@@ -22,9 +21,8 @@ router = APIRouter(prefix="/api/v1/works", tags=["作品"])
 @router.post("/publish", response_model=ResponseModel)
 async def publish_work(
     req: PublishWorkRequest,
-    request: Request,
-    token: Optional[str] = Query(None),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     发布作品
@@ -63,28 +61,8 @@ async def publish_work(
     }
     ```
     """
-    # 手动鉴权：兼容 Header 或 Query Token
-    from app.core.security import get_current_user_from_token
-    auth_header = request.headers.get("Authorization")
-    current_user = None
-    if auth_header and auth_header.startswith("Bearer "):
-        try:
-            current_user = await get_current_user_from_token(auth_header.split(" ")[1], db)
-        except:
-            pass
-    if not current_user and token:
-        try:
-            current_user = await get_current_user_from_token(token, db)
-        except:
-            pass
-    if not current_user:
-        raise HTTPException(status_code=401, detail="未认证")
-    
-    service = WorkService(db)
-    
-    try:
-        print(f"📝 Publish request: user_id={current_user.user_id}, video_id={req.video_id}, title={req.title}")
-        work = service.publish_work(
+    def publish(session: Session) -> WorkResponse:
+        work = WorkService(session).publish_work(
             user_id=current_user.user_id,
             video_id=req.video_id,
             title=req.title,
@@ -93,8 +71,11 @@ async def publish_work(
             prompt_unlock_cost=req.prompt_unlock_cost,
             allow_remix=req.allow_remix
         )
-        
-        work_data = WorkResponse.model_validate(work)
+        return WorkResponse.model_validate(work)
+    
+    try:
+        print(f"📝 Publish request: user_id={current_user.user_id}, video_id={req.video_id}, title={req.title}")
+        work_data = await db.run_sync(publish)
         
         return ResponseModel(code=200, message="发布成功", data=work_data)
         
@@ -109,7 +90,7 @@ async def get_feed(
     cursor: Optional[int] = Query(None, description="游标（work_id）"),
     limit: int = Query(20, ge=1, le=50, description="每页数量"),
     current_user: Optional[User] = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取Feed流
@@ -134,18 +115,17 @@ async def get_feed(
     }
     ```
     """
-    service = WorkService(db)
-    
-    try:
-        user_id = current_user.user_id if current_user else None
-        works = service.list_feed(
+    def load_feed(session: Session) -> list:
+        works = WorkService(session).list_feed(
             feed_type=feed_type,
-            user_id=user_id,
+            user_id=current_user.user_id if current_user else None,
             limit=limit,
             cursor=cursor
         )
-        
-        items = [WorkResponse.model_validate(work) for work in works]
+        return [WorkResponse.model_validate(work) for work in works]
+    
+    try:
+        items = await db.run_sync(load_feed)
         has_more = len(items) == limit
         next_cursor = items[-1].work_id if has_more and items else None
         
@@ -167,7 +147,7 @@ async def get_feed(
 async def get_work_detail(
     work_id: int,
     current_user: Optional[User] = Depends(get_current_user_optional),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取作品详情（自动增加浏览量）
@@ -189,13 +169,12 @@ async def get_work_detail(
     }
     ```
     """
-    service = WorkService(db)
+    def load_work(session: Session) -> WorkResponse:
+        viewer_user_id = current_user.user_id if current_user else None
+        return WorkResponse.model_validate(WorkService(session).get_work(work_id, viewer_user_id))
     
     try:
-        viewer_user_id = current_user.user_id if current_user else None
-        work = service.get_work(work_id, viewer_user_id)
-        
-        work_data = WorkResponse.model_validate(work)
+        work_data = await db.run_sync(load_work)
         
         return ResponseModel(code=200, message="success", data=work_data)
         
@@ -207,7 +186,7 @@ async def get_work_detail(
 async def like_work(
     work_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     点赞作品
@@ -216,10 +195,8 @@ async def like_work(
     
     **幂等性**：重复点赞会返回400错误
     """
-    service = WorkService(db)
-    
     try:
-        service.like_work(work_id, current_user.user_id)
+        await db.run_sync(lambda session: WorkService(session).like_work(work_id, current_user.user_id))
         return ResponseModel(code=200, message="点赞成功", data=None)
         
     except ValueError as e:
@@ -230,17 +207,15 @@ async def like_work(
 async def unlike_work(
     work_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     取消点赞
     
     **需要登录**：是
     """
-    service = WorkService(db)
-    
     try:
-        service.unlike_work(work_id, current_user.user_id)
+        await db.run_sync(lambda session: WorkService(session).unlike_work(work_id, current_user.user_id))
         return ResponseModel(code=200, message="取消点赞成功", data=None)
         
     except ValueError as e:
@@ -251,17 +226,15 @@ async def unlike_work(
 async def collect_work(
     work_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     收藏作品
     
     **需要登录**：是
     """
-    service = WorkService(db)
-    
     try:
-        service.collect_work(work_id, current_user.user_id)
+        await db.run_sync(lambda session: WorkService(session).collect_work(work_id, current_user.user_id))
         return ResponseModel(code=200, message="收藏成功", data=None)
         
     except ValueError as e:
@@ -272,17 +245,15 @@ async def collect_work(
 async def uncollect_work(
     work_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     取消收藏
     
     **需要登录**：是
     """
-    service = WorkService(db)
-    
     try:
-        service.uncollect_work(work_id, current_user.user_id)
+        await db.run_sync(lambda session: WorkService(session).uncollect_work(work_id, current_user.user_id))
         return ResponseModel(code=200, message="取消收藏成功", data=None)
         
     except ValueError as e:
@@ -294,7 +265,7 @@ async def create_comment(
     work_id: int,
     req: CreateCommentRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     发表评论
@@ -309,16 +280,16 @@ async def create_comment(
     }
     ```
     """
-    service = WorkService(db)
-    
-    comment = service.create_comment(
-        work_id=work_id,
-        user_id=current_user.user_id,
-        content=req.content,
-        parent_comment_id=req.parent_comment_id
-    )
+    def comment(session: Session) -> CommentResponse:
+        created = WorkService(session).create_comment(
+            work_id=work_id,
+            user_id=current_user.user_id,
+            content=req.content,
+            parent_comment_id=req.parent_comment_id
+        )
+        return CommentResponse.model_validate(created)
     
-    comment_data = CommentResponse.model_validate(comment)
+    comment_data = await db.run_sync(comment)
     
     return ResponseModel(code=200, message="评论成功", data=comment_data)
 
@@ -328,18 +299,17 @@ async def list_comments(
     work_id: int,
     cursor: Optional[int] = Query(None, description="游标（comment_id）"),
     limit: int = Query(20, ge=1, le=100, description="每页数量"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取评论列表
     
     **需要登录**：否
     """
-    service = WorkService(db)
-    
-    comments = service.list_comments(work_id, limit, cursor)
-    
-    items = [CommentResponse.model_validate(comment) for comment in comments]
+    items = await db.run_sync(lambda session: [
+        CommentResponse.model_validate(comment)
+        for comment in WorkService(session).list_comments(work_id, limit, cursor)
+    ])
     has_more = len(items) == limit
     next_cursor = items[-1].comment_id if has_more and items else None
     
@@ -359,7 +329,7 @@ async def tip_work(
     work_id: int,
     req: TipWorkRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     打赏作品
@@ -386,24 +356,20 @@ async def tip_work(
     - 50积分 = 2.5元 → 创作者得2.25元
     - 100积分 = 5.0元 → 创作者得4.50元
     """
-    service = WorkService(db)
-    
-    try:
-        tip = service.tip_work(
+    def tip(session: Session) -> dict:
+        created = WorkService(session).tip_work(
             work_id=work_id,
             tipper_user_id=current_user.user_id,
             amount_credits=req.amount_credits
         )
-        
-        return ResponseModel(
-            code=200,
-            message="打赏成功",
-            data={
-                "tip_id": tip.tip_id,
-                "amount_credits": tip.amount_credits,
-                "creator_income_coins": str(tip.amount_coins)
-            }
-        )
+        return {
+            "tip_id": created.tip_id,
+            "amount_credits": created.amount_credits,
+            "creator_income_coins": str(created.amount_coins)
+        }
+    
+    try:
+        return ResponseModel(code=200, message="打赏成功", data=await db.run_sync(tip))
         
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -413,7 +379,7 @@ async def tip_work(
 async def unlock_prompt(
     work_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     解锁提示词
@@ -445,10 +411,8 @@ async def unlock_prompt(
     - 如果提示词是公开的，免费返回
     - 如果是自己的作品，免费返回
     """
-    service = WorkService(db)
-    
     try:
-        result = service.unlock_prompt(work_id, current_user.user_id)
+        result = await db.run_sync(lambda session: WorkService(session).unlock_prompt(work_id, current_user.user_id))
         
         message = "解锁成功" if not result["already_unlocked"] else "已解锁过"
         
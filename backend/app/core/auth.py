@@ -0,0 +1,107 @@
+"""
+认证中间件
+每个请求只解析一次凭证，结果（Principal）放在 request.state.principal，由 app.api.dependencies 中的依赖读取
+
+凭证来源（按优先级）：
+1. 视频播放/下载的签名地址（uid、exp、sig 参数）：纯计算校验，不访问数据库
+2. Authorization: Bearer <token>
+3. ?token= 参数（EventSource、<video> 等无法设置请求头的场景）
+
+中间件本身不拒绝请求：是否需要登录由接口的依赖决定，公开接口不受影响；
+用户资料来自认证缓存，未命中时在线程中查询，不阻塞事件循环
+"""
+import re
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import parse_qs
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.core.auth_cache import decode_token, load_user_async
+from app.core.metrics import metrics
+from app.core.security import verify_media_signature
+from app.db.models import User
+
+# 签名地址只对对应视频的播放/下载接口有效
+SIGNED_MEDIA_PATH = re.compile(r"^/api/v1/assets/videos/(\d+)/(stream|download)$")
+
+auth_principals = metrics.counter(
+    "auth_principals_total",
+    "Requests by resolved credential source (header|query|signed), anonymous, or rejected (invalid|banned|bad_signature)",
+    ["source"]
+)
+
+
+@dataclass
+class Principal:
+    """请求的认证结果"""
+    user_id: Optional[int] = None
+    source: str = "anonymous"  # header/query/signed/anonymous
+    error: Optional[str] = None  # 提供了凭证但无效：invalid/banned/bad_signature
+    user: Optional[User] = None  # 解析时加载的用户快照（不属于任何会话）；签名地址不加载
+
+    @property
+    def authenticated(self) -> bool:
+        return self.user_id is not None
+
+
+ANONYMOUS = Principal()
+
+
+def _user_id_from_token(token: str) -> Optional[int]:
+    payload = decode_token(token)
+    sub = payload.get("sub") if payload else None
+    return int(sub) if sub is not None and str(sub).isdigit() else None
+
+
+async def resolve_principal(scope: Scope) -> Principal:
+    """
+    解析请求凭证
+
+    token 验证和用户状态都走认证缓存，命中时不访问数据库
+
+    Returns:
+        Principal对象
+    """
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    sig = query.get("sig", [None])[0]
+    if sig:
+        match = SIGNED_MEDIA_PATH.match(scope.get("path", ""))
+        uid, exp = query.get("uid", [""])[0], query.get("exp", [""])[0]
+        if match and uid.isdigit() and exp.isdigit() and verify_media_signature(int(match.group(1)), int(uid), int(exp), sig):
+            return Principal(user_id=int(uid), source="signed")
+        return Principal(source="signed", error="bad_signature")
+
+    candidates = []
+    authorization = Headers(scope=scope).get("authorization")
+    if authorization and authorization.startswith("Bearer "):
+        candidates.append(("header", authorization[7:].strip()))
+    if query.get("token"):
+        candidates.append(("query", query["token"][0]))
+    if not candidates:
+        return ANONYMOUS
+
+    for source, token in candidates:
+        user_id = _user_id_from_token(token)
+        if user_id is None:
+            continue
+        user = await load_user_async(user_id)
+        if user is None:
+            continue
+        if user.status == "banned":
+            return Principal(source=source, error="banned")
+        return Principal(user_id=user_id, source=source, user=user)
+    return Principal(source=candidates[0][0], error="invalid")
+
+
+class AuthMiddleware:
+    """解析请求凭证，写入 scope["state"]["principal"]（即 request.state.principal）"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] in ("http", "websocket"):
+            principal = await resolve_principal(scope)
+            auth_principals.inc(source=principal.error or principal.source)
+            scope.setdefault("state", {})["principal"] = principal
+        await self.app(scope, receive, send)
@@ -0,0 +1,147 @@
+"""
+认证缓存
+每个需要登录的请求都要 jwt.decode 并按 user_id 查询用户，轮询、播放等高频接口上这是主要开销；
+这里缓存已验证的 token → claims 和 user_id → 用户快照（users 表列值），都有容量上限和有效期：
+- token 缓存的有效期不超过 token 自身的 exp，过期 token 不会因缓存而继续有效
+- 用户通过接口修改资料后调用 invalidate_user 立即失效，多进程部署时其他进程的缓存最迟 AUTH_USER_CACHE_TTL_SEC 秒后过期
+- 目前没有禁用账号的接口，直接修改数据库中的 users.status 后，禁用最迟 AUTH_USER_CACHE_TTL_SEC 秒后生效
+  （需要立即生效时重启服务）
+"""
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+from jose import JWTError, jwt
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.db.database import SessionLocal
+from app.db.models import User
+
+auth_cache_requests = metrics.counter(
+    "auth_cache_requests_total",
+    "Authentication cache lookups (cache=token|user, result=hit|miss)",
+    ["cache", "result"]
+)
+
+# 用户快照包含的列
+USER_COLUMNS = [column.key for column in User.__table__.columns]
+
+
+class TTLCache:
+    """容量有限的 TTL 缓存（超出容量时淘汰最久未使用的条目）"""
+
+    def __init__(self, name: str, max_entries: int, ttl_sec: float):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self._items: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[0] > time.monotonic():
+                self._items.move_to_end(key)
+                auth_cache_requests.inc(cache=self.name, result="hit")
+                return item[1]
+            if item is not None:
+                del self._items[key]
+        auth_cache_requests.inc(cache=self.name, result="miss")
+        return None
+
+    def set(self, key: Hashable, value: Any, ttl_sec: Optional[float] = None) -> None:
+        ttl = self.ttl_sec if ttl_sec is None else min(ttl_sec, self.ttl_sec)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._items[key] = (time.monotonic() + ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+token_cache = TTLCache("token", settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_TOKEN_CACHE_TTL_SEC)
+user_cache = TTLCache("user", settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_USER_CACHE_TTL_SEC)
+
+
+def decode_token(token: str) -> Optional[dict]:
+    """
+    验证JWT令牌（带缓存）
+
+    Returns:
+        解码后的数据，验证失败返回None
+    """
+    claims = token_cache.get(token)
+    if claims is None:
+        try:
+            claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        except JWTError:
+            return None
+        exp = claims.get("exp")
+        token_cache.set(token, claims, exp - time.time() if exp else None)
+    return claims
+
+
+def load_user(db: Optional[Session], user_id: int) -> Optional[User]:
+    """
+    按 user_id 获取用户（带缓存）
+
+    返回的是每次新建、不属于任何会话的 User 对象：可以读取字段，修改不会写库也不会影响缓存，
+    需要修改用户时请在会话中重新查询，提交后调用 invalidate_user
+
+    Args:
+        db: 数据库会话；为 None 时只在缓存未命中时临时打开会话
+        user_id: 用户ID
+
+    Returns:
+        User对象，不存在返回None
+    """
+    snapshot = user_cache.get(user_id)
+    if snapshot is None:
+        snapshot = _query_snapshot(db, user_id)
+    return User(**snapshot) if snapshot is not None else None
+
+
+def _query_snapshot(db: Optional[Session], user_id: int) -> Optional[dict]:
+    """查询用户快照并写入缓存（db 为 None 时临时打开会话）"""
+    session = db or SessionLocal()
+    try:
+        user = session.query(User).filter(User.user_id == user_id).first()
+        if user is None:
+            return None
+        snapshot = {key: getattr(user, key) for key in USER_COLUMNS}
+    finally:
+        if db is None:
+            session.close()
+    user_cache.set(user_id, snapshot)
+    return snapshot
+
+
+async def load_user_async(user_id: int) -> Optional[User]:
+    """
+    按 user_id 获取用户（带缓存，供事件循环中调用）
+
+    缓存命中时直接返回；未命中时在线程中查询，不阻塞事件循环
+
+    Returns:
+        User对象，不存在返回None
+    """
+    snapshot = user_cache.get(user_id)
+    if snapshot is None:
+        snapshot = await asyncio.to_thread(_query_snapshot, None, user_id)
+    return User(**snapshot) if snapshot is not None else None
+
+
+def invalidate_user(user_id: int) -> None:
+    """用户资料或状态变化后调用，下次请求重新查询"""
+    user_cache.pop(user_id)
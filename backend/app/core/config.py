@@ -17,11 +17,17 @@ class Settings(BaseSettings):
     
     # 数据库
     DATABASE_URL: str = "sqlite:///./skyriff.db"
+    ASYNC_DATABASE_URL: Optional[str] = None  # 异步引擎URL，留空时由 DATABASE_URL 推导（sqlite → aiosqlite，postgresql → asyncpg）
+    ASYNC_DB_POOL_SIZE: int = 10  # 异步引擎连接池大小（同时执行的查询数上限）
+    ASYNC_DB_MAX_OVERFLOW: int = 20  # 连接池满时允许额外创建的连接数
     
     # JWT
     SECRET_KEY: str = "dev-secret-key-change-in-production"
     ACCESS_TOKEN_EXPIRE_DAYS: int = 7
     ALGORITHM: str = "HS256"
+    AUTH_TOKEN_CACHE_TTL_SEC: int = 300  # 已验证 token 的缓存时间（秒），不超过 token 自身有效期
+    AUTH_USER_CACHE_TTL_SEC: int = 60  # 用户快照缓存时间（秒），直接在数据库中禁用账号、多进程部署时其他进程的资料变化最迟在此之后生效
+    AUTH_CACHE_MAX_ENTRIES: int = 10000  # 每种认证缓存的条目上限
     
     # Redis
     REDIS_URL: str = "redis://localhost:6379/0"
@@ -39,9 +45,98 @@ class Settings(BaseSettings):
     DYUAPI_API_KEY: Optional[str] = None
     DISABLE_VENDOR_FALLBACK: bool = True
     
+    # 供应商HTTP连接池（共享长连接客户端）
+    DYUAPI_TIMEOUT: float = 30.0  # 读/写/池等待超时（秒）
+    DYUAPI_CONNECT_TIMEOUT: float = 10.0  # 建连超时（秒）
+    DYUAPI_MAX_CONNECTIONS: int = 100  # 最大并发连接数
+    DYUAPI_MAX_KEEPALIVE_CONNECTIONS: int = 20  # 最大空闲保活连接数
+    DYUAPI_KEEPALIVE_EXPIRY: float = 30.0  # 空闲连接保活时长（秒）
+    DYUAPI_HTTP2: bool = False  # 启用HTTP/2（需安装 httpx[http2]）
+    
+    # 供应商调用容错
+    DYUAPI_RETRY_ATTEMPTS: int = 3  # 幂等请求最大尝试次数（含首次）
+    DYUAPI_RETRY_BASE_DELAY: float = 0.5  # 退避基数（秒），全抖动指数退避
+    DYUAPI_RETRY_MAX_DELAY: float = 5.0  # 单次退避上限（秒）
+    DYUAPI_RETRY_DEADLINE_SEC: float = 45.0  # 含重试的总耗时上限（秒）
+    DYUAPI_BREAKER_FAILURE_THRESHOLD: int = 5  # 连续失败多少次打开熔断
+    DYUAPI_BREAKER_RESET_SEC: float = 30.0  # 熔断打开后多久进入半开探测（秒）
+    DYUAPI_BREAKER_HALF_OPEN_MAX_CALLS: int = 1  # 半开状态允许的并发探测请求数
+    DYUAPI_HEDGE_DELAY_MS: int = 0  # 查询任务状态的对冲延迟（毫秒），0 表示关闭
+    
+    # 供应商回调（Webhook）
+    DYUAPI_CALLBACK_URL: Optional[str] = None  # 本服务对外的回调地址，如 https://api.example.com/api/v1/webhooks/dyuapi
+    DYUAPI_WEBHOOK_SECRET: Optional[str] = None  # 回调签名共享密钥
+    DYUAPI_WEBHOOK_TOLERANCE_SEC: int = 300  # 回调时间戳允许的偏差（秒）
+    DYUAPI_WEBHOOK_GRACE_SEC: int = 60  # 超过预计完成时间多久未收到回调则回退到轮询（秒）
+    
+    # 后台任务
+    BACKGROUND_WORKERS_ENABLED: bool = True  # 是否在本进程启动后台轮询等任务
+    TASK_POLL_INTERVAL_SEC: float = 2.0  # 扫描到期任务的间隔（秒）
+    TASK_POLL_BATCH_SIZE: int = 100  # 每批扫描的任务数
+    TASK_POLL_CONCURRENCY: int = 10  # 供应商状态查询并发上限
+    TASK_TIMEOUT_SEC: int = 600  # 生成超时（秒）
+    TASK_POLL_MIN_DELAY_SEC: float = 3.0  # 单个任务最短轮询间隔（秒）
+    TASK_POLL_MAX_DELAY_SEC: float = 30.0  # 单个任务最长轮询间隔（秒）
+    TASK_STATUS_BATCH_LIMIT: int = 100  # 批量查询任务状态单次最多任务数
+    TASK_REAPER_INTERVAL_SEC: float = 30.0  # 超时任务回收的扫描间隔（秒）
+    TASK_REAPER_BATCH_SIZE: int = 100  # 每批回收的超时任务数（同一事务退款）
+    
+    # 供应商提交调度（令牌桶 + 按用户公平排队，按进程生效）
+    VENDOR_SUBMIT_RATE_PER_SEC: float = 2.0  # 创建接口稳定速率（每秒）
+    VENDOR_SUBMIT_BURST: int = 5  # 允许的突发提交数
+    VENDOR_SUBMIT_PRIORITY_BURST: int = 4  # 优先通道连续放行上限，之后让普通通道放行一个
+    VENDOR_SUBMIT_MAX_WAIT_SEC: float = 120.0  # 排队最长等待（秒），超时退款
+    VENDOR_SUBMIT_CONCURRENCY: int = 8  # 同时进行的供应商创建请求数（每进程）
+    VENDOR_SUBMIT_LEASE_SEC: float = 90.0  # 提交租约（秒），超时未完成视为进程中断，由恢复循环重新提交
+    VENDOR_SUBMIT_MAX_ATTEMPTS: int = 3  # 进程中断后最多重新提交几次，超过则失败退款
+    VENDOR_SUBMIT_RECOVERY_INTERVAL_SEC: float = 30.0  # 扫描租约过期的待提交任务的间隔（秒）
+    
+    # 任务事件推送（SSE）
+    TASK_EVENTS_HEARTBEAT_SEC: float = 15.0  # 心跳间隔（秒），防止代理断开空闲连接
+    TASK_EVENTS_RESYNC_SEC: float = 10.0  # 回查数据库的间隔（秒），补齐其他进程产生的变化
+    TASK_EVENTS_MAX_CONNECTIONS_PER_USER: int = 3  # 单用户同时打开的事件连接上限（每进程）
+    
+    # 视频本地缓存下载
+    VIDEO_DOWNLOAD_CONCURRENCY: int = 3  # 同时下载的视频数（每进程）
+    VIDEO_DOWNLOAD_MAX_ATTEMPTS: int = 5  # 最多尝试次数，超过后放弃缓存（仍可回源播放）
+    VIDEO_DOWNLOAD_RETRY_BASE_SEC: float = 10.0  # 失败重试的退避基数（秒），按次数指数增长
+    VIDEO_DOWNLOAD_LEASE_SEC: float = 600.0  # 下载租约（秒），过期未完成视为进程中断，由其他进程接手续传
+    VIDEO_DOWNLOAD_POLL_INTERVAL_SEC: float = 15.0  # 扫描待下载任务的间隔（秒）
+    VIDEO_DOWNLOAD_TIMEOUT_SEC: float = 60.0  # 单次读取超时（秒）
+    VIDEO_CACHE_MAX_BYTES: int = 20 * 1024 ** 3  # 本地视频缓存容量上限（字节）
+    VIDEO_CACHE_TARGET_RATIO: float = 0.9  # 超出上限时清理到上限的该比例，避免反复触发
+    VIDEO_CACHE_EVICTION_POLICY: str = "lru"  # 淘汰策略：lru（最久未访问）/ lfu（访问次数最少）
+    VIDEO_CACHE_EVICT_INTERVAL_SEC: float = 60.0  # 检查缓存容量、落库访问记录的间隔（秒）
+    
+    # 本地媒体文件发送方式（播放/下载已缓存的视频）
+    # app: 应用进程逐块读取后发送（默认，不依赖前置代理）
+    # accel: 鉴权后返回 X-Accel-Redirect，由 nginx 直接 sendfile 发送（需配置 internal location，见 部署配置/nginx.conf；docker-compose 部署已启用）
+    # sendfile: 需要 ASGI 服务器提供 http.response.zerocopysend 扩展（uvicorn 不提供），不支持时与 app 相同
+    MEDIA_DELIVERY_MODE: str = "app"
+    MEDIA_ACCEL_PREFIX: str = "/_protected_media/"  # nginx internal location 前缀，对应本地 static 目录
+    
+    # 未缓存视频的回源代理（进程内共享连接池）
+    MEDIA_PROXY_TIMEOUT_SEC: float = 120.0  # 回源读取超时（秒）
+    MEDIA_PROXY_MAX_CONNECTIONS: int = 500  # 同时回源的连接上限（每个代理中的播放/下载占用一条），满时重定向到源站
+    MEDIA_PROXY_MAX_KEEPALIVE_CONNECTIONS: int = 20  # 最大空闲保活连接数
+    
+    # 视频播放/下载签名地址（由视频详情接口签发，播放时免 JWT 和数据库鉴权）
+    MEDIA_URL_SECRET: Optional[str] = None  # 签名密钥，默认由 SECRET_KEY 派生
+    MEDIA_URL_TTL_SEC: int = 3600  # 签名地址最短有效期（秒）
+    MEDIA_URL_EXPIRY_STEP_SEC: int = 600  # 过期时间取整粒度（秒），时间窗内签发的地址相同、可缓存
+    
     # 文件存储
     STORAGE_TYPE: str = "local"  # local/oss
     UPLOAD_DIR: str = "./uploads"
+    MEDIA_UPLOAD_MAX_BYTES: int = 10 * 1024 * 1024  # 上传图片大小上限（字节），接收时边读边检查
+    MEDIA_UPLOAD_CHUNK_BYTES: int = 1024 * 1024  # 分块上传的建议块大小（字节）
+    MEDIA_UPLOAD_SESSION_TTL_SEC: int = 24 * 3600  # 分块上传会话有效期（秒），每次写入后顺延
+    MEDIA_UPLOAD_PURGE_INTERVAL_SEC: float = 600.0  # 清理过期未完成上传会话的间隔（秒）
+    MEDIA_DATA_URI_CACHE_BYTES: int = 64 * 1024 * 1024  # 参考图 Base64 Data URI 的进程内缓存上限（字节）
+    REFERENCE_IMAGE_QUALITY: int = 85  # 参考图预处理后的 JPEG 质量
+    MEDIA_IMAGE_MAX_PIXELS: int = 50_000_000  # 上传图片的像素数上限（宽×高），防止解码超大图片耗尽内存
+    MEDIA_THUMBNAIL_QUALITY: int = 80  # 缩略图 WebP / JPEG 质量
+    IMAGE_PROCESS_WORKERS: int = 2  # 图片处理进程数（缩放/编码），0 表示在线程中处理
     
     # 日志配置
     LOG_LEVEL: str = "INFO"
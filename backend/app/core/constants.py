@@ -70,6 +70,7 @@ VIDEO_RATIOS = ["9:16", "16:9", "1:1"]  # 支持的比例
 # ==================== 任务状态 ====================
 TASK_STATUS = {
     "NOT_START": "未开始",
+    "PENDING_SUBMIT": "提交中",
     "QUEUED": "排队中",
     "IN_PROGRESS": "生成中",
     "SUCCESS": "成功",
@@ -0,0 +1,183 @@
+"""
+图片处理
+Pillow 解码、缩放、编码都是 CPU 密集操作，统一通过 image_pool 放到进程池执行，不阻塞事件循环；
+本模块的处理函数只接收路径和数字参数，可以直接提交到进程池
+"""
+import os
+import time
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Tuple
+from PIL import Image, ImageOps
+from app.core.config import settings
+
+# EXIF 方向标签
+EXIF_ORIENTATION = 0x0112
+
+# 缩略图尺寸（长边不超过该值）和格式 {扩展名: (Pillow 格式, MIME类型)}
+THUMBNAIL_SIZES = (128, 256, 512)
+THUMBNAIL_FORMATS = {"webp": ("WEBP", "image/webp"), "jpg": ("JPEG", "image/jpeg")}
+
+
+class ImagePool:
+    """图片处理进程池（首次使用时创建，应用关闭时释放）；IMAGE_PROCESS_WORKERS=0 时改用线程"""
+
+    def __init__(self):
+        self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=settings.IMAGE_PROCESS_WORKERS)
+        return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """在进程池中执行 fn(*args) 并等待结果"""
+        if settings.IMAGE_PROCESS_WORKERS <= 0:
+            return await asyncio.to_thread(fn, *args)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        except BrokenProcessPool:
+            # 工作进程异常退出（如处理超大图片时被 OOM 杀掉）：重建进程池后重试一次
+            print("⚠️ 图片处理进程池异常，重建后重试")
+            self._executor = None
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+image_pool = ImagePool()
+
+
+def fit_within(width: int, height: int, max_width: int, max_height: int) -> Tuple[int, int]:
+    """等比缩小到 max_width × max_height 以内（不放大）"""
+    scale = min(1.0, max_width / width, max_height / height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _to_rgb(im: Image.Image) -> Image.Image:
+    """转为 RGB，透明部分铺白底"""
+    if im.mode in ("RGBA", "LA") or (im.mode == "P" and "transparency" in im.info):
+        rgba = im.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    if im.mode != "RGB":
+        return im.convert("RGB")
+    return im
+
+
+def read_image_size(path: str) -> Tuple[int, int]:
+    """
+    读取图片的显示尺寸（只解析文件头，不解码像素；EXIF 方向为旋转 90° 时宽高互换）
+
+    Raises:
+        PIL.UnidentifiedImageError: 不是可识别的图片
+    """
+    with Image.open(path) as im:
+        width, height = im.size
+        if im.format == "JPEG" or im.format == "WEBP":
+            if im.getexif().get(EXIF_ORIENTATION, 1) in (5, 6, 7, 8):
+                width, height = height, width
+    return width, height
+
+
+def generate_thumbnails(src_path: str, out_dir: str, quality: int) -> dict:
+    """
+    生成全部尺寸和格式的缩略图（在进程池中执行）
+
+    原图只解码一次，从大到小逐级缩小；文件名为 thumb-<尺寸>.<扩展名>，先写临时文件再原子重命名
+
+    Args:
+        src_path: 原图路径
+        out_dir: 输出目录
+        quality: 编码质量
+
+    Returns:
+        {"files": 生成的文件数, "seconds": 耗时}
+    """
+    started = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    files = 0
+    with Image.open(src_path) as source:
+        largest = max(THUMBNAIL_SIZES)
+        source.draft("RGB", (largest, largest))
+        im = ImageOps.exif_transpose(source)
+        if im.mode not in ("RGB", "RGBA"):
+            im = im.convert("RGBA" if im.mode in ("LA", "P") else "RGB")
+        for size in sorted(THUMBNAIL_SIZES, reverse=True):
+            target = fit_within(im.width, im.height, size, size)
+            if target != im.size:
+                im = im.resize(target, Image.Resampling.LANCZOS)
+            for ext, (fmt, _) in THUMBNAIL_FORMATS.items():
+                path = os.path.join(out_dir, f"thumb-{size}.{ext}")
+                part_path = f"{path}.{os.getpid()}.part"
+                try:
+                    if fmt == "JPEG":
+                        _to_rgb(im).save(part_path, fmt, quality=quality, optimize=True, progressive=True)
+                    else:
+                        im.save(part_path, fmt, quality=quality, method=4)
+                    os.replace(part_path, path)
+                except BaseException:
+                    if os.path.exists(part_path):
+                        os.remove(part_path)
+                    raise
+                files += 1
+    return {"files": files, "seconds": time.perf_counter() - started}
+
+
+def encode_reference_image(src_path: str, dst_path: str, max_width: int, max_height: int, quality: int) -> dict:
+    """
+    参考图预处理（在进程池中执行）
+
+    按 EXIF 方向摆正，等比缩小到 max_width × max_height 以内，编码为 JPEG 写入 dst_path；
+    原图已经是范围内、方向正常的 JPEG 且比重新编码更小时直接使用原图
+
+    Args:
+        src_path: 原图路径
+        dst_path: 输出路径（先写临时文件再原子重命名）
+        max_width: 最大宽度
+        max_height: 最大高度
+        quality: JPEG 质量
+
+    Returns:
+        {"width", "height", "bytes", "source_bytes", "seconds"}
+    """
+    started = time.perf_counter()
+    os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+    part_path = f"{dst_path}.{os.getpid()}.part"
+    try:
+        with Image.open(src_path) as source:
+            source_format, source_size = source.format, source.size
+            orientation = source.getexif().get(EXIF_ORIENTATION, 1)
+            # JPEG 解码时直接按 1/2、1/4、1/8 缩小（方向未知，按长边预留），省去全尺寸解码
+            longest = max(max_width, max_height)
+            source.draft("RGB", (longest, longest))
+            im = _to_rgb(ImageOps.exif_transpose(source))
+            size = fit_within(im.width, im.height, max_width, max_height)
+            unchanged = size == source_size and orientation == 1
+            if size != im.size:
+                im = im.resize(size, Image.Resampling.LANCZOS)
+            im.save(part_path, "JPEG", quality=quality, optimize=True, progressive=True)
+
+        source_bytes = os.path.getsize(src_path)
+        if unchanged and source_format == "JPEG" and source_bytes <= os.path.getsize(part_path):
+            with open(src_path, "rb") as src, open(part_path, "wb") as dst:
+                dst.write(src.read())
+        os.replace(part_path, dst_path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+
+    return {
+        "width": size[0],
+        "height": size[1],
+        "bytes": os.path.getsize(dst_path),
+        "source_bytes": source_bytes,
+        "seconds": time.perf_counter() - started
+    }
@@ -0,0 +1,249 @@
+"""
+媒体文件 HTTP 响应
+支持单区间 Range 请求（206）和 If-Range 校验，播放器拖动进度条时只传输需要的部分
+
+发送方式由 MEDIA_DELIVERY_MODE 决定：
+- app（默认）: 应用进程逐块读取发送
+- accel: 返回 X-Accel-Redirect，由 nginx 发送文件，应用进程不经手视频字节（生产部署使用）
+- sendfile: 仅当 ASGI 服务器提供零拷贝扩展（http.response.zerocopysend）时由服务器调用 os.sendfile 发送；
+  uvicorn 不提供该扩展，此时与 app 相同
+"""
+import os
+from email.utils import formatdate
+from typing import Optional, Tuple
+from urllib.parse import quote
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import Response, PlainTextResponse
+from starlette.types import Receive, Scope, Send
+from app.core.config import settings
+from app.core.metrics import metrics
+
+CHUNK_SIZE = 256 * 1024
+
+ZERO_COPY_EXTENSION = "http.response.zerocopysend"
+
+media_responses = metrics.counter(
+    "media_file_responses_total",
+    "Local media file responses by delivery method (accel=nginx X-Accel-Redirect, sendfile=ASGI zero-copy send, app=userspace read loop)",
+    ["method"]
+)
+media_bytes = metrics.counter(
+    "media_file_bytes_total",
+    "Media bytes sent by this process (sendfile and app delivery; accel bytes are sent by nginx)",
+    ["method"]
+)
+
+
+class RangeNotSatisfiable(Exception):
+    """请求的区间超出文件范围（416）"""
+    pass
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析单区间 Range 头
+
+    Args:
+        header: Range 请求头，如 bytes=0-、bytes=100-199、bytes=-500
+        size: 内容总字节数
+
+    Returns:
+        (start, end) 闭区间；没有 Range、格式无法识别或多区间时返回 None（按完整内容响应）
+
+    Raises:
+        RangeNotSatisfiable: 区间起点超出内容大小
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep or (first and not first.isdigit()) or (last and not last.isdigit()):
+        return None
+
+    if not first:
+        # 后缀区间：最后 N 字节
+        if not last or int(last) == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        return max(size - int(last), 0), size - 1
+
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    end = int(last) if last else size - 1
+    return start, min(end, size - 1)
+
+
+def if_range_matches(if_range: Optional[str], etag: Optional[str], last_modified: Optional[str]) -> bool:
+    """
+    If-Range 校验：客户端缓存的版本与当前文件一致时才按 Range 响应，否则返回完整内容
+
+    ETag 需要强比较（弱 ETag 一律视为不一致），日期需要与 Last-Modified 完全相同
+    """
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith("W/"):
+        return False
+    if if_range.startswith('"'):
+        return bool(etag) and not etag.startswith("W/") and if_range == etag
+    return if_range == last_modified
+
+
+class RangeFileResponse(Response):
+    """
+    本地文件响应（支持 Range）
+
+    带 ETag / Last-Modified / Accept-Ranges / Content-Length；If-None-Match 命中时返回 304，
+    单区间 Range 返回 206 + Content-Range，超出范围返回 416，If-Range 不一致时返回完整文件。
+    zero_copy=True 且 ASGI 服务器提供零拷贝扩展时，文件内容交给服务器 sendfile 发送
+    """
+
+    def __init__(
+        self,
+        path: str,
+        media_type: str = "application/octet-stream",
+        filename: Optional[str] = None,
+        etag: Optional[str] = None,
+        headers: Optional[dict] = None,
+        zero_copy: bool = False
+    ):
+        self.path = path
+        self.status_code = 200
+        self.media_type = media_type
+        self.etag = etag
+        self.zero_copy = zero_copy
+        self.background = None
+        self.init_headers(headers)
+        if filename:
+            self.headers.setdefault("content-disposition", f'attachment; filename="{filename}"')
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+        except FileNotFoundError:
+            # 校验存在后被淘汰
+            await PlainTextResponse("Not Found", status_code=404)(scope, receive, send)
+            return
+
+        size = stat_result.st_size
+        etag = self.etag or f'"{stat_result.st_mtime_ns:x}-{size:x}"'
+        last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+        self.headers.setdefault("etag", etag)
+        self.headers.setdefault("last-modified", last_modified)
+        self.headers["accept-ranges"] = "bytes"
+
+        request_headers = Headers(scope=scope)
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+            self.status_code = 304
+            await send({"type": "http.response.start", "status": 304, "headers": self.raw_headers})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        start, end = 0, size - 1
+        try:
+            byte_range = None
+            if if_range_matches(request_headers.get("if-range"), etag, last_modified):
+                byte_range = parse_range(request_headers.get("range"), size)
+        except RangeNotSatisfiable:
+            self.status_code = 416
+            self.headers["content-range"] = f"bytes */{size}"
+            start, end = 0, -1
+        else:
+            if byte_range is not None:
+                start, end = byte_range
+                self.status_code = 206
+                self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+        self.headers["content-length"] = str(end - start + 1)
+
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"] == "HEAD" or end < start:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        if self.zero_copy and ZERO_COPY_EXTENSION in scope.get("extensions", {}):
+            media_responses.inc(method="sendfile")
+            media_bytes.inc(end - start + 1, method="sendfile")
+            with open(self.path, "rb") as f:
+                await send({
+                    "type": ZERO_COPY_EXTENSION,
+                    "file": f,
+                    "offset": start,
+                    "count": end - start + 1,
+                    "more_body": False
+                })
+            return
+
+        media_responses.inc(method="app")
+        media_bytes.inc(end - start + 1, method="app")
+        remaining = end - start + 1
+        async with await anyio.open_file(self.path, mode="rb") as f:
+            await f.seek(start)
+            while remaining > 0:
+                chunk = await f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class AccelRedirectResponse(Response):
+    """
+    X-Accel-Redirect 响应：应用只负责鉴权，文件由 nginx 的 internal location 发送
+
+    Range / If-Range / ETag 由 nginx 按静态文件处理；Content-Type、Content-Disposition 等响应头会保留
+    """
+
+    def __init__(
+        self,
+        uri: str,
+        media_type: str = "application/octet-stream",
+        filename: Optional[str] = None,
+        headers: Optional[dict] = None
+    ):
+        super().__init__(content=b"", media_type=media_type, headers=headers)
+        self.headers["x-accel-redirect"] = uri
+        if filename:
+            self.headers.setdefault("content-disposition", f'attachment; filename="{filename}"')
+
+
+def media_file_response(
+    path: str,
+    root: str,
+    media_type: str = "application/octet-stream",
+    filename: Optional[str] = None,
+    etag: Optional[str] = None,
+    mode: Optional[str] = None,
+    headers: Optional[dict] = None
+) -> Response:
+    """
+    按发送方式返回本地媒体文件（调用前需完成鉴权并确认文件存在）
+
+    Args:
+        path: 文件路径
+        root: 对应 MEDIA_ACCEL_PREFIX 的本地目录（accel 模式下用于换算 internal 地址）
+        media_type: Content-Type
+        filename: 作为附件下载时的文件名
+        etag: ETag（默认由文件修改时间和大小生成）
+        mode: 发送方式，默认 settings.MEDIA_DELIVERY_MODE
+        headers: 附加响应头
+
+    Returns:
+        Response对象
+    """
+    mode = mode or settings.MEDIA_DELIVERY_MODE
+    if mode == "accel":
+        relative = os.path.relpath(path, root).replace(os.sep, "/")
+        if not relative.startswith("../"):
+            media_responses.inc(method="accel")
+            uri = settings.MEDIA_ACCEL_PREFIX.rstrip("/") + "/" + quote(relative)
+            return AccelRedirectResponse(uri, media_type=media_type, filename=filename, headers=headers)
+    return RangeFileResponse(
+        path, media_type=media_type, filename=filename, etag=etag, headers=headers, zero_copy=(mode == "sendfile")
+    )
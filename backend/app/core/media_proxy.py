@@ -0,0 +1,43 @@
+"""
+视频回源代理的共享 HTTP 客户端
+播放/下载未缓存的视频时复用连接池（keep-alive），不为每个请求新建客户端、重新建连和 TLS 握手
+"""
+from typing import Optional
+import httpx
+from app.core.config import settings
+
+# 进程内共享的客户端（由 FastAPI 关闭事件释放）
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _build_client() -> httpx.AsyncClient:
+    """按配置创建回源客户端（校验证书，跟随重定向）"""
+    return httpx.AsyncClient(
+        follow_redirects=True,
+        limits=httpx.Limits(
+            max_connections=settings.MEDIA_PROXY_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.MEDIA_PROXY_MAX_KEEPALIVE_CONNECTIONS,
+        ),
+        timeout=httpx.Timeout(
+            settings.MEDIA_PROXY_TIMEOUT_SEC,
+            connect=10.0,
+            # 连接数已满时尽快失败，由调用方回退到重定向源站
+            pool=5.0,
+        ),
+    )
+
+
+def get_proxy_client() -> httpx.AsyncClient:
+    """获取共享客户端（首次使用时创建）"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def close_proxy_client() -> None:
+    """应用关闭时释放连接池"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
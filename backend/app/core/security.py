@@ -1,11 +1,16 @@
 """
-安全模块：JWT认证、密码加密
+安全模块：JWT认证、密码加密、媒体地址签名
 """
+import time
+import hmac
+import base64
+import hashlib
 from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
+from typing import Optional, Tuple
+from jose import jwt
 from passlib.context import CryptContext
 from app.core.config import settings
+from app.core.auth_cache import decode_token, load_user
 
 # 密码加密上下文
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -36,7 +41,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 def verify_token(token: str) -> Optional[dict]:
     """
-    验证JWT令牌
+    验证JWT令牌（验证结果有缓存，见 app.core.auth_cache）
     
     Args:
         token: JWT token字符串
@@ -44,11 +49,49 @@ def verify_token(token: str) -> Optional[dict]:
     Returns:
         解码后的数据，验证失败返回None
     """
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
-    except JWTError:
-        return None
+    return decode_token(token)
+
+
+def _media_url_key() -> bytes:
+    """媒体地址签名密钥（未单独配置时由 SECRET_KEY 派生，与 JWT 签名密钥隔离）"""
+    secret = settings.MEDIA_URL_SECRET or settings.SECRET_KEY
+    return hashlib.sha256(b"skyriff-media-url:" + secret.encode()).digest()
+
+
+def sign_media_url(video_id: int, user_id: int, expires_at: Optional[int] = None) -> Tuple[int, str]:
+    """
+    生成视频播放/下载地址签名
+
+    过期时间按 MEDIA_URL_EXPIRY_STEP_SEC 向上取整，同一用户同一视频在一个时间窗内拿到的地址相同，
+    播放器和 nginx 可以按 URL 缓存
+
+    Args:
+        video_id: 视频ID
+        user_id: 用户ID
+        expires_at: 过期时间戳（秒），默认当前时间 + MEDIA_URL_TTL_SEC
+
+    Returns:
+        (过期时间戳, 签名)
+    """
+    if expires_at is None:
+        step = settings.MEDIA_URL_EXPIRY_STEP_SEC
+        expires_at = (int(time.time()) + settings.MEDIA_URL_TTL_SEC + step - 1) // step * step
+    message = f"{video_id}:{user_id}:{expires_at}".encode()
+    digest = hmac.new(_media_url_key(), message, hashlib.sha256).digest()[:16]
+    return expires_at, base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def verify_media_signature(video_id: int, user_id: int, expires_at: int, signature: str) -> bool:
+    """
+    校验视频播放/下载地址签名（纯计算，不访问数据库）
+
+    Returns:
+        签名有效且未过期返回True
+    """
+    if expires_at < time.time():
+        return False
+    _, expected = sign_media_url(video_id, user_id, expires_at)
+    return hmac.compare_digest(expected, signature)
 
 
 def hash_password(password: str) -> str:
@@ -84,6 +127,8 @@ from fastapi import HTTPException, status
 async def get_current_user_from_token(token: str, db: Session) -> User:
     """
     手动从Token获取当前用户（用于非Depends场景）
+    
+    返回的 User 来自认证缓存、不属于当前会话，需要修改用户时请重新查询
     """
     payload = verify_token(token)
     if not payload:
@@ -105,8 +150,10 @@ async def get_current_user_from_token(token: str, db: Session) -> User:
     except ValueError:
         raise HTTPException(status_code=401, detail="Invalid user ID in token")
         
-    user = db.query(User).filter(User.user_id == user_id).first()
+    user = load_user(db, user_id)
     if user is None:
         raise HTTPException(status_code=404, detail="用户不存在")
+    if user.status == "banned":
+        raise HTTPException(status_code=403, detail="账号已被禁用")
         
     return user
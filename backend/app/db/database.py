@@ -1,8 +1,14 @@
 """
 数据库连接与会话管理
+
+同步引擎（SessionLocal / get_db）供后台任务和尚未迁移的接口使用；
+异步引擎（AsyncSessionLocal / get_async_db）供高频接口使用，查询期间不阻塞事件循环
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.core.config import settings
 
 # 创建数据库引擎
@@ -19,19 +25,62 @@ engine = create_engine(
     connect_args=connect_args,
 )
 
+
+def async_database_url(url: str) -> str:
+    """
+    同步驱动的数据库URL转换为对应的异步驱动
+
+    Args:
+        url: 数据库URL（如 sqlite:///./skyriff.db、postgresql://...、postgresql+psycopg2://...）
+
+    Returns:
+        异步驱动URL（sqlite+aiosqlite / postgresql+asyncpg）
+
+    Raises:
+        ValueError: 不支持的数据库
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "sqlite":
+        return parsed.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    if backend == "postgresql":
+        return parsed.set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+    raise ValueError(f"异步引擎不支持的数据库: {backend}")
+
+
+# 创建异步数据库引擎
+# 显式使用连接池：aiosqlite 默认不复用连接，每个会话都要新开连接和线程
+async_url = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(
+    async_url,
+    echo=settings.DEBUG,
+    pool_pre_ping=True,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=settings.ASYNC_DB_POOL_SIZE,
+    max_overflow=settings.ASYNC_DB_MAX_OVERFLOW,
+    connect_args={"timeout": 30} if async_url.startswith("sqlite") else {},
+)
+
 # 启用 WAL 模式 (Write-Ahead Logging) 以提高并发性能
+def set_sqlite_pragma(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
 if settings.DATABASE_URL.startswith("sqlite"):
-    from sqlalchemy import event
-    @event.listens_for(engine, "connect")
-    def set_sqlite_pragma(dbapi_connection, connection_record):
-        cursor = dbapi_connection.cursor()
-        cursor.execute("PRAGMA journal_mode=WAL")
-        cursor.execute("PRAGMA synchronous=NORMAL")
-        cursor.close()
+    event.listen(engine, "connect", set_sqlite_pragma)
+if async_url.startswith("sqlite"):
+    event.listen(async_engine.sync_engine, "connect", set_sqlite_pragma)
 
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 异步会话工厂（提交后不过期对象：会话外读取已加载的列不会触发查询）
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 # 创建基类
 Base = declarative_base()
 
@@ -48,6 +97,18 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """
+    异步数据库会话依赖注入
+
+    服务层仍是同步的 Session 代码（后台任务和其他服务共用），通过 db.run_sync 在异步连接上执行：
+    每次数据库往返都交还事件循环，慢查询不会卡住同一进程里的其他请求和长连接；
+    run_sync 返回的 ORM 对象在会话外只能读取已加载的列，用到关系等延迟加载属性时请在 run_sync 内完成序列化
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def init_db():
     """
     初始化数据库（创建所有表）
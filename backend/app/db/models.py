@@ -477,7 +477,7 @@ class Task(Base):
     reference_image_asset_id = Column(BigInteger, nullable=True)
     
     # 状态
-    status = Column(String(20), default="QUEUED")  # QUEUED/IN_PROGRESS/SUCCESS/FAILURE
+    status = Column(String(20), default="QUEUED")  # PENDING_SUBMIT/QUEUED/IN_PROGRESS/SUCCESS/FAILURE
     progress = Column(Integer, default=0)  # 0-100
     
     # 结果
@@ -497,10 +497,26 @@ class Task(Base):
     started_at = Column(DateTime, nullable=True)
     completed_at = Column(DateTime, nullable=True)
     
+    # 轮询调度
+    next_poll_at = Column(DateTime, nullable=True)  # 下次同步供应商状态的时间
+    eta_at = Column(DateTime, nullable=True)  # 预计完成时间
+    last_callback_at = Column(DateTime, nullable=True)  # 最近一次收到供应商回调的时间
+    
+    # 异步提交（PENDING_SUBMIT 阶段）
+    submit_key = Column(String(64), nullable=True)  # 提交供应商的幂等键，重试/恢复时复用
+    submit_attempts = Column(Integer, default=0)  # 已尝试提交次数（同时作为抢占提交的版本号）
+    submit_lease_until = Column(DateTime, nullable=True)  # 提交租约到期时间，过期未完成的任务可被恢复
+    batch_id = Column(String(32), nullable=True)  # 批量生成的批次ID（如故事版一键生成）
+    
     __table_args__ = (
         Index('idx_tasks_user', 'user_id', 'created_at'),
         Index('idx_tasks_status', 'status'),
         Index('idx_tasks_vendor_task_id', 'vendor_task_id'),
+        Index('idx_tasks_status_next_poll', 'status', 'next_poll_at'),
+        Index('idx_tasks_status_submit_lease', 'status', 'submit_lease_until'),
+        Index('idx_tasks_status_started', 'status', 'started_at'),
+        Index('idx_tasks_source', 'source_type', 'source_id'),
+        Index('idx_tasks_batch', 'batch_id'),
     )
 
 
@@ -533,12 +549,49 @@ class VideoAsset(Base):
     # 下载次数
     download_count = Column(Integer, default=0)
     
+    # 本地缓存（由 VideoDownloadManager 维护，缓存完成后 watermarked_play_url 指向 /static/videos/）
+    source_play_url = Column(String(500), nullable=True)  # 供应商原始播放地址，用于回源
+    cache_status = Column(String(20), default="NONE")  # NONE/PENDING/CACHED/FAILED/EVICTED
+    cache_sha256 = Column(String(64), nullable=True)  # 本地文件SHA-256
+    cached_at = Column(DateTime, nullable=True)
+    cache_last_access_at = Column(DateTime, nullable=True)  # 最近一次播放/下载（LRU淘汰依据）
+    cache_hits = Column(Integer, default=0)  # 累计播放/下载次数（LFU淘汰依据）
+    
     # 时间
     created_at = Column(DateTime, server_default=func.now())
     
     __table_args__ = (
         Index('idx_video_assets_user', 'user_id', 'created_at'),
         Index('idx_video_assets_project', 'project_id'),
+        Index('idx_video_assets_cache', 'cache_status', 'cache_last_access_at'),
+    )
+
+
+class VideoDownloadJob(Base):
+    """视频缓存下载任务表（持久化队列，进程重启后继续下载）"""
+    __tablename__ = "video_download_jobs"
+    
+    job_id = Column(Integer, primary_key=True, autoincrement=True)
+    video_id = Column(Integer, nullable=False)
+    source_url = Column(String(500), nullable=False)
+    
+    status = Column(String(20), default="PENDING")  # PENDING/RUNNING/DONE/FAILED
+    attempts = Column(Integer, default=0)  # 已尝试次数（同时作为抢占的版本号）
+    next_attempt_at = Column(DateTime, nullable=True)  # 下次可尝试时间（失败退避）
+    lease_until = Column(DateTime, nullable=True)  # 下载租约到期时间，过期的 RUNNING 任务可被接手
+    
+    # 断点续传
+    bytes_downloaded = Column(BigInteger, default=0)
+    total_bytes = Column(BigInteger, nullable=True)
+    etag = Column(String(200), nullable=True)  # 续传时通过 If-Range 校验源文件未变
+    
+    last_error = Column(String(500), nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        Index('idx_video_download_jobs_video', 'video_id', unique=True),
+        Index('idx_video_download_jobs_status', 'status', 'next_attempt_at'),
     )
 
 
@@ -575,6 +628,8 @@ class MediaAsset(Base):
     file_url = Column(String(500), nullable=False)
     file_size_bytes = Column(BigInteger, nullable=True)
     mime_type = Column(String(100), nullable=True)
+    sha256 = Column(String(64), nullable=True)  # 文件内容SHA-256（上传时边写边算）
+    blob_sha256 = Column(String(64), nullable=True)  # 引用的存储块（media_blobs），为空表示旧版独立文件
     
     # 图片专用
     width = Column(Integer, nullable=True)
@@ -585,6 +640,47 @@ class MediaAsset(Base):
     
     __table_args__ = (
         Index('idx_media_assets_user', 'user_id', 'created_at'),
+        Index('idx_media_assets_blob', 'blob_sha256'),
+    )
+
+
+class MediaBlob(Base):
+    """内容寻址存储块表（相同内容的上传文件只保存一份，按引用计数删除）"""
+    __tablename__ = "media_blobs"
+    
+    sha256 = Column(String(64), primary_key=True)
+    storage_path = Column(String(255), nullable=False)  # 相对 UPLOAD_DIR 的路径，如 blobs/ab/<sha256>.jpg
+    size_bytes = Column(BigInteger, nullable=False)
+    mime_type = Column(String(100), nullable=True)
+    ref_count = Column(Integer, nullable=False, default=0)  # 引用的媒体资产数，-1 表示正在删除
+    
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, nullable=True)  # 引用计数最近变化时间
+
+
+class UploadSession(Base):
+    """分块上传会话表（移动端弱网断点续传）"""
+    __tablename__ = "upload_sessions"
+    
+    upload_id = Column(String(32), primary_key=True)
+    user_id = Column(BigInteger, nullable=False)
+    
+    filename = Column(String(255), nullable=True)  # 客户端原始文件名
+    mime_type = Column(String(100), nullable=False)
+    total_bytes = Column(BigInteger, nullable=False)
+    received_bytes = Column(BigInteger, default=0)  # 已确认写入的字节数（下一块的起始偏移）
+    sha256 = Column(String(64), nullable=True)  # 客户端声明的SHA-256，完成时校验
+    
+    status = Column(String(20), default="UPLOADING")  # UPLOADING/FINALIZING/COMPLETED
+    asset_id = Column(Integer, nullable=True)  # 完成后创建的媒体资产
+    expires_at = Column(DateTime, nullable=False)  # 每次写入后顺延
+    
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        Index('idx_upload_sessions_user', 'user_id', 'status'),
+        Index('idx_upload_sessions_expires', 'expires_at'),
     )
 
 
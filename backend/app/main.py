@@ -3,14 +3,26 @@ FastAPI主应用入口
 """
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.responses import FileResponse, HTMLResponse, PlainTextResponse
 import os
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.db.database import init_db
+from app.core.metrics import metrics
+from app.core.auth import AuthMiddleware
+from app.core.images import image_pool
+from app.core.media_proxy import close_proxy_client
+from app.db.database import init_db, async_engine
+from app.vendors.dyuapi_sora2 import DyuSora2Adapter
+from app.workers.task_poller import task_poller
+from app.workers.submission_scheduler import submission_scheduler
+from app.workers.submission_worker import submission_worker
+from app.workers.task_reaper import task_reaper
+from app.workers.video_downloader import video_downloader
+from app.workers.video_cache_evictor import video_cache_evictor
+from app.workers.upload_session_sweeper import upload_session_sweeper
 
 # 导入路由
-from app.api import auth, users, wallets, tasks, assets, works, social, storyboards, payments, subscriptions, tasks_center, rankings, withdrawals
+from app.api import auth, users, wallets, tasks, assets, works, social, storyboards, payments, subscriptions, tasks_center, rankings, withdrawals, webhooks
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -20,6 +32,10 @@ app = FastAPI(
     debug=settings.DEBUG
 )
 
+# 统一解析请求凭证（写入 request.state.principal，由 app.api.dependencies 读取）
+# 先注册的中间件在内层：CORS 预检请求不经过认证
+app.add_middleware(AuthMiddleware)
+
 # 配置CORS
 app.add_middleware(
     CORSMiddleware,
@@ -44,6 +60,7 @@ app.include_router(subscriptions.router)
 app.include_router(tasks_center.router)
 app.include_router(rankings.router)
 app.include_router(withdrawals.router)
+app.include_router(webhooks.router)
 
 # 挂载静态文件目录 (用于本地缓存视频)
 static_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static")
@@ -67,6 +84,12 @@ async def health_check():
     """健康检查"""
     return {"status": "healthy"}
 
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """运行指标（Prometheus 文本格式，按进程导出）"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/test-tool", response_class=HTMLResponse)
 async def test_tool():
     """前端测试工具静态页"""
@@ -88,12 +111,43 @@ async def startup_event():
     if settings.DEBUG:
         print("🗄️  Initializing database...")
         init_db()
+    
+    # 创建供应商共享连接池
+    await DyuSora2Adapter.startup()
+    
+    # 启动后台任务
+    if settings.BACKGROUND_WORKERS_ENABLED:
+        task_poller.start()
+        submission_worker.start()
+        task_reaper.start()
+        video_downloader.start()
+        video_cache_evictor.start()
+        upload_session_sweeper.start()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """应用关闭事件"""
     print(f"👋 {settings.APP_NAME} shutting down...")
+    
+    # 停止后台任务
+    await task_poller.stop()
+    await submission_worker.stop()
+    await task_reaper.stop()
+    await video_downloader.stop()
+    await video_cache_evictor.stop()
+    await upload_session_sweeper.stop()
+    await submission_scheduler.stop()
+    image_pool.shutdown()
+    
+    # 关闭供应商连接池
+    await DyuSora2Adapter.shutdown()
+    
+    # 关闭视频回源代理连接池
+    await close_proxy_client()
+    
+    # 关闭异步数据库连接池
+    await async_engine.dispose()
 
 
 if __name__ == "__main__":
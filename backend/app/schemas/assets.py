@@ -2,7 +2,7 @@
 资产相关Schema
 """
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Dict, Optional
 from datetime import datetime
 
 
@@ -20,6 +20,10 @@ class VideoAssetResponse(BaseModel):
     project_id: Optional[int] = None
     download_count: int = 0
     created_at: datetime
+    # 签名播放/下载地址（仅视频详情接口返回，相对路径，到期前可直接用于 <video src>）
+    stream_url: Optional[str] = None
+    download_url: Optional[str] = None
+    url_expires_at: Optional[int] = Field(default=None, description="签名地址过期时间戳（秒）")
     
     class Config:
         from_attributes = True
@@ -33,9 +37,30 @@ class MediaUploadResponse(BaseModel):
     file_size_bytes: Optional[int] = None
     width: Optional[int] = None
     height: Optional[int] = None
+    sha256: Optional[str] = None
+    thumbnail_urls: Optional[Dict[str, str]] = None  # {尺寸: WebP 缩略图地址}，同名 .jpg 为 JPEG 版本
     created_at: datetime
 
 
+class CreateUploadSessionRequest(BaseModel):
+    """创建分块上传会话请求"""
+    filename: Optional[str] = Field(None, max_length=255, description="原始文件名")
+    mime_type: str = Field(..., description="MIME类型：image/jpeg、image/png、image/webp")
+    total_bytes: int = Field(..., gt=0, description="文件总大小（字节）")
+    sha256: Optional[str] = Field(None, description="文件SHA-256（可选，完成时校验）")
+
+
+class UploadSessionResponse(BaseModel):
+    """分块上传会话响应"""
+    upload_id: str
+    offset: int = Field(..., description="已接收字节数，下一块从这里开始")
+    total_bytes: int
+    chunk_size: int = Field(..., description="建议的分块大小（字节）")
+    status: str
+    expires_at: datetime
+    asset_id: Optional[int] = None
+
+
 class DownloadUrlResponse(BaseModel):
     """下载链接响应"""
     download_url: str
@@ -42,8 +42,17 @@ class TaskResponse(BaseModel):
 class TaskStatusResponse(BaseModel):
     """任务状态响应（简化版）"""
     task_id: int
+    batch_id: Optional[str] = Field(None, description="批次ID（批量生成的任务）")
     status: str
     progress: int
     video_id: Optional[int] = None
     video_url: Optional[str] = None  # 新增
     error_message: Optional[str] = None
+    eta_sec: Optional[int] = Field(None, description="预计剩余生成时间（秒）")
+    next_poll_after_sec: Optional[int] = Field(None, description="建议客户端下次查询前等待的秒数")
+
+
+class ShotTaskStatusResponse(TaskStatusResponse):
+    """故事版镜头的最新任务状态"""
+    shot_id: int
+
@@ -2,7 +2,7 @@
 用户相关Schema
 """
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Dict, Optional
 from datetime import datetime
 
 
@@ -13,6 +13,7 @@ class UserProfile(BaseModel):
     avatar_url: Optional[str] = None
     bio: Optional[str] = None
     created_at: datetime
+    avatar_thumbnail_urls: Optional[Dict[str, str]] = None  # 头像缩略图地址（仅通过 avatar_asset_id 设置头像时返回）
     
     class Config:
         from_attributes = True
@@ -35,3 +36,4 @@ class UpdateProfileRequest(BaseModel):
     nickname: Optional[str] = Field(None, max_length=50)
     bio: Optional[str] = Field(None, max_length=500)
     avatar_url: Optional[str] = None
+    avatar_asset_id: Optional[int] = None  # 已上传图片的资产ID，头像使用其缩略图（同时传 avatar_url 时以此为准）
@@ -3,9 +3,13 @@
 """
 from sqlalchemy.orm import Session
 from typing import Optional
-from app.db.models import VideoAsset, Project, MediaAsset
+import os
+import shutil
+from app.core.config import settings
+from app.db.models import VideoAsset, Project, MediaAsset, Task
 from app.vendors.dyuapi_sora2 import DyuSora2Adapter
 from app.services.wallet_service import WalletService
+from app.services.blob_service import BlobService, derived_dir
 from app.core.constants import DOWNLOAD_NO_WATERMARK_COST
 
 
@@ -247,7 +251,9 @@ class AssetService:
         file_size_bytes: Optional[int] = None,
         mime_type: Optional[str] = None,
         width: Optional[int] = None,
-        height: Optional[int] = None
+        height: Optional[int] = None,
+        sha256: Optional[str] = None,
+        blob_sha256: Optional[str] = None
     ) -> MediaAsset:
         """
         创建媒体资产（上传后调用）
@@ -260,6 +266,8 @@ class AssetService:
             mime_type: MIME类型
             width: 宽度（图片）
             height: 高度（图片）
+            sha256: 文件内容SHA-256
+            blob_sha256: 引用的存储块（调用方已为其增加引用）
         
         Returns:
             MediaAsset对象
@@ -271,7 +279,9 @@ class AssetService:
             file_size_bytes=file_size_bytes,
             mime_type=mime_type,
             width=width,
-            height=height
+            height=height,
+            sha256=sha256,
+            blob_sha256=blob_sha256
         )
         
         self.db.add(media)
@@ -279,3 +289,46 @@ class AssetService:
         self.db.refresh(media)
         
         return media
+    
+    def delete_media_asset(self, asset_id: int, user_id: int):
+        """
+        删除媒体资产
+        
+        先删除资产再释放存储块引用：中途失败时最多留下一个多余的引用（文件不会被删除），
+        其他资产引用的同一内容不受影响
+        
+        Args:
+            asset_id: 媒体资产ID
+            user_id: 用户ID
+        
+        Raises:
+            ValueError: 资产不存在，或仍被待提交的任务使用
+        """
+        media = self.db.query(MediaAsset).filter(
+            MediaAsset.asset_id == asset_id,
+            MediaAsset.user_id == user_id
+        ).first()
+        
+        if not media:
+            raise ValueError("媒体资产不存在")
+        
+        # 提交供应商时才读取参考图
+        pending = self.db.query(Task.task_id).filter(
+            Task.reference_image_asset_id == asset_id,
+            Task.status == "PENDING_SUBMIT"
+        ).first()
+        if pending:
+            raise ValueError("参考图正在被待提交的任务使用，请稍后再删除")
+        
+        blob_sha256, file_url = media.blob_sha256, media.file_url
+        self.db.delete(media)
+        self.db.commit()
+        
+        if blob_sha256:
+            BlobService(self.db).release(blob_sha256)
+        elif file_url.startswith("/uploads/"):
+            # 旧版上传：每个资产一个独立文件
+            local_path = os.path.join(settings.UPLOAD_DIR, os.path.basename(file_url))
+            if os.path.exists(local_path):
+                os.remove(local_path)
+            shutil.rmtree(derived_dir(f"asset-{asset_id}"), ignore_errors=True)
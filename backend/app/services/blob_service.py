@@ -0,0 +1,187 @@
+"""
+内容寻址存储服务层
+上传文件按内容 SHA-256 存储为块（UPLOAD_DIR/blobs/ab/<sha256>.jpg），相同内容只保存一份；
+媒体资产通过 blob_sha256 引用存储块，media_blobs.ref_count 记录引用数，归零时删除文件
+
+引用计数只用条件更新维护，多进程并发上传/删除同一内容时不会丢文件：
+删除方先把引用数从 0 抢占为 -1（正在删除），之后新的引用不会再落到该存储块上，
+而是等删除完成（行被删除）后重新创建存储块
+"""
+import os
+import shutil
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.db.models import MediaBlob
+
+BLOB_DIR = "blobs"
+DERIVED_DIR = "derived"
+
+MIME_EXTENSIONS = {"image/jpeg": ".jpg", "image/jpg": ".jpg", "image/png": ".png", "image/webp": ".webp"}
+
+# 存储块正在删除时，新引用的重试次数和间隔
+ACQUIRE_ATTEMPTS = 5
+ACQUIRE_RETRY_DELAY_SEC = 0.05
+
+# 正在删除状态超过该时长，视为删除进程已中断，由后来者完成删除
+DELETING_STALE_SEC = 60
+
+blob_acquires = metrics.counter(
+    "media_blob_acquires_total",
+    "Uploads stored as content-addressed blobs (new=first copy written, dedup=existing blob referenced)",
+    ["result"]
+)
+
+
+def blob_storage_path(sha256: str, mime_type: Optional[str]) -> str:
+    """存储块相对 UPLOAD_DIR 的路径（按哈希前两位分目录）"""
+    return f"{BLOB_DIR}/{sha256[:2]}/{sha256}{MIME_EXTENSIONS.get(mime_type, '')}"
+
+
+def blob_file_path(storage_path: str) -> str:
+    """存储块的本地路径"""
+    return os.path.join(settings.UPLOAD_DIR, *storage_path.split("/"))
+
+
+def derived_dir(key: str) -> str:
+    """派生文件（预处理后的参考图、缩略图等）目录；key 为存储块 SHA-256 时随存储块一起删除"""
+    return os.path.join(settings.UPLOAD_DIR, DERIVED_DIR, key[:2], key)
+
+
+class BlobService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    async def acquire(self, sha256: str, temp_path: str, size: int, mime_type: Optional[str]) -> MediaBlob:
+        """
+        把已写完并算好哈希的临时文件纳入存储，并增加一个引用
+
+        已有相同内容的存储块时只增加引用计数、删除临时文件；否则临时文件移动为新的存储块。
+        调用方随后需要创建引用该存储块的媒体资产
+
+        Args:
+            sha256: 文件内容SHA-256
+            temp_path: 临时文件路径（需与 UPLOAD_DIR 在同一文件系统）
+            size: 文件大小
+            mime_type: MIME类型
+
+        Returns:
+            MediaBlob对象
+
+        Raises:
+            ValueError: 存储块一直处于删除中
+        """
+        for attempt in range(ACQUIRE_ATTEMPTS):
+            referenced = self.db.query(MediaBlob).filter(
+                MediaBlob.sha256 == sha256,
+                MediaBlob.ref_count >= 0
+            ).update({
+                "ref_count": MediaBlob.ref_count + 1,
+                "updated_at": datetime.utcnow()
+            }, synchronize_session=False)
+            self.db.commit()
+
+            if not referenced:
+                self.db.add(MediaBlob(
+                    sha256=sha256,
+                    storage_path=blob_storage_path(sha256, mime_type),
+                    size_bytes=size,
+                    mime_type=mime_type,
+                    ref_count=1,
+                    updated_at=datetime.utcnow()
+                ))
+                try:
+                    self.db.commit()
+                except IntegrityError:
+                    # 并发创建了同一存储块，或它正在删除：重试
+                    self.db.rollback()
+                    self._finish_stale_delete(sha256)
+                    await asyncio.sleep(ACQUIRE_RETRY_DELAY_SEC * (attempt + 1))
+                    continue
+
+            blob = self.db.query(MediaBlob).filter(MediaBlob.sha256 == sha256).first()
+            self.db.refresh(blob)
+            path = blob_file_path(blob.storage_path)
+            if os.path.exists(path):
+                os.remove(temp_path)
+                blob_acquires.inc(result="dedup")
+            else:
+                # 新存储块，或者创建方尚未移动文件（内容相同，替换是安全的）
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(temp_path, path)
+                blob_acquires.inc(result="new")
+            return blob
+
+        raise ValueError("文件正在清理，请稍后重试")
+
+    def release(self, sha256: str) -> bool:
+        """
+        释放一个引用（媒体资产删除后调用），引用归零时删除存储块
+
+        Args:
+            sha256: 存储块SHA-256
+
+        Returns:
+            是否删除了存储块
+        """
+        self.db.query(MediaBlob).filter(
+            MediaBlob.sha256 == sha256,
+            MediaBlob.ref_count > 0
+        ).update({
+            "ref_count": MediaBlob.ref_count - 1,
+            "updated_at": datetime.utcnow()
+        }, synchronize_session=False)
+        self.db.commit()
+
+        # 抢占删除：只有引用数为 0 时才能置为 -1，并发的新引用此后会等待删除完成
+        claimed = self.db.query(MediaBlob).filter(
+            MediaBlob.sha256 == sha256,
+            MediaBlob.ref_count == 0
+        ).update({
+            "ref_count": -1,
+            "updated_at": datetime.utcnow()
+        }, synchronize_session=False)
+        self.db.commit()
+        if not claimed:
+            return False
+
+        self._remove(sha256)
+        return True
+
+    def _finish_stale_delete(self, sha256: str) -> None:
+        """删除进程中断时，存储块会停在 -1：超时后由后来者抢占并完成删除"""
+        blob = self.db.query(MediaBlob).filter(
+            MediaBlob.sha256 == sha256,
+            MediaBlob.ref_count == -1
+        ).first()
+        if not blob or (blob.updated_at and blob.updated_at > datetime.utcnow() - timedelta(seconds=DELETING_STALE_SEC)):
+            return
+        # 以 updated_at 作版本号抢占，只有一个后来者会执行删除
+        claimed = self.db.query(MediaBlob).filter(
+            MediaBlob.sha256 == sha256,
+            MediaBlob.ref_count == -1,
+            MediaBlob.updated_at == blob.updated_at
+        ).update({"updated_at": datetime.utcnow()}, synchronize_session=False)
+        self.db.commit()
+        if claimed:
+            print(f"🧹 完成中断的存储块删除: {sha256}")
+            self._remove(sha256)
+
+    def _remove(self, sha256: str) -> None:
+        """删除已抢占（ref_count = -1）的存储块：先删文件再删行，行删除后才允许重新创建"""
+        blob = self.db.query(MediaBlob).filter(MediaBlob.sha256 == sha256).first()
+        if blob:
+            try:
+                os.remove(blob_file_path(blob.storage_path))
+            except FileNotFoundError:
+                pass
+        shutil.rmtree(derived_dir(sha256), ignore_errors=True)
+        self.db.query(MediaBlob).filter(
+            MediaBlob.sha256 == sha256,
+            MediaBlob.ref_count == -1
+        ).delete(synchronize_session=False)
+        self.db.commit()
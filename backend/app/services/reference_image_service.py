@@ -0,0 +1,138 @@
+"""
+参考图预处理服务层
+图生视频的参考图按目标比例缩小到供应商的最大有效分辨率、重新编码为 JPEG 后再转为 Base64 Data URI，
+避免把最大 10MB 的原图（约 13MB Data URI）放进每个提交请求
+
+预处理结果按存储块缓存在磁盘（derived/<sha256>/ref-<宽>x<高>.jpg），Data URI 另有进程内 LRU 缓存；
+缩放和编码在图片处理进程池中执行，不阻塞事件循环
+"""
+import os
+import base64
+import asyncio
+from collections import OrderedDict
+from typing import Optional, Tuple
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.images import image_pool, encode_reference_image
+from app.core.metrics import metrics
+from app.db.models import MediaAsset, MediaBlob
+from app.services.blob_service import blob_file_path, derived_dir
+from app.vendors.dyuapi_sora2 import DyuSora2Adapter
+
+reference_variants = metrics.counter(
+    "reference_image_variants_total",
+    "Reference image variant lookups (hit=reused a cached variant, encoded=resized and re-encoded)",
+    ["result"]
+)
+reference_encode_duration = metrics.histogram(
+    "reference_image_encode_seconds",
+    "Time to resize and re-encode one reference image (in the image process pool)",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+reference_payload_bytes = metrics.histogram(
+    "reference_image_payload_bytes",
+    "Reference image size before (source) and after (encoded) preprocessing",
+    ["stage"],
+    buckets=(32 * 1024, 64 * 1024, 128 * 1024, 256 * 1024, 512 * 1024, 1024 ** 2, 2 * 1024 ** 2, 5 * 1024 ** 2, 10 * 1024 ** 2)
+)
+data_uri_cache_requests = metrics.counter(
+    "media_data_uri_cache_total",
+    "Reference image data URI lookups by result",
+    ["result"]
+)
+
+# 进程内 Data URI 缓存 {预处理文件路径: data_uri}（内容寻址，不会过期，按总字节数 LRU 淘汰）
+_data_uri_cache: "OrderedDict[str, str]" = OrderedDict()
+_data_uri_cache_bytes = 0
+
+# 同一张参考图的并发预处理只执行一次
+_encoding: dict = {}
+
+
+def _read_data_uri(path: str) -> str:
+    with open(path, "rb") as f:
+        return "data:image/jpeg;base64," + base64.b64encode(f.read()).decode("ascii")
+
+
+async def _cached_data_uri(path: str) -> str:
+    """预处理文件的 Data URI（按路径缓存，文件内容由路径唯一确定）"""
+    global _data_uri_cache_bytes
+    data_uri = _data_uri_cache.get(path)
+    if data_uri is not None:
+        _data_uri_cache.move_to_end(path)
+        data_uri_cache_requests.inc(result="hit")
+        return data_uri
+
+    data_uri_cache_requests.inc(result="miss")
+    data_uri = await asyncio.to_thread(_read_data_uri, path)
+    if len(data_uri) <= settings.MEDIA_DATA_URI_CACHE_BYTES:
+        _data_uri_cache[path] = data_uri
+        _data_uri_cache_bytes += len(data_uri)
+        while _data_uri_cache_bytes > settings.MEDIA_DATA_URI_CACHE_BYTES:
+            _, evicted = _data_uri_cache.popitem(last=False)
+            _data_uri_cache_bytes -= len(evicted)
+    return data_uri
+
+
+class ReferenceImageService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _source(self, media: MediaAsset) -> Optional[Tuple[str, str]]:
+        """参考图原文件路径和派生文件缓存键；不是本地上传的图片返回 None"""
+        if media.blob_sha256:
+            blob = self.db.query(MediaBlob).filter(MediaBlob.sha256 == media.blob_sha256).first()
+            if blob:
+                return blob_file_path(blob.storage_path), blob.sha256
+        if media.file_url.startswith("/uploads/"):
+            # 旧版上传：每个资产一个独立文件
+            return os.path.join(settings.UPLOAD_DIR, os.path.basename(media.file_url)), f"asset-{media.asset_id}"
+        return None
+
+    async def build_input(self, media: MediaAsset, ratio: Optional[str], model: Optional[str]) -> Optional[str]:
+        """
+        生成提交给供应商的参考图 Data URI
+
+        Args:
+            media: 参考图媒体资产
+            ratio: 视频比例
+            model: 模型名称（HD 模型使用更高的分辨率上限）
+
+        Returns:
+            Data URI；不是本地上传的图片或原文件不存在时返回 None（调用方直接使用原始URL）
+
+        Raises:
+            OSError: 读取或写入文件失败
+            PIL.UnidentifiedImageError: 无法识别的图片
+        """
+        source = self._source(media)
+        if not source or not os.path.exists(source[0]):
+            return None
+        source_path, key = source
+
+        max_width, max_height = DyuSora2Adapter.get_reference_image_size(ratio, model)
+        variant_path = os.path.join(derived_dir(key), f"ref-{max_width}x{max_height}.jpg")
+        if os.path.exists(variant_path):
+            reference_variants.inc(result="hit")
+        else:
+            pending = _encoding.get(variant_path)
+            if pending is None:
+                pending = _encoding[variant_path] = asyncio.ensure_future(image_pool.run(
+                    encode_reference_image, source_path, variant_path, max_width, max_height,
+                    settings.REFERENCE_IMAGE_QUALITY
+                ))
+                pending.add_done_callback(lambda _: _encoding.pop(variant_path, None))
+                result = await asyncio.shield(pending)
+                reference_variants.inc(result="encoded")
+                reference_encode_duration.observe(result["seconds"])
+                reference_payload_bytes.observe(result["source_bytes"], stage="source")
+                reference_payload_bytes.observe(result["bytes"], stage="encoded")
+                print(
+                    f"🖼️ 参考图预处理 asset={media.asset_id}: {result['source_bytes'] / 1024:.0f}KB → "
+                    f"{result['bytes'] / 1024:.0f}KB ({result['width']}x{result['height']}, {result['seconds'] * 1000:.0f}ms)"
+                )
+            else:
+                await asyncio.shield(pending)
+                reference_variants.inc(result="hit")
+
+        return await _cached_data_uri(variant_path)
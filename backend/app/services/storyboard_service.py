@@ -377,7 +377,7 @@ class StoryboardService:
         
         return ordered_shots
     
-    def batch_generate(
+    async def batch_generate(
         self,
         storyboard_id: int,
         user_id: int,
@@ -389,10 +389,9 @@ class StoryboardService:
         
         业务流程：
         1. 获取所有镜头
-        2. 计算总费用
-        3. 扣除积分
-        4. 并行创建所有任务
-        5. 返回任务ID列表
+        2. 创建所有任务并一次性预扣总积分（同一事务）
+        3. 后台并发提交供应商（受提交并发上限和速率限制约束），单个镜头失败时单独退款
+        4. 返回批次ID和任务ID列表
         
         Args:
             storyboard_id: 故事版ID
@@ -401,7 +400,7 @@ class StoryboardService:
             model: 生成模型
         
         Returns:
-            包含task_ids的字典
+            包含batch_id、task_ids的字典
         """
         # 1. 获取故事版和镜头
         storyboard = self.get_storyboard(storyboard_id, user_id)
@@ -410,36 +409,30 @@ class StoryboardService:
         if not shots:
             raise ValueError("故事版没有镜头，无法生成")
         
-        # 2. 计算总费用
-        total_cost = sum(shot.duration_sec for shot in shots)
-        
-        # 3. 检查积分余额
-        from app.db.models import CreditWallet
-        wallet = self.db.query(CreditWallet).filter(
-            CreditWallet.user_id == user_id
-        ).first()
-        
-        if not wallet or wallet.balance_credits < total_cost:
-            raise ValueError(f"积分不足：需要{total_cost}积分，当前余额{wallet.balance_credits if wallet else 0}积分")
-        
-        # 4. 并行创建所有任务
-        task_ids = []
-        for shot in shots:
-            task = self.task_service.create_task(
-                user_id=user_id,
-                prompt=shot.prompt,
-                duration_sec=shot.duration_sec,
-                ratio=ratio,
-                model=model,
-                source_type="storyboard_shot",
-                source_id=shot.shot_id,
-                project_id=storyboard.project_id,
-                reference_image_asset_id=shot.reference_image_asset_id
-            )
-            task_ids.append(task.task_id)
+        # 2. 创建任务并预扣总积分
+        batch_id, tasks = await self.task_service.create_batch(
+            user_id=user_id,
+            items=[
+                {
+                    "prompt": shot.prompt,
+                    "duration_sec": shot.duration_sec,
+                    "reference_image_asset_id": shot.reference_image_asset_id,
+                    "source_id": shot.shot_id,
+                }
+                for shot in shots
+            ],
+            ratio=ratio,
+            project_id=storyboard.project_id,
+            model=model,
+            source_type="storyboard_shot",
+            hold_ref_type="storyboard",
+            hold_ref_id=storyboard_id,
+            description=f"故事版批量生成{len(shots)}个镜头（预扣）"
+        )
         
         return {
-            "task_ids": task_ids,
-            "total_cost_credits": total_cost,
+            "batch_id": batch_id,
+            "task_ids": [task.task_id for task in tasks],
+            "total_cost_credits": sum(task.cost_credits for task in tasks),
             "shot_count": len(shots)
         }
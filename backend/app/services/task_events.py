@@ -0,0 +1,140 @@
+"""
+任务事件发布/订阅（进程内）
+状态同步路径（轮询器、回调、提交器）在任务状态变化后发布事件，SSE 连接按用户订阅
+
+注意：只覆盖本进程内发生的变化，多 worker 部署时 SSE 接口会定期回查数据库补齐其他进程的变化
+"""
+import time
+import asyncio
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Set
+from app.core.metrics import metrics
+
+# 每个用户保留的最近事件数与保留时长（用于 Last-Event-ID 断线续传）
+EVENT_BUFFER_SIZE = 100
+EVENT_BUFFER_TTL_SEC = 600
+
+sse_connections = metrics.gauge(
+    "task_event_connections",
+    "Open task event (SSE) connections in this process"
+)
+events_published = metrics.counter(
+    "task_events_published_total",
+    "Task status events published to in-process subscribers"
+)
+
+
+@dataclass
+class TaskEvent:
+    """任务状态事件（data 为完整的任务状态，客户端按 task_id 覆盖即可）"""
+    event_id: int
+    user_id: int
+    data: dict
+
+
+@dataclass(eq=False)
+class Subscription:
+    user_id: int
+    loop: asyncio.AbstractEventLoop
+    queue: asyncio.Queue = field(default_factory=asyncio.Queue)
+
+
+class TooManyConnections(Exception):
+    """超过单用户连接数上限"""
+    pass
+
+
+class TaskEventBus:
+    """按用户分发的任务事件总线，可从任意线程发布"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._buffers: Dict[int, Deque[TaskEvent]] = {}
+        self._last_id = 0
+        self._published = 0
+
+    def next_event_id(self) -> int:
+        """
+        生成事件ID：毫秒时间戳 * 1000 + 序号
+
+        跨进程大致单调，可从ID反推时间，断线续传时用于回查数据库
+        """
+        with self._lock:
+            event_id = max(int(time.time() * 1000) * 1000, self._last_id + 1)
+            self._last_id = event_id
+            return event_id
+
+    @staticmethod
+    def event_time(event_id: int) -> float:
+        """事件ID对应的 Unix 时间戳（秒）"""
+        return event_id / 1000 / 1000
+
+    def connection_count(self, user_id: int) -> int:
+        return len(self._subscribers.get(user_id, ()))
+
+    def subscribe(self, user_id: int, max_connections: int) -> Subscription:
+        """
+        订阅某用户的任务事件
+
+        Raises:
+            TooManyConnections: 已达到该用户的连接数上限
+        """
+        subscription = Subscription(user_id=user_id, loop=asyncio.get_running_loop())
+        with self._lock:
+            subscribers = self._subscribers.setdefault(user_id, set())
+            if len(subscribers) >= max_connections:
+                raise TooManyConnections(f"同一用户最多 {max_connections} 个事件连接")
+            subscribers.add(subscription)
+        sse_connections.inc()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers and subscription in subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+                sse_connections.dec()
+
+    def publish(self, user_id: int, data: dict) -> TaskEvent:
+        """发布一条任务状态事件"""
+        event = TaskEvent(event_id=self.next_event_id(), user_id=user_id, data=data)
+        with self._lock:
+            self._buffers.setdefault(user_id, deque(maxlen=EVENT_BUFFER_SIZE)).append(event)
+            subscribers = list(self._subscribers.get(user_id, ()))
+            self._published += 1
+            if self._published % 1000 == 0:
+                self._prune(event.event_id)
+
+        for subscription in subscribers:
+            subscription.loop.call_soon_threadsafe(subscription.queue.put_nowait, event)
+        events_published.inc()
+        return event
+
+    def _prune(self, now_event_id: int) -> None:
+        """清理长时间没有新事件的用户缓存（调用方持有锁）"""
+        cutoff = now_event_id - EVENT_BUFFER_TTL_SEC * 1000 * 1000
+        stale = [uid for uid, buffer in self._buffers.items() if buffer[-1].event_id < cutoff]
+        for uid in stale:
+            del self._buffers[uid]
+
+    def replay(self, user_id: int, last_event_id: int) -> Optional[List[TaskEvent]]:
+        """
+        取出 last_event_id 之后的缓存事件
+
+        Returns:
+            事件列表；缓存已不完整（最早事件晚于 last_event_id）时返回 None，调用方需回查数据库
+        """
+        with self._lock:
+            buffer = list(self._buffers.get(user_id, ()))
+        if not buffer or buffer[0].event_id > last_event_id:
+            return None
+        return [event for event in buffer if event.event_id > last_event_id]
+
+
+# 全局事件总线
+task_events = TaskEventBus()
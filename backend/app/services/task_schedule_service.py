@@ -0,0 +1,127 @@
+"""
+任务轮询调度服务
+根据模型历史耗时、视频时长和当前进度预测完成时间，计算每个任务的下次轮询时间
+"""
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.db.models import Task
+from app.core.config import settings
+from app.vendors.dyuapi_sora2 import DyuSora2Adapter
+
+
+# 无历史数据时按视频时长估算的生成耗时（秒）
+DEFAULT_GENERATION_SECONDS = {
+    10: 180,
+    15: 270,
+    25: 480,
+}
+
+# 历史耗时统计：样本窗口、最少样本数、缓存有效期
+HISTORY_SAMPLE_SIZE = 200
+HISTORY_MIN_SAMPLES = 10
+HISTORY_CACHE_TTL_SEC = 600
+
+# 下次轮询安排在预计剩余时间的该比例处
+POLL_REMAINING_FRACTION = 0.5
+
+# 进程内缓存 {(model, duration_sec): (过期时间戳, (p50, p90))}
+_history_cache: Dict[Tuple[str, int], Tuple[float, Tuple[float, float]]] = {}
+
+
+class TaskScheduleService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_duration_stats(self, model: Optional[str], duration_sec: int) -> Tuple[float, float]:
+        """
+        获取某模型的生成耗时分布（p50, p90，单位秒）
+
+        取最近成功任务的 completed_at - started_at，样本不足时回退到按时长的默认值
+
+        Args:
+            model: 模型名称
+            duration_sec: 视频时长
+
+        Returns:
+            (p50, p90)
+        """
+        key = (model or "", duration_sec)
+        cached = _history_cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        rows = self.db.query(Task.started_at, Task.completed_at).filter(
+            Task.status == "SUCCESS",
+            Task.model == model,
+            Task.duration_sec == duration_sec,
+            Task.started_at.isnot(None),
+            Task.completed_at.isnot(None)
+        ).order_by(Task.task_id.desc()).limit(HISTORY_SAMPLE_SIZE).all()
+
+        samples = sorted(
+            (completed - started).total_seconds()
+            for started, completed in rows
+            if completed > started
+        )
+
+        if len(samples) >= HISTORY_MIN_SAMPLES:
+            stats = (
+                samples[int(len(samples) * 0.5)],
+                samples[min(int(len(samples) * 0.9), len(samples) - 1)]
+            )
+        else:
+            default = DEFAULT_GENERATION_SECONDS.get(duration_sec, duration_sec * 18)
+            stats = (float(default), default * 1.5)
+
+        _history_cache[key] = (time.monotonic() + HISTORY_CACHE_TTL_SEC, stats)
+        return stats
+
+    def estimate_remaining(self, task: Task, now: Optional[datetime] = None) -> float:
+        """
+        预测任务剩余耗时（秒）
+
+        按进度外推的剩余耗时（已耗时 / 进度 - 已耗时）与按历史耗时估计的剩余耗时加权，
+        进度越高越信任进度；已超过中位耗时的任务改用 p90 作为总耗时估计
+
+        Args:
+            task: 任务对象
+            now: 当前时间
+
+        Returns:
+            预计剩余秒数
+        """
+        now = now or datetime.utcnow()
+        p50, p90 = self.get_duration_stats(task.model, task.duration_sec)
+        elapsed = max((now - task.started_at).total_seconds(), 0.0) if task.started_at else 0.0
+
+        expected_total = p50 if elapsed < p50 else p90
+        by_history = max(expected_total - elapsed, 0.0)
+        progress = task.progress or 0
+        if 0 < progress < 100 and elapsed > 0:
+            weight = progress / 100
+            by_progress = elapsed / weight - elapsed
+            return weight * by_progress + (1 - weight) * by_history
+
+        return by_history
+
+    def schedule(self, task: Task, now: Optional[datetime] = None) -> None:
+        """
+        为进行中的任务写入 eta_at 与 next_poll_at（不提交事务）
+
+        下次轮询安排在剩余时间的一半处，并限制在最短/最长间隔之间；
+        启用供应商回调时推迟到预计完成时间之后的宽限期（超时由 TaskTimeoutReaper 处理）
+        """
+        now = now or datetime.utcnow()
+        remaining = self.estimate_remaining(task, now)
+
+        if DyuSora2Adapter.webhooks_enabled():
+            # 已启用回调：轮询只作为兜底，回调逾期未到时才查询
+            delay = remaining + settings.DYUAPI_WEBHOOK_GRACE_SEC
+        else:
+            delay = remaining * POLL_REMAINING_FRACTION
+            delay = min(max(delay, settings.TASK_POLL_MIN_DELAY_SEC), settings.TASK_POLL_MAX_DELAY_SEC)
+
+        task.eta_at = now + timedelta(seconds=remaining)
+        task.next_poll_at = now + timedelta(seconds=delay)
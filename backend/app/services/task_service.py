@@ -2,26 +2,38 @@
 任务服务层
 """
 from sqlalchemy.orm import Session
-from datetime import datetime
-from app.db.models import Task, VideoAsset, UserStats, MediaAsset
+from datetime import datetime, timedelta
+from app.db.models import Task, VideoAsset, UserStats, MediaAsset, Shot
 from app.vendors.dyuapi_sora2 import DyuSora2Adapter
 from app.services.wallet_service import WalletService
+from app.services.task_schedule_service import TaskScheduleService
+from app.services.subscription_service import SubscriptionService
+from app.workers.submission_scheduler import submission_scheduler, SubmissionQueueTimeout
+from app.workers.submission_worker import submission_worker
+from app.services.task_events import task_events
+from app.services.video_cache_service import VideoCacheService
+from app.services.reference_image_service import ReferenceImageService
+from app.workers.video_downloader import video_downloader
 from app.core.constants import VIDEO_GENERATION_COSTS
-from typing import Optional
+from typing import Optional, List, Tuple
+from sqlalchemy import or_, func, select
+import asyncio
+import contextlib
 import httpx
 import random
-import os
-import base64
+import uuid
 from app.core.config import settings
 
 
-from app.db.database import SessionLocal
-
 class TaskService:
+    # 未到终态的任务状态（PENDING_SUBMIT 尚未提交供应商，轮询器只同步已有 vendor_task_id 的任务）
+    ACTIVE_STATUSES = ["PENDING_SUBMIT", "QUEUED", "IN_PROGRESS"]
+    
     def __init__(self, db: Session):
         self.db = db
         self.adapter = DyuSora2Adapter()
         self.wallet_service = WalletService(db)
+        self.schedule_service = TaskScheduleService(db)
     
     async def create_task(
         self,
@@ -34,14 +46,13 @@ class TaskService:
         model: Optional[str] = None
     ) -> Task:
         """
-        创建视频生成任务
+        创建视频生成任务（只落库，不等待供应商）
         
         业务流程：
         1. 计算费用
-        2. 预扣积分
-        3. 调用供应商API
-        4. 创建任务记录
-        5. 更新用户统计
+        2. 创建任务记录（PENDING_SUBMIT）并预扣积分（同一事务）
+        3. 更新用户统计
+        4. 交给后台提交器排队提交供应商，立即返回
         
         Args:
             user_id: 用户ID
@@ -55,61 +66,285 @@ class TaskService:
         Returns:
             Task对象
         """
+        if reference_image_asset_id:
+            self._check_reference_images(user_id, [reference_image_asset_id])
+        
         # 1. 计算费用（按时长）
         cost = VIDEO_GENERATION_COSTS.get(duration_sec, 10)
         
-        # 2. 预扣积分
+        # 2. 创建任务记录并预扣积分
+        task = self._build_task(
+            user_id=user_id,
+            prompt=prompt,
+            duration_sec=duration_sec,
+            ratio=ratio,
+            reference_image_asset_id=reference_image_asset_id,
+            project_id=project_id,
+            model=model
+        )
+        
+        self.db.add(task)
+        self.db.flush()  # 获取task_id
+        
         try:
             self.wallet_service.deduct_credits(
                 user_id=user_id,
-                amount=cost,
+                amount=task.cost_credits,
                 type="gen_hold",
-                description=f"生成{duration_sec}秒视频（预扣）"
+                ref_type="task",
+                ref_id=task.task_id,
+                description=f"生成{duration_sec}秒视频（预扣）",
+                commit=False
             )
         except ValueError as e:
+            self.db.rollback()
             raise ValueError(f"积分不足：{e}")
         
-        # 3. 调用供应商API
+        # 3. 更新用户统计（生成中的视频也算）
+        stats = self.db.query(UserStats).filter(
+            UserStats.user_id == user_id
+        ).first()
+        if stats:
+            stats.total_videos_generated += 1
+        
+        self.db.commit()
+        self.db.refresh(task)
+        
+        # 4. 后台提交供应商
+        submission_worker.enqueue(task.task_id)
+        return task
+    
+    async def create_batch(
+        self,
+        user_id: int,
+        items: List[dict],
+        ratio: str = "9:16",
+        project_id: Optional[int] = None,
+        model: Optional[str] = None,
+        source_type: str = "direct",
+        hold_ref_type: Optional[str] = None,
+        hold_ref_id: Optional[int] = None,
+        description: Optional[str] = None
+    ) -> Tuple[str, List[Task]]:
+        """
+        批量创建视频生成任务
+        
+        所有任务和一笔总额预扣在同一事务中提交，随后全部交给后台提交器并发提交供应商；
+        单个任务提交或生成失败时按该任务费用单独退款
+        
+        提交速率限制：每个任务和单独创建的任务一样经过全局令牌桶和按用户公平排队（令牌桶对应供应商的速率配额，
+        批量不能一次取走多个令牌绕过它）。默认 VENDOR_SUBMIT_RATE_PER_SEC=2、VENDOR_SUBMIT_BURST=5 时，
+        12 个镜头的分镜前 5 个立即提交，其余每 0.5 秒一个，仅排队就约 3.5 秒；其他用户同时排队时按用户轮流放行，
+        耗时相应增加。同时进行的供应商请求数由 VENDOR_SUBMIT_CONCURRENCY 限制
+        
+        Args:
+            user_id: 用户ID
+            items: 任务列表，每项包含 prompt、duration_sec，可选 reference_image_asset_id、source_id
+            ratio: 比例
+            project_id: 项目ID（可选）
+            model: 模型名称（可选）
+            source_type: 任务来源
+            hold_ref_type: 预扣流水关联类型
+            hold_ref_id: 预扣流水关联ID
+            description: 预扣流水说明
+        
+        Returns:
+            (batch_id, 任务列表)
+        """
+        if not items:
+            raise ValueError("没有可生成的内容")
+        
+        reference_ids = {item["reference_image_asset_id"] for item in items if item.get("reference_image_asset_id")}
+        if reference_ids:
+            self._check_reference_images(user_id, reference_ids)
+        
+        batch_id = uuid.uuid4().hex
+        tasks = [
+            self._build_task(
+                user_id=user_id,
+                prompt=item["prompt"],
+                duration_sec=item["duration_sec"],
+                ratio=ratio,
+                reference_image_asset_id=item.get("reference_image_asset_id"),
+                project_id=project_id,
+                model=model,
+                source_type=source_type,
+                source_id=item.get("source_id"),
+                batch_id=batch_id
+            )
+            for item in items
+        ]
+        total_cost = sum(task.cost_credits for task in tasks)
+        
+        self.db.add_all(tasks)
+        self.db.flush()
+        
         try:
-            if reference_image_asset_id:
-                media = self.db.query(MediaAsset).filter(
-                    MediaAsset.asset_id == reference_image_asset_id,
-                    MediaAsset.user_id == user_id
-                ).first()
-                if not media:
-                    raise ValueError("参考图不存在或无权访问")
-                
-                image_input = media.file_url
-                # 如果是本地上传的图片（相对路径），转换为Base64
-                if image_input.startswith("/uploads/"):
-                    try:
-                        filename = os.path.basename(image_input)
-                        local_path = os.path.join(settings.UPLOAD_DIR, filename)
-                        if os.path.exists(local_path):
-                            with open(local_path, "rb") as img_f:
-                                b64_data = base64.b64encode(img_f.read()).decode("utf-8")
-                                # 根据后缀推断MIME类型
-                                ext = os.path.splitext(filename)[1].lower().replace(".", "")
-                                if ext == "jpg": ext = "jpeg"
-                                image_input = f"data:image/{ext};base64,{b64_data}"
-                    except Exception as e:
-                        print(f"图片转Base64失败: {e}")
-                        # 失败降级，继续使用原始URL尝试
-                
-                response = await self.adapter.create_image2video(
-                    image_url=image_input,
-                    prompt=prompt,
-                    duration_sec=duration_sec,
-                    ratio=ratio,
-                    model=model
-                )
-            else:
-                response = await self.adapter.create_text2video(
-                    prompt=prompt,
-                    duration_sec=duration_sec,
-                    ratio=ratio,
-                    model=model
-                )
+            self.wallet_service.deduct_credits(
+                user_id=user_id,
+                amount=total_cost,
+                type="gen_hold",
+                ref_type=hold_ref_type,
+                ref_id=hold_ref_id,
+                description=description or f"批量生成{len(tasks)}个视频（预扣）",
+                commit=False
+            )
+        except ValueError as e:
+            self.db.rollback()
+            raise ValueError(f"积分不足：需要{total_cost}积分，{e}")
+        
+        stats = self.db.query(UserStats).filter(
+            UserStats.user_id == user_id
+        ).first()
+        if stats:
+            stats.total_videos_generated += len(tasks)
+        
+        self.db.commit()
+        
+        for task in tasks:
+            submission_worker.enqueue(task.task_id)
+        return batch_id, tasks
+    
+    def _check_reference_images(self, user_id: int, asset_ids) -> None:
+        """校验参考图存在且属于该用户（一次查询）"""
+        found = self.db.query(MediaAsset.asset_id).filter(
+            MediaAsset.asset_id.in_(asset_ids),
+            MediaAsset.user_id == user_id
+        ).all()
+        if len(found) < len(set(asset_ids)):
+            raise ValueError("参考图不存在或无权访问")
+    
+    def _build_task(
+        self,
+        user_id: int,
+        prompt: str,
+        duration_sec: int,
+        ratio: str,
+        reference_image_asset_id: Optional[int],
+        project_id: Optional[int],
+        model: Optional[str],
+        source_type: str = "direct",
+        source_id: Optional[int] = None,
+        batch_id: Optional[str] = None
+    ) -> Task:
+        """组装待提交的任务记录（未加入会话）"""
+        return Task(
+            user_id=user_id,
+            source_type=source_type,
+            source_id=source_id,
+            batch_id=batch_id,
+            prompt=prompt,
+            prompt_final=prompt,
+            duration_sec=duration_sec,
+            ratio=ratio,
+            model=model or self.adapter.get_model_name(duration_sec, ratio),
+            reference_image_asset_id=reference_image_asset_id,
+            vendor="dyuapi_sora2",
+            status="PENDING_SUBMIT",
+            progress=0,
+            cost_credits=VIDEO_GENERATION_COSTS.get(duration_sec, 10),
+            project_id=project_id,
+            submit_key=uuid.uuid4().hex,
+            submit_attempts=0,
+            # 覆盖排队等待 + 提交耗时，过期仍未提交说明本进程已中断
+            submit_lease_until=datetime.utcnow() + timedelta(
+                seconds=settings.VENDOR_SUBMIT_MAX_WAIT_SEC + settings.VENDOR_SUBMIT_LEASE_SEC
+            )
+        )
+    
+    async def _build_image_input(self, task: Task) -> str:
+        """
+        获取图生视频的参考图输入
+        
+        本地上传的图片按目标比例缩小、重新编码后转换为 Base64 Data URI（结果按图片缓存），其余直接使用URL
+        """
+        media = self.db.query(MediaAsset).filter(
+            MediaAsset.asset_id == task.reference_image_asset_id,
+            MediaAsset.user_id == task.user_id
+        ).first()
+        if not media:
+            raise ValueError("参考图不存在或无权访问")
+        
+        try:
+            model = task.model or self.adapter.get_model_name(task.duration_sec, task.ratio)
+            data_uri = await ReferenceImageService(self.db).build_input(media, task.ratio, model)
+            if data_uri:
+                return data_uri
+        except Exception as e:
+            print(f"图片转Base64失败: {e}")
+            # 失败降级，继续使用原始URL尝试
+        return media.file_url
+    
+    def _claim_submission(self, task: Task, attempts: int) -> bool:
+        """
+        抢占一次提交（以 submit_attempts 作版本号的条件更新），并续期提交租约
+        
+        多进程同时恢复同一任务时只有一个能抢占成功
+        """
+        claimed = self.db.query(Task).filter(
+            Task.task_id == task.task_id,
+            Task.status == "PENDING_SUBMIT",
+            Task.submit_attempts == attempts
+        ).update({
+            "submit_attempts": attempts + 1,
+            "submit_lease_until": datetime.utcnow() + timedelta(seconds=settings.VENDOR_SUBMIT_LEASE_SEC)
+        }, synchronize_session=False)
+        self.db.commit()
+        
+        if not claimed:
+            self.db.refresh(task)
+            return False
+        return True
+    
+    async def submit_to_vendor(self, task: Task, concurrency: Optional[asyncio.Semaphore] = None) -> bool:
+        """
+        排队获取提交名额后把 PENDING_SUBMIT 任务提交给供应商
+        
+        全局令牌桶控制提交速率，按用户公平排队，有效订阅用户走优先通道；
+        成功后任务转为 QUEUED 并写入 vendor_task_id，排队超时或供应商调用失败时失败退款。
+        排队和等待供应商期间不占用数据库连接
+        
+        Args:
+            task: 待提交的任务
+            concurrency: 限制同时进行的供应商请求数（可选，只包住供应商调用，不影响公平排队）
+        
+        Returns:
+            是否提交成功
+        """
+        if task.status != "PENDING_SUBMIT":
+            return False
+        
+        attempts = task.submit_attempts or 0
+        user_id = task.user_id
+        priority = SubscriptionService(self.db).get_my_subscription(user_id) is not None
+        self.db.commit()
+        
+        try:
+            await submission_scheduler.acquire(user_id, priority=priority)
+        except SubmissionQueueTimeout as e:
+            self._fail_task(task, f"提交排队超时：{e}", "生成失败退款：提交排队超时")
+            return False
+        
+        if not self._claim_submission(task, attempts):
+            return False
+        
+        try:
+            image_input = await self._build_image_input(task) if task.reference_image_asset_id else None
+            params = {
+                "prompt": task.prompt_final or task.prompt,
+                "duration_sec": task.duration_sec,
+                "ratio": task.ratio,
+                "model": task.model,
+                # 幂等键使重试/恢复时不会重复创建任务
+                "idempotency_key": task.submit_key,
+            }
+            self.db.commit()
+            
+            async with concurrency or contextlib.nullcontext():
+                if image_input:
+                    response = await self.adapter.create_image2video(image_url=image_input, **params)
+                else:
+                    response = await self.adapter.create_text2video(**params)
             vendor_task_id = response.get("id")
         except httpx.HTTPStatusError as e:
             # 尝试解析供应商返回的错误信息
@@ -125,259 +360,561 @@ class TaskService:
                 pass
 
             # 无论什么错误，只要是真实模式，直接报错退款
-            self.wallet_service.add_credits(
-                user_id=user_id,
-                amount=cost,
-                type="gen_refund",
-                description=f"生成失败退款：{error_msg}"
-            )
-            # 在这里打印完整的错误信息，方便调试
             print(f"Vendor API Error: {error_msg}")
-            raise ValueError(f"供应商API调用失败：{error_msg}")
+            self._fail_task(task, f"供应商API调用失败：{error_msg}", f"生成失败退款：{error_msg}")
+            return False
         except Exception as e:
-            self.wallet_service.add_credits(
-                user_id=user_id,
-                amount=cost,
-                type="gen_refund",
-                description=f"生成失败退款：{str(e)}"
-            )
-            # 在这里打印完整的错误信息，方便调试
             import traceback
             traceback.print_exc()
-            raise ValueError(f"供应商API调用失败：{e}")
-        
-        # 4. 创建任务记录
-        task = Task(
-            user_id=user_id,
-            source_type="direct",
-            prompt=prompt,
-            prompt_final=prompt,
-            duration_sec=duration_sec,
-            ratio=ratio,
-            model=model or self.adapter.get_model_name(duration_sec),
-            reference_image_asset_id=reference_image_asset_id,
-            vendor="dyuapi_sora2",
-            vendor_task_id=vendor_task_id,
-            status="QUEUED",
-            progress=0,
-            cost_credits=cost,
-            project_id=project_id,
-            started_at=datetime.utcnow()
-        )
+            self._fail_task(task, f"供应商API调用失败：{e}", f"生成失败退款：{str(e)}")
+            return False
         
-        self.db.add(task)
-        self.db.flush()  # 获取task_id
+        now = datetime.utcnow()
+        submitted = self.db.query(Task).filter(
+            Task.task_id == task.task_id,
+            Task.status == "PENDING_SUBMIT"
+        ).update({
+            "status": "QUEUED",
+            "vendor_task_id": vendor_task_id,
+            "started_at": now,
+            "submit_lease_until": None
+        }, synchronize_session=False)
         
-        # 5. 更新用户统计（生成中的视频也算）
-        stats = self.db.query(UserStats).filter(
-            UserStats.user_id == user_id
-        ).first()
-        if stats:
-            stats.total_videos_generated += 1
+        if not submitted:
+            self.db.rollback()
+            self.db.refresh(task)
+            return False
         
+        task.status = "QUEUED"
+        task.vendor_task_id = vendor_task_id
+        task.started_at = now
+        task.submit_lease_until = None
+        self.schedule_service.schedule(task, now)
         self.db.commit()
-        self.db.refresh(task)
+        self._publish(task)
+        return True
+    
+    def recover_pending_submissions(self, limit: int = 100) -> List[int]:
+        """
+        找出租约已过期的 PENDING_SUBMIT 任务（提交进程中断）
         
-        return task
+        超过最大提交次数的直接失败退款，其余返回给调用方重新排队
+        
+        Returns:
+            需要重新提交的任务ID列表
+        """
+        expired = self.db.query(Task).filter(
+            Task.status == "PENDING_SUBMIT",
+            Task.submit_lease_until < datetime.utcnow()
+        ).order_by(Task.task_id).limit(limit).all()
+        
+        task_ids = []
+        for task in expired:
+            if (task.submit_attempts or 0) >= settings.VENDOR_SUBMIT_MAX_ATTEMPTS:
+                self._fail_task(
+                    task,
+                    f"提交供应商失败（已尝试{task.submit_attempts}次）",
+                    "生成失败退款：提交供应商失败"
+                )
+            else:
+                task_ids.append(task.task_id)
+        return task_ids
 
-    async def get_task_status(self, task_id: int, user_id: int, background_tasks = None) -> Task:
+    def get_task_status(self, task_id: int, user_id: int) -> Task:
         """
-        查询任务状态（并同步供应商状态）
+        查询任务状态（纯数据库读取）
+        
+        供应商状态由后台轮询器 TaskStatusPoller 统一同步，这里不再发起供应商请求
         
         Args:
             task_id: 任务ID
             user_id: 用户ID
-            background_tasks: FastAPI后台任务对象
         
         Returns:
-            Task对象
+            Task对象（成功时挂载 video_url）
         """
-        # 查询任务
-        task = self.db.query(Task).filter(
+        row = self._status_query().filter(
             Task.task_id == task_id,
             Task.user_id == user_id
         ).first()
         
-        if not task:
+        if not row:
             raise ValueError("任务不存在")
         
-        # 如果任务已完成，直接返回
-        if task.status in ["SUCCESS", "FAILURE"]:
-            if task.status == "SUCCESS" and task.video_id:
-                video = self.db.query(VideoAsset).filter(VideoAsset.video_id == task.video_id).first()
-                if video:
-                    setattr(task, "video_url", video.watermarked_play_url)
-            return task
+        task, video_url = row
+        setattr(task, "video_url", video_url)
         
-        # 同步供应商状态
-        try:
-            # 检查超时（10分钟）
-            if task.status == "IN_PROGRESS" and (datetime.utcnow() - task.started_at).total_seconds() > 600:
-                task.status = "FAILURE"
-                task.error_message = "生成超时（超过10分钟）"
-                task.completed_at = datetime.utcnow()
-                
-                # 退回积分
-                self.wallet_service.add_credits(
-                    user_id=task.user_id,
-                    amount=task.cost_credits,
-                    type="gen_refund",
-                    ref_type="task",
-                    ref_id=task.task_id,
-                    description="任务超时退款"
-                )
-                self.db.commit()
-                return task
-
-            response = await self.adapter.get_task_status(task.vendor_task_id)
-            parsed = self.adapter.parse_task_response(response)
-            
-            # 打印解析后的状态以便调试
-            print(f"🔄 Task {task_id} Sync: Status={parsed['status']}, Progress={parsed['progress']}")
-            
-            # 更新状态
-            task.status = parsed["status"]
-            task.progress = parsed["progress"]
-            task.error_message = parsed["error_message"]
+        return task
+    
+    def _status_query(self):
+        """任务 + 视频播放地址（同一查询中关联 VideoAsset）"""
+        return self.db.query(Task, VideoAsset.watermarked_play_url).outerjoin(
+            VideoAsset, VideoAsset.video_id == Task.video_id
+        )
+    
+    def get_status_batch(self, user_id: int, task_ids: List[int]) -> List[Tuple[Task, Optional[str]]]:
+        """
+        批量查询任务状态（按主键一次查询，视频地址同查询关联）
+        
+        不属于该用户或不存在的任务ID会被忽略
+        
+        Args:
+            user_id: 用户ID
+            task_ids: 任务ID列表
+        
+        Returns:
+            [(Task, video_url)]，按 task_id 升序
+        """
+        if not task_ids:
+            return []
+        return self._status_query().filter(
+            Task.task_id.in_(task_ids),
+            Task.user_id == user_id
+        ).order_by(Task.task_id).all()
+    
+    def get_batch_status(self, user_id: int, batch_id: str) -> List[Tuple[Task, Optional[str]]]:
+        """
+        查询一个批次所有任务的状态（走 idx_tasks_batch 索引，视频地址同查询关联）
+        
+        Args:
+            user_id: 用户ID
+            batch_id: 批次ID
+        
+        Returns:
+            [(Task, video_url)]，按 task_id 升序；批次不存在或不属于该用户时为空
+        """
+        return self._status_query().filter(
+            Task.batch_id == batch_id,
+            Task.user_id == user_id
+        ).order_by(Task.task_id).all()
+    
+    def get_storyboard_status(self, user_id: int, storyboard_id: int) -> List[Tuple[int, Task, Optional[str]]]:
+        """
+        查询故事版每个镜头最新一次生成任务的状态
+        
+        Args:
+            user_id: 用户ID
+            storyboard_id: 故事版ID
+        
+        Returns:
+            [(shot_id, Task, video_url)]
+        """
+        latest = select(func.max(Task.task_id)).join(
+            Shot, Shot.shot_id == Task.source_id
+        ).where(
+            Task.source_type == "storyboard_shot",
+            Task.user_id == user_id,
+            Shot.storyboard_id == storyboard_id
+        ).group_by(Task.source_id)
+        
+        rows = self._status_query().filter(
+            Task.task_id.in_(latest)
+        ).order_by(Task.source_id).all()
+        return [(task.source_id, task, video_url) for task, video_url in rows]
+    
+    def get_status_snapshot(
+        self,
+        user_id: int,
+        completed_since: Optional[datetime] = None
+    ) -> List[Tuple[Task, Optional[str]]]:
+        """
+        获取用户进行中任务（及指定时间后结束的任务）的当前状态，视频地址在同一查询中关联
+        
+        Args:
+            user_id: 用户ID
+            completed_since: 同时返回该时间之后结束的任务（断线续传时补齐错过的终态）
+        
+        Returns:
+            [(Task, video_url)]
+        """
+        condition = Task.status.in_(self.ACTIVE_STATUSES)
+        if completed_since:
+            condition = or_(condition, Task.completed_at >= completed_since)
+        
+        return self._status_query().filter(
+            Task.user_id == user_id,
+            condition
+        ).order_by(Task.task_id).all()
+    
+    @classmethod
+    def status_payload(cls, task: Task, video_url: Optional[str] = None) -> dict:
+        """
+        任务状态数据（与 TaskStatusResponse 字段一致）
+        
+        进行中的任务附带预计剩余时间和建议轮询间隔
+        """
+        eta_sec = None
+        next_poll_after_sec = None
+        if task.status in cls.ACTIVE_STATUSES:
+            now = datetime.utcnow()
+            if task.eta_at:
+                eta_sec = max(int((task.eta_at - now).total_seconds()), 0)
+            if task.next_poll_at:
+                next_poll_after_sec = max(int((task.next_poll_at - now).total_seconds()), 0)
+        
+        return {
+            "task_id": task.task_id,
+            "batch_id": task.batch_id,
+            "status": task.status,
+            "progress": task.progress,
+            "video_id": task.video_id,
+            "video_url": video_url,
+            "error_message": task.error_message,
+            "eta_sec": eta_sec,
+            "next_poll_after_sec": next_poll_after_sec,
+        }
+    
+    def _publish(self, task: Task, video_url: Optional[str] = None) -> None:
+        """任务状态已提交后，推送给该用户的事件订阅者"""
+        task_events.publish(task.user_id, self.status_payload(task, video_url))
+    
+    # ==================== 供应商状态同步 ====================
+    
+    async def fetch_vendor_update(self, task: Task) -> dict:
+        """
+        网络阶段：查询供应商任务状态（成功时一并获取视频详情）
+        
+        只访问供应商，不读写数据库，可安全并发执行
+        
+        Args:
+            task: 任务对象
+        
+        Returns:
+            parse_task_response 的解析结果，成功时附带 video（parse_video_response 结果）
+        """
+        response = await self.adapter.get_task_status(task.vendor_task_id)
+        parsed = self.adapter.parse_task_response(response)
+        
+        if parsed["status"] == "SUCCESS" and parsed["video_id"]:
+            detail = await self.adapter.get_video_detail(parsed["video_id"])
+            parsed["video"] = self.adapter.parse_video_response(detail)
+        
+        return parsed
+    
+    def apply_vendor_update(self, task: Task, parsed: dict) -> Optional[VideoAsset]:
+        """
+        数据库阶段：根据供应商状态推进任务
+        
+        状态更新、失败退款、视频资产创建统一在这里完成。
+        终态迁移通过条件更新（仅当任务仍处于进行中）抢占，
+        重复的同步结果（多进程轮询/重复回调）不会重复退款或重复创建资产。
+        
+        Args:
+            task: 任务对象
+            parsed: fetch_vendor_update 的结果
+        
+        Returns:
+            新创建的VideoAsset（仅任务在本次同步中成功时），否则None
+        """
+        status = parsed["status"]
+        
+        if status == "SUCCESS" and parsed.get("video_id"):
+            if not self._claim_terminal(task, "SUCCESS"):
+                return None
             
-            # 如果成功，创建视频资产
-            if task.status == "SUCCESS" and parsed["video_id"]:
-                # 1. 创建视频资产记录
-                video = await self._create_video_asset(
-                    task=task,
-                    vendor_video_id=parsed["video_id"]
-                )
-                task.video_id = video.video_id
-                task.completed_at = datetime.utcnow()
-                setattr(task, "video_url", video.watermarked_play_url)
-                
-                # 2. 立即提交事务以释放锁
-                self.db.commit()
-                self.db.refresh(task)
+            task.progress = 100
+            task.error_message = None
+            video = self._create_video_asset(
+                task=task,
+                vendor_video_id=parsed["video_id"],
+                video_info=parsed.get("video") or {}
+            )
+            task.video_id = video.video_id
+            self.db.commit()
+            self.db.refresh(task)
+            self._publish(task, video.watermarked_play_url)
+            video_downloader.wake()
+            return video
+        
+        if status == "FAILURE":
+            self._fail_task(
+                task,
+                error_message=parsed["error_message"],
+                refund_description=f"任务失败退款：{parsed['error_message']}"
+            )
+            return None
+        
+        # 进行中：更新进度并安排下次轮询（进度只增不减，乱序/重复的结果不会回退进度）
+        if task.status in self.ACTIVE_STATUSES:
+            before = (task.status, task.progress)
+            task.status = status if status in self.ACTIVE_STATUSES else task.status
+            task.progress = max(task.progress or 0, parsed["progress"])
+            changed = (task.status, task.progress) != before
+            self.schedule_service.schedule(task)
+            self.db.commit()
+            if changed:
+                self._publish(task)
+        return None
+    
+    async def handle_vendor_callback(self, payload: dict) -> Optional[VideoAsset]:
+        """
+        处理供应商回调（与轮询共用 apply_vendor_update 的状态迁移）
+        
+        幂等：任务已是终态时直接忽略，重复回调不会重复退款或创建资产
+        
+        Args:
+            payload: 回调请求体（与查询任务接口的响应结构相同）
+        
+        Returns:
+            新创建的VideoAsset（仅本次回调使任务成功时），否则None
+        """
+        parsed = self.adapter.parse_task_response(payload)
+        vendor_task_id = parsed["vendor_task_id"]
+        if not vendor_task_id:
+            raise ValueError("回调缺少任务ID")
+        
+        task = self.db.query(Task).filter(Task.vendor_task_id == vendor_task_id).first()
+        if not task:
+            raise ValueError(f"任务不存在: {vendor_task_id}")
+        
+        if task.status not in self.ACTIVE_STATUSES:
+            return None
+        
+        task.last_callback_at = datetime.utcnow()
+        
+        if parsed["status"] == "SUCCESS" and parsed["video_id"]:
+            detail = await self.adapter.get_video_detail(parsed["video_id"])
+            parsed["video"] = self.adapter.parse_video_response(detail)
+        
+        return self.apply_vendor_update(task, parsed)
+    
+    def _claim_terminal(self, task: Task, status: str, error_message: Optional[str] = None) -> bool:
+        """
+        条件更新任务为终态（仅当任务仍处于进行中时生效）
+        
+        Returns:
+            是否抢占成功；失败说明任务已被其他同步路径处理
+        """
+        now = datetime.utcnow()
+        claimed = self.db.query(Task).filter(
+            Task.task_id == task.task_id,
+            Task.status.in_(self.ACTIVE_STATUSES)
+        ).update({
+            "status": status,
+            "error_message": error_message,
+            "completed_at": now
+        }, synchronize_session=False)
+        
+        if not claimed:
+            self.db.rollback()
+            self.db.refresh(task)
+            return False
+        
+        task.status = status
+        task.error_message = error_message
+        task.completed_at = now
+        return True
+    
+    def _fail_task(self, task: Task, error_message: str, refund_description: str) -> bool:
+        """
+        将任务置为失败并退回积分（与状态更新在同一事务中提交）
+        
+        Returns:
+            是否由本次调用完成失败处理
+        """
+        if not self._claim_terminal(task, "FAILURE", error_message):
+            return False
+        
+        self.wallet_service.add_credits(
+            user_id=task.user_id,
+            amount=task.cost_credits,
+            type="gen_refund",
+            ref_type="task",
+            ref_id=task.task_id,
+            description=refund_description
+        )
+        self._publish(task)
+        return True
+    
+    def is_timed_out(self, task: Task) -> bool:
+        """任务是否已超过生成超时时间（由 TaskTimeoutReaper 统一处理）"""
+        if task.status not in ("QUEUED", "IN_PROGRESS") or not task.started_at:
+            return False
+        return (datetime.utcnow() - task.started_at).total_seconds() > settings.TASK_TIMEOUT_SEC
+    
+    def _fail_tasks_bulk(self, failures: List[Tuple[Task, str, str]]) -> List[Task]:
+        """
+        批量失败并退款：所有状态更新和退款流水在同一个事务中提交
+        
+        每个任务仍通过条件更新抢占，已被其他路径处理的任务会被跳过
+        
+        Args:
+            failures: [(任务, 错误信息, 退款说明)]
+        
+        Returns:
+            本次实际失败退款的任务
+        """
+        now = datetime.utcnow()
+        failed = []
+        try:
+            for task, error_message, refund_description in failures:
+                claimed = self.db.query(Task).filter(
+                    Task.task_id == task.task_id,
+                    Task.status.in_(self.ACTIVE_STATUSES)
+                ).update({
+                    "status": "FAILURE",
+                    "error_message": error_message,
+                    "completed_at": now
+                }, synchronize_session=False)
+                if not claimed:
+                    continue
                 
-                # 3. 在事务提交后进行下载 (使用后台任务避免阻塞)
-                if video.watermarked_play_url:
-                    if background_tasks:
-                        print(f"🚀 添加后台下载任务: {video.video_id}")
-                        background_tasks.add_task(
-                            self._download_and_cache_video_static, 
-                            video.video_id, 
-                            video.watermarked_play_url
-                        )
-                    else:
-                        print("⚠️ 未提供background_tasks，跳过自动缓存")
-            
-            # 如果失败，退回积分
-            elif task.status == "FAILURE":
                 self.wallet_service.add_credits(
                     user_id=task.user_id,
                     amount=task.cost_credits,
                     type="gen_refund",
                     ref_type="task",
                     ref_id=task.task_id,
-                    description=f"任务失败退款：{task.error_message}"
+                    description=refund_description,
+                    commit=False
                 )
-                task.completed_at = datetime.utcnow()
-                self.db.commit()
-            else:
-                self.db.commit()
-            
-        except Exception as e:
-            print(f"同步任务状态失败: {e}")
-            # 尝试回滚以释放锁
+                failed.append((task, error_message))
+            self.db.commit()
+        except Exception:
             self.db.rollback()
+            raise
         
-        return task
+        for task, error_message in failed:
+            task.status = "FAILURE"
+            task.error_message = error_message
+            task.completed_at = now
+            self._publish(task)
+        return [task for task, _ in failed]
     
-    @staticmethod
-    async def _download_and_cache_video_static(video_id: int, url: str) -> None:
+    async def reap_timed_out(self, tasks: List[Task], concurrency: int) -> Tuple[List[VideoAsset], List[Task]]:
         """
-        后台异步下载视频并缓存到本地 (静态方法，独立管理DB Session)
+        处理已超时的任务
+        
+        先向供应商做最后一次查询：已成功的照常入库，已失败的按供应商原因失败，
+        其余判定超时；失败的任务批量置为 FAILURE 并在同一事务中退款
+        
+        Args:
+            tasks: 已超时的进行中任务
+            concurrency: 供应商请求并发上限
+        
+        Returns:
+            (新创建的视频资产, 失败退款的任务)
         """
-        try:
-            if not url:
-                return
-
-            # 构建本地保存路径
-            filename = f"video_{video_id}.mp4"
-            # 假设 backend 目录结构固定
-            static_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "static", "videos")
-            if not os.path.exists(static_dir):
-                os.makedirs(static_dir)
-            
-            local_path = os.path.join(static_dir, filename)
-            
-            # 下载文件 (耗时操作)
-            print(f"📥 [后台] 开始缓存视频到本地: {url}")
-            async with httpx.AsyncClient(timeout=300.0, verify=False) as client:
-                async with client.stream("GET", url) as response:
-                    if response.status_code != 200:
-                        print(f"❌ [后台] 下载失败: Status {response.status_code}")
-                        return
-                        
-                    with open(local_path, "wb") as f:
-                        async for chunk in response.aiter_bytes():
-                            f.write(chunk)
-            
-            print(f"✅ [后台] 视频缓存完成: {local_path}")
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def final_check(task: Task) -> Optional[dict]:
+            if not task.vendor_task_id:
+                return None
+            async with semaphore:
+                try:
+                    return await self.fetch_vendor_update(task)
+                except Exception as e:
+                    print(f"超时任务最终查询失败: task={task.task_id}, {e}")
+                    return None
+        
+        updates = await asyncio.gather(*(final_check(task) for task in tasks))
+        
+        minutes = settings.TASK_TIMEOUT_SEC // 60
+        videos = []
+        failures = []
+        for task, parsed in zip(tasks, updates):
+            if parsed and parsed["status"] == "SUCCESS" and parsed.get("video_id"):
+                try:
+                    video = self.apply_vendor_update(task, parsed)
+                    if video:
+                        videos.append(video)
+                except Exception as e:
+                    print(f"超时任务入库失败: task={task.task_id}, {e}")
+                    self.db.rollback()
+                continue
             
-            # 更新数据库 (使用新的 Session)
-            db = SessionLocal()
+            if parsed and parsed["status"] == "FAILURE":
+                failures.append((task, parsed["error_message"], f"任务失败退款：{parsed['error_message']}"))
+            else:
+                failures.append((task, f"生成超时（超过{minutes}分钟）", "任务超时退款"))
+        
+        failed = self._fail_tasks_bulk(failures) if failures else []
+        return videos, failed
+    
+    async def sync_tasks(self, tasks: List[Task], concurrency: int) -> List[VideoAsset]:
+        """
+        批量同步供应商状态
+        
+        供应商请求按并发上限并发执行，随后在当前会话中依次落库
+        
+        Args:
+            tasks: 进行中的任务列表
+            concurrency: 供应商请求并发上限
+        
+        Returns:
+            本次新创建的视频资产列表（本地缓存下载已随资产一起登记）
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def fetch(task: Task) -> Optional[dict]:
+            # 超时任务交给 TaskTimeoutReaper 批量处理
+            if self.is_timed_out(task):
+                return None
+            async with semaphore:
+                try:
+                    return await self.fetch_vendor_update(task)
+                except Exception as e:
+                    print(f"同步任务状态失败: task={task.task_id}, {e}")
+                    return None
+        
+        updates = await asyncio.gather(*(fetch(task) for task in tasks))
+        
+        videos = []
+        for task, parsed in zip(tasks, updates):
             try:
-                local_url = f"/static/videos/{filename}"
-                video_asset = db.query(VideoAsset).filter(VideoAsset.video_id == video_id).first()
-                if video_asset:
-                    video_asset.watermarked_play_url = local_url
-                    db.commit()
-                    print(f"💾 [后台] 数据库已更新: {local_url}")
-            finally:
-                db.close()
-            
-        except Exception as e:
-            print(f"⚠️ [后台] 视频缓存异常: {e}")
-
-
-    async def _create_video_asset(self, task: Task, vendor_video_id: str) -> VideoAsset:
+                if self.is_timed_out(task):
+                    continue
+                
+                if parsed is None:
+                    # 查询失败：按当前进度退避，避免每轮都重试
+                    self.schedule_service.schedule(task)
+                    self.db.commit()
+                    continue
+                
+                print(f"🔄 Task {task.task_id} Sync: Status={parsed['status']}, Progress={parsed['progress']}")
+                video = self.apply_vendor_update(task, parsed)
+                if video:
+                    videos.append(video)
+            except Exception as e:
+                print(f"同步任务状态失败: task={task.task_id}, {e}")
+                # 回滚以释放锁，继续处理下一个任务
+                self.db.rollback()
+        
+        return videos
+    
+    def _create_video_asset(self, task: Task, vendor_video_id: str, video_info: dict) -> VideoAsset:
         """
-        创建视频资产
+        创建视频资产并登记本地缓存下载（不提交事务，由调用者与任务状态一起提交）
         
         Args:
             task: 任务对象
             vendor_video_id: 供应商视频ID
+            video_info: parse_video_response 的解析结果
         
         Returns:
             VideoAsset对象
         """
-        # 获取视频详情
-        try:
-            response = await self.adapter.get_video_detail(vendor_video_id)
-            parsed = self.adapter.parse_video_response(response)
-            
-            # 创建视频资产
-            video = VideoAsset(
-                user_id=task.user_id,
-                task_id=task.task_id,
-                duration_sec=task.duration_sec,
-                ratio=task.ratio,
-                width=parsed.get("width"),
-                height=parsed.get("height"),
-                file_size_bytes=parsed.get("file_size_bytes"),
-                watermarked_play_url=parsed.get("watermarked_play_url"),
-                vendor="dyuapi_sora2",
-                vendor_video_id=vendor_video_id,
-                project_id=task.project_id
-            )
-            
-            self.db.add(video)
-            self.db.flush()
-            
-            # 注意：不再这里调用 _download_and_cache_video
-            # 改为由调用者在提交事务后调用
-            
-            return video
-            
-        except Exception as e:
-            raise ValueError(f"创建视频资产失败：{e}")
+        video = VideoAsset(
+            user_id=task.user_id,
+            task_id=task.task_id,
+            duration_sec=task.duration_sec,
+            ratio=task.ratio,
+            width=video_info.get("width"),
+            height=video_info.get("height"),
+            file_size_bytes=video_info.get("file_size_bytes"),
+            watermarked_play_url=video_info.get("watermarked_play_url"),
+            vendor="dyuapi_sora2",
+            vendor_video_id=vendor_video_id,
+            project_id=task.project_id
+        )
+        
+        self.db.add(video)
+        self.db.flush()
+        
+        if video.watermarked_play_url:
+            VideoCacheService(self.db).enqueue(video, video.watermarked_play_url)
+        
+        return video
     
     
     # 彻底删除 _create_mock_video_asset 方法，防止任何意外调用
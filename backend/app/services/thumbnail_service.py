@@ -0,0 +1,139 @@
+"""
+缩略图服务层
+上传的图片生成固定尺寸的 WebP / JPEG 缩略图（derived/<sha256>/thumb-<尺寸>.<扩展名>），
+供参考图选择器、头像等场景使用，不必下载原图
+
+缩略图地址由内容 SHA-256 决定，内容不变地址就不变，可以长期缓存；
+上传完成后在后台生成，请求时尚未生成（或已被清理）则当场生成
+"""
+import os
+import re
+import asyncio
+from typing import Dict, Optional, Set
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.images import image_pool, generate_thumbnails, THUMBNAIL_SIZES, THUMBNAIL_FORMATS
+from app.core.metrics import metrics
+from app.db.models import MediaAsset, MediaBlob
+from app.services.blob_service import blob_file_path, derived_dir
+
+THUMBNAIL_URL_PREFIX = "/api/v1/assets/media/thumbs"
+# 头像使用的缩略图尺寸（THUMBNAIL_SIZES 之一）
+AVATAR_THUMBNAIL_SIZE = 256
+
+thumbnail_requests = metrics.counter(
+    "media_thumbnail_requests_total",
+    "Thumbnail requests (hit=served an existing file, generated=generated on request)",
+    ["result"]
+)
+thumbnail_duration = metrics.histogram(
+    "media_thumbnail_generate_seconds",
+    "Time to generate the full thumbnail set for one image (in the image process pool)",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+# 进行中的生成任务 {sha256: Future}（同一张图并发请求只生成一次）
+_generating: Dict[str, asyncio.Future] = {}
+
+# 后台生成任务的引用，防止被垃圾回收
+_background: Set[asyncio.Task] = set()
+
+
+def thumbnail_path(sha256: str, size: int, ext: str) -> str:
+    """缩略图本地路径"""
+    return os.path.join(derived_dir(sha256), f"thumb-{size}.{ext}")
+
+
+def thumbnail_urls(media: MediaAsset) -> Optional[Dict[str, str]]:
+    """
+    媒体资产的缩略图地址 {尺寸: WebP 地址}（同名 .jpg 为 JPEG 版本）
+
+    旧版独立文件（没有存储块）不生成缩略图，返回 None
+    """
+    if media.asset_type != "image" or not media.blob_sha256:
+        return None
+    return {
+        str(size): f"{THUMBNAIL_URL_PREFIX}/{media.blob_sha256}/{size}.webp"
+        for size in THUMBNAIL_SIZES
+    }
+
+
+async def ensure_thumbnails(sha256: str, source_path: str) -> None:
+    """
+    生成一张图的全部缩略图（已全部存在时直接返回）
+
+    Raises:
+        OSError: 读取或写入文件失败
+        PIL.UnidentifiedImageError: 无法识别的图片
+    """
+    pending = _generating.get(sha256)
+    if pending is None:
+        if all(
+            os.path.exists(thumbnail_path(sha256, size, ext))
+            for size in THUMBNAIL_SIZES for ext in THUMBNAIL_FORMATS
+        ):
+            return
+        pending = _generating[sha256] = asyncio.ensure_future(image_pool.run(
+            generate_thumbnails, source_path, derived_dir(sha256), settings.MEDIA_THUMBNAIL_QUALITY
+        ))
+        pending.add_done_callback(lambda _: _generating.pop(sha256, None))
+        result = await asyncio.shield(pending)
+        thumbnail_duration.observe(result["seconds"])
+    else:
+        await asyncio.shield(pending)
+
+
+def schedule_thumbnails(sha256: str, source_path: str) -> None:
+    """上传完成后在后台生成缩略图（失败只记录日志，请求时会重新生成）"""
+    async def run():
+        try:
+            await ensure_thumbnails(sha256, source_path)
+        except Exception as e:
+            print(f"⚠️ 缩略图生成失败 {sha256}: {e}")
+
+    task = asyncio.create_task(run())
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+class ThumbnailService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    async def get_thumbnail(self, sha256: str, size: int, ext: str) -> str:
+        """
+        获取缩略图文件路径，尚未生成时当场生成
+
+        Args:
+            sha256: 存储块SHA-256
+            size: 尺寸（THUMBNAIL_SIZES 之一）
+            ext: 扩展名（webp/jpg）
+
+        Returns:
+            缩略图路径
+
+        Raises:
+            ValueError: 参数不合法或图片不存在
+        """
+        if not re.fullmatch(r"[0-9a-f]{64}", sha256) or size not in THUMBNAIL_SIZES or ext not in THUMBNAIL_FORMATS:
+            raise ValueError("缩略图不存在")
+
+        path = thumbnail_path(sha256, size, ext)
+        if os.path.exists(path):
+            thumbnail_requests.inc(result="hit")
+            return path
+
+        blob = self.db.query(MediaBlob).filter(
+            MediaBlob.sha256 == sha256,
+            MediaBlob.ref_count > 0
+        ).first()
+        if not blob or not blob.mime_type or not blob.mime_type.startswith("image/"):
+            raise ValueError("缩略图不存在")
+
+        try:
+            await ensure_thumbnails(sha256, blob_file_path(blob.storage_path))
+        except Exception as e:
+            print(f"⚠️ 缩略图生成失败 {sha256}: {e}")
+            raise ValueError("缩略图不存在")
+        thumbnail_requests.inc(result="generated")
+        return path
@@ -0,0 +1,382 @@
+"""
+媒体上传服务层
+上传内容按块写盘（边写边检查大小上限、计算 SHA-256，不在内存中缓冲整个文件），
+并提供移动端弱网使用的分块上传会话（创建会话 → 按偏移写入分块 → 完成）；
+写完的文件交给 BlobService 按内容去重存储，再通过 AssetService.create_media_asset 创建引用它的媒体资产
+"""
+import os
+import re
+import uuid
+import asyncio
+import hashlib
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Optional, Tuple
+from PIL import Image
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.models import MediaAsset, UploadSession
+from app.services.asset_service import AssetService
+from app.services.blob_service import BlobService, blob_file_path
+from app.services.thumbnail_service import schedule_thumbnails
+from app.core.images import read_image_size
+
+# 允许上传的图片类型
+ALLOWED_IMAGE_TYPES = {"image/jpeg", "image/jpg", "image/png", "image/webp"}
+
+# 每次清理的过期会话数
+SESSION_PURGE_BATCH = 100
+
+
+class UploadTooLarge(ValueError):
+    """上传内容超过大小上限"""
+    pass
+
+
+class UploadOffsetMismatch(ValueError):
+    """分块的起始偏移与服务端已接收的字节数不一致（客户端应从 offset 处续传）"""
+
+    def __init__(self, offset: int):
+        super().__init__(f"偏移不一致，服务端已接收 {offset} 字节")
+        self.offset = offset
+
+
+def _file_sha256(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class UploadService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    # ==================== 单次上传 ====================
+
+    async def save_stream(self, chunks: AsyncIterator[bytes], path: str, max_bytes: int) -> Tuple[int, str]:
+        """
+        按块写入文件，边写边检查大小、计算 SHA-256
+
+        先写入 .part 临时文件，完整写入后原子重命名；失败时删除临时文件
+
+        Args:
+            chunks: 文件内容分块
+            path: 目标路径
+            max_bytes: 大小上限
+
+        Returns:
+            (文件大小, SHA-256)
+
+        Raises:
+            UploadTooLarge: 超过大小上限
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        part_path = path + ".part"
+        size = 0
+        sha256 = hashlib.sha256()
+        try:
+            with open(part_path, "wb") as f:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise UploadTooLarge(f"文件过大，最大{max_bytes // 1024 // 1024}MB")
+                    sha256.update(chunk)
+                    f.write(chunk)
+            os.replace(part_path, path)
+        except BaseException:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+        return size, sha256.hexdigest()
+
+    async def upload_image(
+        self,
+        user_id: int,
+        chunks: AsyncIterator[bytes],
+        original_filename: Optional[str],
+        mime_type: str
+    ) -> MediaAsset:
+        """
+        单次上传图片并创建媒体资产
+
+        Raises:
+            ValueError: 文件格式不支持或不是有效的图片
+            UploadTooLarge: 超过大小上限
+        """
+        if mime_type not in ALLOWED_IMAGE_TYPES:
+            raise ValueError("不支持的文件格式")
+
+        temp_path = os.path.join(self._temp_dir(), f"{uuid.uuid4().hex}.upload")
+        size, sha256 = await self.save_stream(chunks, temp_path, settings.MEDIA_UPLOAD_MAX_BYTES)
+        return await self._store(user_id, temp_path, size, sha256, mime_type)
+
+    async def _store(self, user_id: int, temp_path: str, size: int, sha256: str, mime_type: str) -> MediaAsset:
+        """
+        临时文件纳入内容寻址存储（相同内容只保留一份），创建引用存储块的媒体资产，并在后台生成缩略图
+
+        Raises:
+            ValueError: 不是有效的图片、像素数超限，或存储块正在清理
+        """
+        try:
+            width, height = await asyncio.to_thread(self._check_image, temp_path)
+            blob = await BlobService(self.db).acquire(sha256, temp_path, size, mime_type)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        media = AssetService(self.db).create_media_asset(
+            user_id=user_id,
+            asset_type="image",
+            file_url=f"/uploads/{blob.storage_path}",
+            file_size_bytes=size,
+            mime_type=mime_type,
+            width=width,
+            height=height,
+            sha256=sha256,
+            blob_sha256=blob.sha256
+        )
+        schedule_thumbnails(blob.sha256, blob_file_path(blob.storage_path))
+        return media
+
+    @staticmethod
+    def _check_image(path: str) -> Tuple[int, int]:
+        """读取图片尺寸（只解析文件头），同时校验文件确实是图片"""
+        try:
+            width, height = read_image_size(path)
+        except (OSError, Image.DecompressionBombError):
+            raise ValueError("文件不是有效的图片")
+        if width * height > settings.MEDIA_IMAGE_MAX_PIXELS:
+            raise ValueError(f"图片尺寸过大（{width}x{height}）")
+        return width, height
+
+    # ==================== 分块上传（断点续传） ====================
+
+    def _temp_dir(self) -> str:
+        return os.path.join(settings.UPLOAD_DIR, ".sessions")
+
+    def _part_path(self, upload_id: str) -> str:
+        return os.path.join(self._temp_dir(), f"{upload_id}.part")
+
+    def create_session(
+        self,
+        user_id: int,
+        filename: Optional[str],
+        mime_type: str,
+        total_bytes: int,
+        sha256: Optional[str] = None
+    ) -> UploadSession:
+        """
+        创建分块上传会话
+
+        Args:
+            user_id: 用户ID
+            filename: 原始文件名
+            mime_type: MIME类型
+            total_bytes: 文件总大小
+            sha256: 文件SHA-256（可选，完成时校验）
+
+        Returns:
+            UploadSession对象
+
+        Raises:
+            ValueError: 文件格式不支持或校验和格式错误
+            UploadTooLarge: 超过大小上限
+        """
+        if mime_type not in ALLOWED_IMAGE_TYPES:
+            raise ValueError("不支持的文件格式")
+        if total_bytes <= 0:
+            raise ValueError("文件大小无效")
+        if total_bytes > settings.MEDIA_UPLOAD_MAX_BYTES:
+            raise UploadTooLarge(f"文件过大，最大{settings.MEDIA_UPLOAD_MAX_BYTES // 1024 // 1024}MB")
+        if sha256 and not re.fullmatch(r"[0-9a-fA-F]{64}", sha256):
+            raise ValueError("SHA-256 格式错误")
+
+        session = UploadSession(
+            upload_id=uuid.uuid4().hex,
+            user_id=user_id,
+            filename=(filename or "")[:255] or None,
+            mime_type=mime_type,
+            total_bytes=total_bytes,
+            received_bytes=0,
+            sha256=sha256.lower() if sha256 else None,
+            status="UPLOADING",
+            expires_at=datetime.utcnow() + timedelta(seconds=settings.MEDIA_UPLOAD_SESSION_TTL_SEC)
+        )
+        self.db.add(session)
+        self.db.commit()
+        return session
+
+    def get_session(self, upload_id: str, user_id: int) -> UploadSession:
+        """
+        获取上传会话（客户端断线后据此查询续传偏移）
+
+        Raises:
+            ValueError: 会话不存在、无权访问或已过期
+        """
+        session = self.db.query(UploadSession).filter(
+            UploadSession.upload_id == upload_id,
+            UploadSession.user_id == user_id
+        ).first()
+        if not session or (session.status != "COMPLETED" and session.expires_at < datetime.utcnow()):
+            raise ValueError("上传会话不存在或已过期")
+        return session
+
+    async def write_chunk(self, session: UploadSession, offset: int, chunks: AsyncIterator[bytes]) -> int:
+        """
+        从 offset 处写入一个分块
+
+        按偏移写入（而不是追加），重复发送同一分块是幂等的；
+        连接中途断开时已收到的部分也会确认，客户端查询偏移后从断点继续
+
+        Args:
+            session: 上传会话
+            offset: 分块起始偏移，必须等于已接收字节数
+            chunks: 分块内容
+
+        Returns:
+            写入后的偏移（已接收字节数）
+
+        Raises:
+            ValueError: 会话已结束
+            UploadOffsetMismatch: 偏移不一致
+            UploadTooLarge: 超出会话声明的文件大小
+        """
+        if session.status != "UPLOADING":
+            raise ValueError("上传会话已结束")
+        if offset != session.received_bytes:
+            raise UploadOffsetMismatch(session.received_bytes)
+
+        part_path = self._part_path(session.upload_id)
+        os.makedirs(os.path.dirname(part_path), exist_ok=True)
+        written = 0
+        error: Optional[BaseException] = None
+        try:
+            with open(part_path, "r+b" if os.path.exists(part_path) else "wb") as f:
+                f.seek(offset)
+                async for chunk in chunks:
+                    if offset + written + len(chunk) > session.total_bytes:
+                        raise UploadTooLarge(f"超出声明的文件大小 {session.total_bytes} 字节")
+                    f.write(chunk)
+                    written += len(chunk)
+        except BaseException as e:
+            error = e
+
+        if written:
+            # 条件更新：并发写入同一偏移时只有一个会被确认
+            updated = self.db.query(UploadSession).filter(
+                UploadSession.upload_id == session.upload_id,
+                UploadSession.status == "UPLOADING",
+                UploadSession.received_bytes == offset
+            ).update({
+                "received_bytes": offset + written,
+                "expires_at": datetime.utcnow() + timedelta(seconds=settings.MEDIA_UPLOAD_SESSION_TTL_SEC)
+            }, synchronize_session=False)
+            self.db.commit()
+            self.db.refresh(session)
+            if not updated and error is None:
+                raise UploadOffsetMismatch(session.received_bytes)
+
+        if error is not None:
+            raise error
+        return session.received_bytes
+
+    async def complete(self, session: UploadSession) -> MediaAsset:
+        """
+        完成分块上传：校验大小和 SHA-256，纳入内容寻址存储并创建媒体资产
+
+        重复调用返回同一个媒体资产
+
+        Raises:
+            ValueError: 未接收完整、正在处理、校验和不符或不是有效的图片（后两种情况会话重置，需要重新上传）
+
+        存储时出现其他异常同样重置会话后原样抛出，会话不会一直停留在处理中
+        """
+        if session.status == "COMPLETED":
+            media = self.db.query(MediaAsset).filter(MediaAsset.asset_id == session.asset_id).first()
+            if media:
+                return media
+        if session.received_bytes != session.total_bytes:
+            raise ValueError(f"上传未完成：已接收 {session.received_bytes}/{session.total_bytes} 字节")
+
+        # 抢占完成处理，避免并发完成重复创建资产
+        claimed = self.db.query(UploadSession).filter(
+            UploadSession.upload_id == session.upload_id,
+            UploadSession.status == "UPLOADING"
+        ).update({"status": "FINALIZING"}, synchronize_session=False)
+        self.db.commit()
+        if not claimed:
+            raise ValueError("上传正在处理中，请稍后查询")
+
+        part_path = self._part_path(session.upload_id)
+        try:
+            # 中断的写入可能在末尾之后留下多余字节
+            os.truncate(part_path, session.total_bytes)
+            sha256 = await asyncio.to_thread(_file_sha256, part_path)
+        except OSError:
+            self._reset(session)
+            raise ValueError("上传文件已丢失，请重新上传")
+        except BaseException:
+            # 计算校验和时被取消：分块文件完好，交还处理权，客户端可以再次完成
+            self._release(session)
+            raise
+        if session.sha256 and sha256 != session.sha256:
+            self._reset(session)
+            raise ValueError("文件校验和不符，请重新上传")
+
+        try:
+            media = await self._store(session.user_id, part_path, session.total_bytes, sha256, session.mime_type)
+        except BaseException:
+            # 不是有效的图片、存储块正在清理，或写盘/数据库出错、请求被取消：
+            # 分块文件已被 _store 删除，会话重置，不能停留在 FINALIZING
+            self._reset(session)
+            raise
+        session.status = "COMPLETED"
+        session.asset_id = media.asset_id
+        self.db.commit()
+        return media
+
+    def _release(self, session: UploadSession) -> None:
+        """完成处理中断但分块文件完好：会话回到上传中，保留已接收字节数"""
+        self.db.rollback()
+        self.db.query(UploadSession).filter(
+            UploadSession.upload_id == session.upload_id,
+            UploadSession.status == "FINALIZING"
+        ).update({"status": "UPLOADING"}, synchronize_session=False)
+        self.db.commit()
+        self.db.refresh(session)
+
+    def _reset(self, session: UploadSession) -> None:
+        """分块文件不可用：会话回到初始状态，客户端从 0 重新上传"""
+        # 出错时事务中可能有未提交的改动（如数据库异常），先回滚
+        self.db.rollback()
+        part_path = self._part_path(session.upload_id)
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        self.db.query(UploadSession).filter(
+            UploadSession.upload_id == session.upload_id
+        ).update({"status": "UPLOADING", "received_bytes": 0}, synchronize_session=False)
+        self.db.commit()
+        self.db.refresh(session)
+
+    def purge_expired(self) -> int:
+        """
+        清理过期未完成的上传会话及其分块文件（由 UploadSessionSweeper 在后台线程中调用）
+
+        只清理 UPLOADING 状态：COMPLETED 会话保留，过期后重复完成仍返回同一资产；
+        FINALIZING 会话可能正在存储，由 complete 的异常处理交还或重置
+
+        Returns:
+            清理的会话数
+        """
+        expired = self.db.query(UploadSession).filter(
+            UploadSession.status == "UPLOADING",
+            UploadSession.expires_at < datetime.utcnow()
+        ).limit(SESSION_PURGE_BATCH).all()
+        for session in expired:
+            part_path = self._part_path(session.upload_id)
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            self.db.delete(session)
+        if expired:
+            self.db.commit()
+        return len(expired)
@@ -0,0 +1,448 @@
+"""
+视频本地缓存服务层
+管理缓存下载任务（持久化队列）、视频资产的缓存状态和容量淘汰，文件传输由 VideoDownloadManager 完成
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import or_, and_, func
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.db.models import VideoAsset, VideoDownloadJob
+
+# 本地缓存目录（由 /static 挂载对外提供）
+VIDEO_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "static", "videos")
+STATIC_DIR = os.path.dirname(VIDEO_CACHE_DIR)
+
+# 每批淘汰的候选数
+EVICTION_BATCH_SIZE = 100
+
+cache_requests = metrics.counter(
+    "video_cache_requests_total",
+    "Video play/download requests by cache result (hit=served from local cache, miss=fetched from vendor)",
+    ["result"]
+)
+cache_evictions = metrics.counter(
+    "video_cache_evictions_total",
+    "Videos evicted from the local cache"
+)
+cache_evicted_bytes = metrics.counter(
+    "video_cache_evicted_bytes_total",
+    "Bytes freed by local cache eviction"
+)
+cache_bytes = metrics.gauge(
+    "video_cache_bytes",
+    "Bytes held in the local video cache"
+)
+cache_files = metrics.gauge(
+    "video_cache_files",
+    "Videos held in the local video cache"
+)
+
+# 进程内访问记录 {video_id: [最近访问时间, 访问次数]}，由淘汰器定期批量落库，避免每次播放都写数据库
+_access_log: Dict[int, list] = {}
+_access_lock = threading.Lock()
+
+
+def local_video_path(video_id: int) -> str:
+    """视频缓存文件的本地路径"""
+    return os.path.join(VIDEO_CACHE_DIR, f"video_{video_id}.mp4")
+
+
+def local_video_url(video_id: int) -> str:
+    """视频缓存文件的访问路径"""
+    return f"/static/videos/video_{video_id}.mp4"
+
+
+def local_path_from_url(url: Optional[str]) -> Optional[str]:
+    """/static/ 开头的播放地址对应的本地路径，远程地址返回 None"""
+    if not url or not url.startswith("/static/"):
+        return None
+    return os.path.join(STATIC_DIR, url.replace("/static/", "", 1))
+
+
+def record_access(video_id: int, hit: bool) -> None:
+    """
+    记录一次视频播放/下载（只写内存，由 VideoCacheEvictor 定期落库）
+
+    Args:
+        video_id: 视频ID
+        hit: 是否由本地缓存提供
+    """
+    cache_requests.inc(result="hit" if hit else "miss")
+    with _access_lock:
+        entry = _access_log.setdefault(video_id, [None, 0])
+        entry[0] = datetime.utcnow()
+        entry[1] += 1
+
+
+class VideoCacheService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def enqueue(self, video: VideoAsset, url: str) -> VideoDownloadJob:
+        """
+        登记视频缓存下载任务（不提交事务，由调用者与视频资产一起提交）
+
+        同一视频只有一个下载任务，重复登记会重置为待下载
+
+        Args:
+            video: 视频资产（需已 flush 获得 video_id）
+            url: 下载地址
+
+        Returns:
+            VideoDownloadJob对象
+        """
+        now = datetime.utcnow()
+        job = self.db.query(VideoDownloadJob).filter(
+            VideoDownloadJob.video_id == video.video_id
+        ).first()
+
+        if job:
+            job.source_url = url
+            job.status = "PENDING"
+            job.attempts = 0
+            job.next_attempt_at = now
+            job.lease_until = None
+            job.last_error = None
+        else:
+            job = VideoDownloadJob(
+                video_id=video.video_id,
+                source_url=url,
+                status="PENDING",
+                attempts=0,
+                next_attempt_at=now,
+                bytes_downloaded=0
+            )
+            self.db.add(job)
+
+        video.source_play_url = video.source_play_url or url
+        video.cache_status = "PENDING"
+        return job
+
+    def claim_due_jobs(self, limit: int) -> List[Tuple[int, int]]:
+        """
+        抢占到期的下载任务
+
+        包括待下载且已过退避时间的任务，以及租约过期的下载中任务（进程中断）。
+        通过条件更新（版本号为 attempts）抢占，多进程不会重复下载同一视频
+
+        Args:
+            limit: 最多抢占数量
+
+        Returns:
+            抢占成功的 (job_id, video_id) 列表
+        """
+        if limit <= 0:
+            return []
+
+        now = datetime.utcnow()
+        candidates = self.db.query(
+            VideoDownloadJob.job_id, VideoDownloadJob.video_id, VideoDownloadJob.status, VideoDownloadJob.attempts
+        ).filter(
+            or_(
+                and_(
+                    VideoDownloadJob.status == "PENDING",
+                    or_(VideoDownloadJob.next_attempt_at.is_(None), VideoDownloadJob.next_attempt_at <= now)
+                ),
+                and_(
+                    VideoDownloadJob.status == "RUNNING",
+                    VideoDownloadJob.lease_until < now
+                )
+            )
+        ).order_by(VideoDownloadJob.job_id).limit(limit).all()
+
+        claimed = []
+        for job_id, video_id, status, attempts in candidates:
+            updated = self.db.query(VideoDownloadJob).filter(
+                VideoDownloadJob.job_id == job_id,
+                VideoDownloadJob.status == status,
+                VideoDownloadJob.attempts == attempts
+            ).update({
+                "status": "RUNNING",
+                "attempts": attempts + 1,
+                "lease_until": now + timedelta(seconds=settings.VIDEO_DOWNLOAD_LEASE_SEC)
+            }, synchronize_session=False)
+            if updated:
+                claimed.append((job_id, video_id))
+
+        self.db.commit()
+        return claimed
+
+    def claim_for_playback(self, video_id: int) -> Optional[int]:
+        """
+        播放未缓存视频时立即抢占其下载任务（不等待退避），由播放请求驱动回源并写入缓存
+
+        已放弃的任务和其他进程正在下载（租约未过期）的任务不抢占，调用方直接代理播放
+
+        Args:
+            video_id: 视频ID
+
+        Returns:
+            抢占成功的 job_id，未抢占返回 None
+        """
+        video = self.db.query(VideoAsset).filter(VideoAsset.video_id == video_id).first()
+        if not video:
+            return None
+
+        now = datetime.utcnow()
+        job = self.db.query(VideoDownloadJob).filter(VideoDownloadJob.video_id == video_id).first()
+        if job and job.status == "FAILED":
+            return None
+        if job and job.status == "RUNNING" and job.lease_until and job.lease_until > now:
+            return None
+        if job and job.status == "DONE" and video.cache_status == "CACHED":
+            # 刚下载完成（播放请求读到的是切换前的地址）
+            return None
+        if not job or job.status == "DONE":
+            # 从未缓存或已被淘汰：重新登记
+            url = video.source_play_url or video.watermarked_play_url
+            if not url or url.startswith("/static/"):
+                return None
+            job = self.enqueue(video, url)
+            self.db.flush()
+
+        updated = self.db.query(VideoDownloadJob).filter(
+            VideoDownloadJob.job_id == job.job_id,
+            VideoDownloadJob.status == job.status,
+            VideoDownloadJob.attempts == job.attempts
+        ).update({
+            "status": "RUNNING",
+            "attempts": job.attempts + 1,
+            "lease_until": now + timedelta(seconds=settings.VIDEO_DOWNLOAD_LEASE_SEC)
+        }, synchronize_session=False)
+        self.db.commit()
+        return job.job_id if updated else None
+
+    def seconds_until_next_job(self) -> Optional[float]:
+        """最早一个退避中的下载任务还需等待的秒数，没有则返回 None"""
+        next_at = self.db.query(func.min(VideoDownloadJob.next_attempt_at)).filter(
+            VideoDownloadJob.status == "PENDING"
+        ).scalar()
+        if next_at is None:
+            return None
+        return max((next_at - datetime.utcnow()).total_seconds(), 0.0)
+
+    def record_progress(
+        self,
+        job: VideoDownloadJob,
+        bytes_downloaded: int,
+        total_bytes: Optional[int],
+        etag: Optional[str]
+    ) -> None:
+        """记录续传所需的源文件信息"""
+        job.bytes_downloaded = bytes_downloaded
+        job.total_bytes = total_bytes
+        job.etag = etag
+        self.db.commit()
+
+    def complete_job(self, job: VideoDownloadJob, size: int, sha256: str) -> None:
+        """
+        下载完成：文件已原子落盘，播放地址切换到本地
+
+        Args:
+            job: 下载任务
+            size: 文件字节数
+            sha256: 文件SHA-256
+        """
+        now = datetime.utcnow()
+        job.status = "DONE"
+        job.bytes_downloaded = size
+        job.total_bytes = size
+        job.lease_until = None
+        job.last_error = None
+
+        video = self.db.query(VideoAsset).filter(VideoAsset.video_id == job.video_id).first()
+        if video:
+            video.source_play_url = video.source_play_url or job.source_url
+            video.watermarked_play_url = local_video_url(job.video_id)
+            video.cache_status = "CACHED"
+            video.cache_sha256 = sha256
+            video.file_size_bytes = size
+            video.cached_at = now
+            video.cache_last_access_at = now
+
+        self.db.commit()
+
+    def fail_job(self, job: VideoDownloadJob, error: str, bytes_downloaded: int) -> bool:
+        """
+        下载失败：未超过最大次数时按指数退避重新排队
+
+        Args:
+            job: 下载任务
+            error: 错误信息
+            bytes_downloaded: 已下载到本地分片的字节数（下次从此处续传）
+
+        Returns:
+            是否会重试
+        """
+        job.last_error = error[:500]
+        job.bytes_downloaded = bytes_downloaded
+        job.lease_until = None
+
+        retry = job.attempts < settings.VIDEO_DOWNLOAD_MAX_ATTEMPTS
+        if retry:
+            delay = settings.VIDEO_DOWNLOAD_RETRY_BASE_SEC * (2 ** max(job.attempts - 1, 0))
+            job.status = "PENDING"
+            job.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+        else:
+            job.status = "FAILED"
+            video = self.db.query(VideoAsset).filter(VideoAsset.video_id == job.video_id).first()
+            if video:
+                video.cache_status = "FAILED"
+
+        self.db.commit()
+        return retry
+
+    def release_jobs(self, job_ids: List[int]) -> None:
+        """进程退出时交还未完成的下载任务（不计入尝试次数），重启后立即续传"""
+        if not job_ids:
+            return
+        self.db.query(VideoDownloadJob).filter(
+            VideoDownloadJob.job_id.in_(job_ids),
+            VideoDownloadJob.status == "RUNNING"
+        ).update({
+            "status": "PENDING",
+            "attempts": VideoDownloadJob.attempts - 1,
+            "next_attempt_at": datetime.utcnow(),
+            "lease_until": None
+        }, synchronize_session=False)
+        self.db.commit()
+
+    def flush_access_log(self) -> int:
+        """
+        把内存中的访问记录批量写入视频资产（一个事务）
+
+        Returns:
+            更新的视频数
+        """
+        global _access_log
+        with _access_lock:
+            pending, _access_log = _access_log, {}
+        if not pending:
+            return 0
+
+        try:
+            for video_id, (accessed_at, hits) in pending.items():
+                self.db.query(VideoAsset).filter(VideoAsset.video_id == video_id).update({
+                    "cache_last_access_at": accessed_at,
+                    "cache_hits": func.coalesce(VideoAsset.cache_hits, 0) + hits
+                }, synchronize_session=False)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            # 落库失败时放回，下次再试
+            with _access_lock:
+                for video_id, (accessed_at, hits) in pending.items():
+                    entry = _access_log.setdefault(video_id, [accessed_at, 0])
+                    entry[0] = max(entry[0], accessed_at)
+                    entry[1] += hits
+            raise
+        return len(pending)
+
+    def cache_usage(self) -> Tuple[int, int]:
+        """
+        本地缓存占用
+
+        Returns:
+            (字节数, 视频数)
+        """
+        used, count = self.db.query(
+            func.coalesce(func.sum(VideoAsset.file_size_bytes), 0),
+            func.count(VideoAsset.video_id)
+        ).filter(VideoAsset.cache_status == "CACHED").one()
+        return int(used), int(count)
+
+    def evict(
+        self,
+        max_bytes: Optional[int] = None,
+        target_ratio: Optional[float] = None,
+        policy: Optional[str] = None
+    ) -> Tuple[int, int]:
+        """
+        缓存超过容量上限时淘汰最冷的视频，直到降到 max_bytes * target_ratio
+
+        淘汰先在数据库中把播放地址切回供应商地址（条件更新，只处理仍为 CACHED 的视频），
+        提交后再删除文件；已在读取该文件的请求不受影响。没有供应商地址的视频无法回源，不会被淘汰
+
+        Args:
+            max_bytes: 容量上限，默认 VIDEO_CACHE_MAX_BYTES
+            target_ratio: 清理目标比例，默认 VIDEO_CACHE_TARGET_RATIO
+            policy: lru / lfu，默认 VIDEO_CACHE_EVICTION_POLICY
+
+        Returns:
+            (淘汰的视频数, 释放的字节数)
+        """
+        max_bytes = max_bytes if max_bytes is not None else settings.VIDEO_CACHE_MAX_BYTES
+        target_ratio = target_ratio if target_ratio is not None else settings.VIDEO_CACHE_TARGET_RATIO
+        policy = policy or settings.VIDEO_CACHE_EVICTION_POLICY
+
+        used, count = self.cache_usage()
+        cache_bytes.set(used)
+        cache_files.set(count)
+        if used <= max_bytes:
+            return 0, 0
+
+        target = int(max_bytes * target_ratio)
+        last_access = func.coalesce(VideoAsset.cache_last_access_at, VideoAsset.cached_at)
+        if policy == "lfu":
+            order = (func.coalesce(VideoAsset.cache_hits, 0), last_access, VideoAsset.video_id)
+        else:
+            order = (last_access, VideoAsset.video_id)
+
+        evicted, freed = 0, 0
+        while used > target:
+            candidates = self.db.query(
+                VideoAsset.video_id, VideoAsset.file_size_bytes, VideoAsset.source_play_url
+            ).filter(
+                VideoAsset.cache_status == "CACHED",
+                VideoAsset.source_play_url.isnot(None)
+            ).order_by(*order).limit(EVICTION_BATCH_SIZE).all()
+            if not candidates:
+                break
+
+            removed = []
+            for video_id, size, source_url in candidates:
+                if used <= target:
+                    break
+                updated = self.db.query(VideoAsset).filter(
+                    VideoAsset.video_id == video_id,
+                    VideoAsset.cache_status == "CACHED"
+                ).update({
+                    "watermarked_play_url": source_url,
+                    "cache_status": "EVICTED"
+                }, synchronize_session=False)
+                if updated:
+                    removed.append(video_id)
+                    used -= size or 0
+                    freed += size or 0
+            self.db.commit()
+
+            for video_id in removed:
+                try:
+                    os.remove(local_video_path(video_id))
+                except FileNotFoundError:
+                    pass
+            evicted += len(removed)
+
+        cache_evictions.inc(evicted)
+        cache_evicted_bytes.inc(freed)
+        cache_bytes.set(used)
+        cache_files.set(count - evicted)
+        return evicted, freed
+
+    def mark_missing(self, video: VideoAsset) -> bool:
+        """
+        本地缓存文件丢失：播放地址回退到供应商地址并重新下载
+
+        Returns:
+            是否已回退（没有供应商地址时无法恢复）
+        """
+        if not video.source_play_url:
+            return False
+        video.watermarked_play_url = video.source_play_url
+        self.enqueue(video, video.source_play_url)
+        self.db.commit()
+        return True
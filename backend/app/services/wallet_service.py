@@ -108,7 +108,8 @@ class WalletService:
         type: str,
         ref_type: str = None,
         ref_id: int = None,
-        description: str = None
+        description: str = None,
+        commit: bool = True
     ) -> CreditLedger:
         """
         增加积分（通用方法）
@@ -120,6 +121,7 @@ class WalletService:
             ref_type: 关联类型
             ref_id: 关联ID
             description: 描述
+            commit: 是否立即提交；为False时只flush，由调用方与其他变更在同一事务中提交
         
         Returns:
             流水记录
@@ -148,8 +150,11 @@ class WalletService:
         )
         
         self.db.add(ledger)
-        self.db.commit()
-        self.db.refresh(ledger)
+        if commit:
+            self.db.commit()
+            self.db.refresh(ledger)
+        else:
+            self.db.flush()
         
         return ledger
     
@@ -160,7 +165,8 @@ class WalletService:
         type: str,
         ref_type: str = None,
         ref_id: int = None,
-        description: str = None
+        description: str = None,
+        commit: bool = True
     ) -> CreditLedger:
         """
         扣除积分（通用方法）
@@ -172,6 +178,7 @@ class WalletService:
             ref_type: 关联类型
             ref_id: 关联ID
             description: 描述
+            commit: 是否立即提交；为False时只flush，由调用方与其他变更在同一事务中提交
         
         Returns:
             流水记录
@@ -204,7 +211,10 @@ class WalletService:
         )
         
         self.db.add(ledger)
-        self.db.commit()
-        self.db.refresh(ledger)
+        if commit:
+            self.db.commit()
+            self.db.refresh(ledger)
+        else:
+            self.db.flush()
         
         return ledger
@@ -2,14 +2,24 @@
 DyuAPI Sora2 供应商适配器
 完全按照供应商API对接文档实现
 """
+import hmac
+import time
+import hashlib
 import httpx
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from app.core.config import settings
+from app.vendors.resilience import STATE_CLOSED, CircuitBreaker, call_with_retry, hedged
 
 
 class DyuSora2Adapter:
     """DyuAPI Sora2 适配器"""
     
+    # 进程内共享的连接池客户端（由 FastAPI 启动/关闭事件管理生命周期）
+    _client: Optional[httpx.AsyncClient] = None
+    
+    # 按接口划分的熔断器（进程内共享），某个接口故障不影响其他接口
+    _breakers: Dict[str, CircuitBreaker] = {}
+    
     def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None):
         self.api_key = api_key or settings.DYUAPI_API_KEY
         self.base_url = base_url or settings.DYUAPI_BASE_URL
@@ -18,6 +28,136 @@ class DyuSora2Adapter:
             "Content-Type": "application/json"
         }
     
+    # ==================== 连接池管理 ====================
+    
+    @classmethod
+    def _build_client(cls) -> httpx.AsyncClient:
+        """按配置创建长连接客户端（keep-alive 连接池，可选 HTTP/2）"""
+        http2 = settings.DYUAPI_HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401  httpx 的 HTTP/2 支持依赖 h2
+            except ImportError:
+                print("⚠️ DYUAPI_HTTP2=true 但未安装 h2（pip install httpx[http2]），回退到 HTTP/1.1")
+                http2 = False
+        
+        return httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.DYUAPI_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.DYUAPI_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.DYUAPI_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(
+                settings.DYUAPI_TIMEOUT,
+                connect=settings.DYUAPI_CONNECT_TIMEOUT,
+            ),
+        )
+    
+    @classmethod
+    async def startup(cls) -> None:
+        """应用启动时创建共享客户端"""
+        if cls._client is None or cls._client.is_closed:
+            cls._client = cls._build_client()
+    
+    @classmethod
+    async def shutdown(cls) -> None:
+        """应用关闭时释放连接池"""
+        if cls._client is not None:
+            await cls._client.aclose()
+            cls._client = None
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        获取共享客户端
+        
+        脚本等未经过 FastAPI 启动事件的场景下按需懒加载
+        """
+        cls = type(self)
+        if cls._client is None or cls._client.is_closed:
+            cls._client = cls._build_client()
+        return cls._client
+    
+    @classmethod
+    def get_breaker(cls, endpoint: str) -> CircuitBreaker:
+        """获取（按需创建）某个接口的熔断器"""
+        breaker = cls._breakers.get(endpoint)
+        if breaker is None:
+            breaker = cls._breakers[endpoint] = CircuitBreaker(
+                endpoint,
+                failure_threshold=settings.DYUAPI_BREAKER_FAILURE_THRESHOLD,
+                reset_timeout_sec=settings.DYUAPI_BREAKER_RESET_SEC,
+                half_open_max_calls=settings.DYUAPI_BREAKER_HALF_OPEN_MAX_CALLS,
+            )
+        return breaker
+    
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        endpoint: str,
+        retry: bool = False,
+        hedge: bool = False,
+        headers: Optional[Dict[str, str]] = None,
+        **kwargs
+    ) -> httpx.Response:
+        """
+        通过共享连接池发送请求，非2xx时抛出 httpx.HTTPStatusError
+        
+        每次请求经过该接口的熔断器，熔断打开时立即抛出 CircuitOpenError
+        
+        对冲与重试、熔断的关系：对冲请求和首个请求各自经过熔断器（两者都失败计两次失败），
+        整对请求算重试中的一次尝试；只有首次尝试且熔断器关闭时才对冲——
+        半开时探测名额只够一个请求，重试说明供应商已经出错，此时再加倍请求只会加重负载
+        
+        Args:
+            method: HTTP方法
+            path: 接口路径
+            endpoint: 接口名（熔断器与指标按此划分）
+            retry: 是否允许抖动重试（仅限幂等请求：读取，或带幂等键的创建）
+            hedge: 是否启用对冲请求（仅限读取，需配置 DYUAPI_HEDGE_DELAY_MS）
+            headers: 额外请求头
+        """
+        breaker = self.get_breaker(endpoint)
+        request_headers = {**self.headers, **(headers or {})}
+        
+        async def send() -> httpx.Response:
+            response = await self.client.request(
+                method,
+                f"{self.base_url}{path}",
+                headers=request_headers,
+                **kwargs
+            )
+            response.raise_for_status()
+            return response
+        
+        attempts = 0
+        
+        async def attempt() -> httpx.Response:
+            nonlocal attempts
+            attempts += 1
+            if hedge and settings.DYUAPI_HEDGE_DELAY_MS > 0 and attempts == 1:
+                return await hedged(
+                    lambda: breaker.call(send),
+                    endpoint,
+                    settings.DYUAPI_HEDGE_DELAY_MS / 1000,
+                    allow=lambda: breaker.state == STATE_CLOSED
+                )
+            return await breaker.call(send)
+        
+        if not retry:
+            return await attempt()
+        
+        return await call_with_retry(
+            attempt,
+            endpoint,
+            attempts=settings.DYUAPI_RETRY_ATTEMPTS,
+            base_delay=settings.DYUAPI_RETRY_BASE_DELAY,
+            max_delay=settings.DYUAPI_RETRY_MAX_DELAY,
+            deadline_sec=settings.DYUAPI_RETRY_DEADLINE_SEC,
+        )
+    
     # ==================== 模型名称映射 ====================
     
     MODEL_MAPPING = {
@@ -53,6 +193,27 @@ class DyuSora2Adapter:
         else:
             return cls.MODEL_MAPPING.get(f"{orientation}_25s", "sora2-pro-landscape-25s")
     
+    # 参考图的最大有效分辨率（宽, 高）：与输出分辨率一致，更大的图供应商也会先缩小
+    REFERENCE_IMAGE_SIZES = {
+        "16:9": (1280, 720),
+        "9:16": (720, 1280),
+        "1:1": (720, 720),
+    }
+    REFERENCE_IMAGE_SIZES_HD = {
+        "16:9": (1792, 1024),
+        "9:16": (1024, 1792),
+        "1:1": (1024, 1024),
+    }
+    
+    @classmethod
+    def get_reference_image_size(cls, ratio: Optional[str], model: Optional[str]) -> Tuple[int, int]:
+        """参考图的最大有效分辨率（未知比例按长边限制）"""
+        sizes = cls.REFERENCE_IMAGE_SIZES_HD if model and "-hd-" in model else cls.REFERENCE_IMAGE_SIZES
+        if ratio in sizes:
+            return sizes[ratio]
+        longest = max(sizes["16:9"])
+        return longest, longest
+    
     # ==================== 状态映射 ====================
     
     STATUS_MAPPING = {
@@ -91,7 +252,8 @@ class DyuSora2Adapter:
         prompt: str,
         duration_sec: int = 10,
         ratio: str = "9:16",
-        model: Optional[str] = None
+        model: Optional[str] = None,
+        idempotency_key: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         创建文生视频任务
@@ -101,6 +263,7 @@ class DyuSora2Adapter:
             duration_sec: 视频时长（秒）
             ratio: 视频比例（9:16/16:9/1:1）
             model: 指定模型名称（可选）
+            idempotency_key: 幂等键（可选），提供时失败可安全重试
         
         Returns:
             包含task_id的响应
@@ -114,16 +277,11 @@ class DyuSora2Adapter:
             "duration": duration_sec,
             "aspect_ratio": ratio
         }
+        if self.webhooks_enabled():
+            payload["callback_url"] = settings.DYUAPI_CALLBACK_URL
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.base_url}/v1/video/generations",
-                headers=self.headers,
-                json=payload,
-                timeout=30.0
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await self._create(payload, idempotency_key)
+        return response.json()
     
     # ==================== API 2: 图生视频 ====================
     
@@ -133,7 +291,8 @@ class DyuSora2Adapter:
         prompt: str,
         duration_sec: int = 10,
         ratio: str = "9:16",
-        model: Optional[str] = None
+        model: Optional[str] = None,
+        idempotency_key: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         创建图生视频任务
@@ -144,6 +303,7 @@ class DyuSora2Adapter:
             duration_sec: 视频时长（秒）
             ratio: 视频比例
             model: 指定模型名称（可选）
+            idempotency_key: 幂等键（可选），提供时失败可安全重试
         
         Returns:
             包含task_id的响应
@@ -158,16 +318,23 @@ class DyuSora2Adapter:
             "duration": duration_sec,
             "aspect_ratio": ratio
         }
+        if self.webhooks_enabled():
+            payload["callback_url"] = settings.DYUAPI_CALLBACK_URL
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.base_url}/v1/video/generations",
-                headers=self.headers,
-                json=payload,
-                timeout=30.0
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await self._create(payload, idempotency_key)
+        return response.json()
+    
+    async def _create(self, payload: Dict[str, Any], idempotency_key: Optional[str]) -> httpx.Response:
+        """提交创建请求；带幂等键时允许重试（供应商按键去重，不会重复建任务）"""
+        headers = {"Idempotency-Key": idempotency_key} if idempotency_key else None
+        return await self._request(
+            "POST",
+            "/v1/video/generations",
+            endpoint="create",
+            retry=bool(idempotency_key),
+            headers=headers,
+            json=payload
+        )
     
     # ==================== API 3: 查询任务状态 ====================
     
@@ -181,14 +348,14 @@ class DyuSora2Adapter:
         Returns:
             任务详情
         """
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/v1/video/generations/{task_id}",
-                headers=self.headers,
-                timeout=30.0
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await self._request(
+            "GET",
+            f"/v1/video/generations/{task_id}",
+            endpoint="get_task",
+            retry=True,
+            hedge=True
+        )
+        return response.json()
     
     # ==================== API 4: 获取视频详情 ====================
     
@@ -202,14 +369,8 @@ class DyuSora2Adapter:
         Returns:
             视频详情（包含播放/下载链接）
         """
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/v1/videos/{video_id}",
-                headers=self.headers,
-                timeout=30.0
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await self._request("GET", f"/v1/videos/{video_id}", endpoint="get_video", retry=True)
+        return response.json()
     
     # ==================== API 5: 获取下载链接 ====================
     
@@ -230,16 +391,15 @@ class DyuSora2Adapter:
         """
         params = {"watermark": str(watermark).lower()}
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/v1/videos/{video_id}/download",
-                headers=self.headers,
-                params=params,
-                timeout=30.0
-            )
-            response.raise_for_status()
-            data = response.json()
-            return data.get("download_url")
+        response = await self._request(
+            "GET",
+            f"/v1/videos/{video_id}/download",
+            endpoint="download",
+            retry=True,
+            params=params
+        )
+        data = response.json()
+        return data.get("download_url")
     
     # ==================== API 6: 列出任务 ====================
     
@@ -266,15 +426,8 @@ class DyuSora2Adapter:
         if after:
             params["after"] = after
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/v1/video/generations",
-                headers=self.headers,
-                params=params,
-                timeout=30.0
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await self._request("GET", "/v1/video/generations", endpoint="list_tasks", retry=True, params=params)
+        return response.json()
     
     # ==================== API 7: 列出视频 ====================
     
@@ -297,15 +450,8 @@ class DyuSora2Adapter:
         if after:
             params["after"] = after
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/v1/videos",
-                headers=self.headers,
-                params=params,
-                timeout=30.0
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await self._request("GET", "/v1/videos", endpoint="list_videos", retry=True, params=params)
+        return response.json()
     
     # ==================== API 8: 取消任务 ====================
     
@@ -319,14 +465,51 @@ class DyuSora2Adapter:
         Returns:
             取消结果
         """
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.base_url}/v1/video/generations/{task_id}/cancel",
-                headers=self.headers,
-                timeout=30.0
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await self._request("POST", f"/v1/video/generations/{task_id}/cancel", endpoint="cancel")
+        return response.json()
+    
+    # ==================== 回调签名 ====================
+    
+    @staticmethod
+    def webhooks_enabled() -> bool:
+        """是否已配置供应商回调"""
+        return bool(settings.DYUAPI_CALLBACK_URL and settings.DYUAPI_WEBHOOK_SECRET)
+    
+    @staticmethod
+    def sign_webhook(secret: str, timestamp: str, body: bytes) -> str:
+        """
+        计算回调签名：HMAC-SHA256(secret, "{timestamp}." + body) 的十六进制
+        """
+        message = timestamp.encode("utf-8") + b"." + body
+        return hmac.new(secret.encode("utf-8"), message, hashlib.sha256).hexdigest()
+    
+    @classmethod
+    def verify_webhook(cls, body: bytes, timestamp: Optional[str], signature: Optional[str]) -> bool:
+        """
+        校验回调签名和时间戳（防篡改、防重放）
+        
+        Args:
+            body: 原始请求体
+            timestamp: X-Dyu-Timestamp 请求头（Unix秒）
+            signature: X-Dyu-Signature 请求头（可带 "sha256=" 前缀）
+        
+        Returns:
+            校验是否通过
+        """
+        secret = settings.DYUAPI_WEBHOOK_SECRET
+        if not secret or not timestamp or not signature:
+            return False
+        
+        try:
+            if abs(time.time() - int(timestamp)) > settings.DYUAPI_WEBHOOK_TOLERANCE_SEC:
+                return False
+        except ValueError:
+            return False
+        
+        if signature.startswith("sha256="):
+            signature = signature[len("sha256="):]
+        expected = cls.sign_webhook(secret, timestamp, body)
+        return hmac.compare_digest(expected, signature)
     
     # ==================== 辅助方法 ====================
     
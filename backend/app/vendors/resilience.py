@@ -0,0 +1,282 @@
+"""
+供应商调用容错：熔断器、抖动重试、对冲请求
+"""
+import time
+import random
+import asyncio
+from typing import Awaitable, Callable, Optional, TypeVar
+import httpx
+from app.core.metrics import metrics
+
+T = TypeVar("T")
+
+# 熔断器状态及其导出的指标值
+STATE_CLOSED = "closed"
+STATE_HALF_OPEN = "half_open"
+STATE_OPEN = "open"
+STATE_VALUES = {STATE_CLOSED: 0, STATE_HALF_OPEN: 1, STATE_OPEN: 2}
+
+breaker_state = metrics.gauge(
+    "vendor_circuit_state",
+    "Circuit breaker state per vendor endpoint (0=closed, 1=half_open, 2=open)",
+    ["vendor", "endpoint"]
+)
+breaker_transitions = metrics.counter(
+    "vendor_circuit_transitions_total",
+    "Circuit breaker state transitions",
+    ["vendor", "endpoint", "state"]
+)
+breaker_rejections = metrics.counter(
+    "vendor_circuit_rejections_total",
+    "Calls rejected without reaching the vendor because the breaker was open",
+    ["vendor", "endpoint"]
+)
+vendor_requests = metrics.counter(
+    "vendor_requests_total",
+    "Vendor HTTP requests by outcome",
+    ["vendor", "endpoint", "outcome"]
+)
+vendor_retries = metrics.counter(
+    "vendor_retries_total",
+    "Vendor request retries",
+    ["vendor", "endpoint"]
+)
+vendor_hedges = metrics.counter(
+    "vendor_hedged_requests_total",
+    "Hedged vendor requests by which attempt won",
+    ["vendor", "endpoint", "winner"]
+)
+vendor_latency = metrics.histogram(
+    "vendor_request_duration_seconds",
+    "Vendor HTTP request latency",
+    ["vendor", "endpoint"]
+)
+
+
+class CircuitOpenError(httpx.HTTPError):
+    """熔断器打开，请求未发往供应商"""
+
+    def __init__(self, endpoint: str, retry_after: float):
+        super().__init__(f"供应商接口 {endpoint} 熔断中，{retry_after:.0f}秒后重试")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+def is_breaker_failure(exc: BaseException) -> bool:
+    """网络错误、超时和 5xx 计入熔断失败；4xx（含429）说明供应商仍在正常响应"""
+    if isinstance(exc, CircuitOpenError):
+        return False
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """可重试的错误：网络错误、超时、5xx 和 429"""
+    if isinstance(exc, CircuitOpenError):
+        return False
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+class CircuitBreaker:
+    """
+    单个接口的熔断器
+
+    - closed：连续失败达到阈值后打开
+    - open：直接拒绝请求，冷却时间到后进入半开
+    - half_open：只放行少量探测请求，成功则关闭，失败则重新打开
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        vendor: str = "dyuapi",
+        failure_threshold: int = 5,
+        reset_timeout_sec: float = 30.0,
+        half_open_max_calls: int = 1
+    ):
+        self.endpoint = endpoint
+        self.vendor = vendor
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_sec = reset_timeout_sec
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        breaker_state.set(STATE_VALUES[STATE_CLOSED], vendor=vendor, endpoint=endpoint)
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            return
+        self.state = state
+        breaker_state.set(STATE_VALUES[state], vendor=self.vendor, endpoint=self.endpoint)
+        breaker_transitions.inc(vendor=self.vendor, endpoint=self.endpoint, state=state)
+        if state == STATE_OPEN:
+            print(f"⚠️ 供应商接口 {self.endpoint} 熔断打开（连续失败 {self.failures} 次）")
+        elif state == STATE_CLOSED:
+            print(f"✅ 供应商接口 {self.endpoint} 熔断恢复")
+
+    def before_call(self) -> None:
+        """
+        请求前检查是否放行
+
+        Raises:
+            CircuitOpenError: 熔断打开或半开探测名额已满
+        """
+        if self.state == STATE_OPEN:
+            remaining = self.opened_at + self.reset_timeout_sec - time.monotonic()
+            if remaining > 0:
+                breaker_rejections.inc(vendor=self.vendor, endpoint=self.endpoint)
+                raise CircuitOpenError(self.endpoint, remaining)
+            self.half_open_calls = 0
+            self._transition(STATE_HALF_OPEN)
+
+        if self.state == STATE_HALF_OPEN:
+            if self.half_open_calls >= self.half_open_max_calls:
+                breaker_rejections.inc(vendor=self.vendor, endpoint=self.endpoint)
+                raise CircuitOpenError(self.endpoint, self.reset_timeout_sec)
+            self.half_open_calls += 1
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._transition(STATE_CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == STATE_HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._transition(STATE_OPEN)
+
+    def record_release(self) -> None:
+        """请求被取消（如对冲落败）时归还半开探测名额，不计成败"""
+        if self.state == STATE_HALF_OPEN and self.half_open_calls > 0:
+            self.half_open_calls -= 1
+
+    async def call(self, func: Callable[[], Awaitable[T]]) -> T:
+        """经熔断器执行一次请求"""
+        self.before_call()
+        started = time.monotonic()
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            self.record_release()
+            raise
+        except Exception as e:
+            vendor_latency.observe(time.monotonic() - started, vendor=self.vendor, endpoint=self.endpoint)
+            if is_breaker_failure(e):
+                vendor_requests.inc(vendor=self.vendor, endpoint=self.endpoint, outcome="failure")
+                self.record_failure()
+            else:
+                # 4xx：供应商可用，只是请求本身被拒绝
+                vendor_requests.inc(vendor=self.vendor, endpoint=self.endpoint, outcome="rejected")
+                self.record_success()
+            raise
+        vendor_latency.observe(time.monotonic() - started, vendor=self.vendor, endpoint=self.endpoint)
+        vendor_requests.inc(vendor=self.vendor, endpoint=self.endpoint, outcome="success")
+        self.record_success()
+        return result
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """全抖动指数退避：[0, min(max_delay, base_delay * 2^attempt)]"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """读取 429/503 响应的 Retry-After（秒）"""
+    if not isinstance(exc, httpx.HTTPStatusError):
+        return None
+    value = exc.response.headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+async def call_with_retry(
+    func: Callable[[], Awaitable[T]],
+    endpoint: str,
+    attempts: int,
+    base_delay: float,
+    max_delay: float,
+    deadline_sec: float,
+    vendor: str = "dyuapi"
+) -> T:
+    """
+    有界重试：最多 attempts 次，总耗时不超过 deadline_sec
+
+    只能用于幂等请求（读取，或带幂等键的创建）
+
+    Args:
+        func: 发起一次请求的协程工厂
+        endpoint: 接口名（用于指标）
+        attempts: 最大尝试次数（含首次）
+        base_delay: 退避基数（秒）
+        max_delay: 单次退避上限（秒）
+        deadline_sec: 总耗时上限（秒），剩余时间不足以等待退避时不再重试
+    """
+    started = time.monotonic()
+    for attempt in range(attempts):
+        try:
+            return await func()
+        except Exception as e:
+            if attempt + 1 >= attempts or not is_retryable(e):
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            hinted = retry_after_seconds(e)
+            if hinted is not None:
+                delay = max(delay, min(hinted, max_delay))
+            if time.monotonic() - started + delay >= deadline_sec:
+                raise
+            vendor_retries.inc(vendor=vendor, endpoint=endpoint)
+            await asyncio.sleep(delay)
+    raise RuntimeError("unreachable")
+
+
+async def hedged(
+    func: Callable[[], Awaitable[T]],
+    endpoint: str,
+    delay_sec: float,
+    vendor: str = "dyuapi",
+    allow: Optional[Callable[[], bool]] = None
+) -> T:
+    """
+    对冲请求：首个请求 delay_sec 内未返回时再发一个，取先成功的结果，取消另一个
+
+    只能用于幂等读取
+
+    Args:
+        func: 发起一次请求的协程工厂
+        endpoint: 接口名（用于指标）
+        delay_sec: 首个请求多久未返回时发出对冲请求（秒）
+        allow: 发出对冲请求前的检查，返回 False 时不再对冲、只等首个请求
+    """
+    primary = asyncio.ensure_future(func())
+    done, _ = await asyncio.wait({primary}, timeout=delay_sec)
+    if done:
+        return primary.result()
+    if allow is not None and not allow():
+        return await primary
+
+    backup = asyncio.ensure_future(func())
+    pending = {primary, backup}
+    error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for job in done:
+                if job.exception() is None:
+                    winner = "primary" if job is primary else "hedge"
+                    vendor_hedges.inc(vendor=vendor, endpoint=endpoint, winner=winner)
+                    return job.result()
+                error = job.exception()
+        vendor_hedges.inc(vendor=vendor, endpoint=endpoint, winner="none")
+        raise error
+    finally:
+        for job in pending:
+            job.cancel()
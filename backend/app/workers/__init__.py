@@ -0,0 +1 @@
+# 后台任务模块
@@ -0,0 +1,235 @@
+"""
+供应商任务提交调度器
+全局令牌桶限制提交速率，按用户公平排队，订阅用户走优先通道
+
+注意：令牌桶在进程内生效，多 worker 部署时 VENDOR_SUBMIT_RATE_PER_SEC 应按 worker 数均分供应商配额
+"""
+import time
+import asyncio
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+from app.core.config import settings
+from app.core.metrics import metrics
+
+LANE_PRIORITY = "priority"
+LANE_STANDARD = "standard"
+
+queue_depth = metrics.gauge(
+    "vendor_submit_queue_depth",
+    "Tasks waiting for a vendor submission slot",
+    ["lane"]
+)
+queue_wait = metrics.histogram(
+    "vendor_submit_wait_seconds",
+    "Time a task waited for a vendor submission slot",
+    ["lane"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+)
+queue_granted = metrics.counter(
+    "vendor_submit_granted_total",
+    "Vendor submission slots granted",
+    ["lane"]
+)
+queue_abandoned = metrics.counter(
+    "vendor_submit_abandoned_total",
+    "Tasks that left the queue before a slot was granted (timeout or cancellation)",
+    ["lane"]
+)
+
+
+class SubmissionQueueTimeout(Exception):
+    """排队超时，未获得提交名额"""
+    pass
+
+
+class TokenBucket:
+    """令牌桶：稳定速率 rate_per_sec，允许 burst 个突发"""
+
+    def __init__(self, rate_per_sec: float, burst: int):
+        self.rate = rate_per_sec
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def take(self) -> None:
+        """取一个令牌，不足时等待"""
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def give_back(self) -> None:
+        """归还未使用的令牌"""
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+
+class FairQueue:
+    """
+    按用户的加权公平队列（虚拟完成时间）
+
+    每个用户的请求依次排在 max(虚拟时钟, 该用户上一个请求的完成时间) + 1/weight 处，
+    出队时取完成时间最小者；单个用户的突发只会排在自己后面，不会挤占其他用户
+    """
+
+    def __init__(self):
+        self.vtime = 0.0
+        self._queues: Dict[int, Deque[Tuple[float, asyncio.Future]]] = {}
+        self._last_finish: Dict[int, float] = {}
+
+    def __len__(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def push(self, user_id: int, waiter: asyncio.Future, weight: float = 1.0) -> None:
+        start = max(self.vtime, self._last_finish.get(user_id, 0.0))
+        finish = start + 1.0 / weight
+        self._last_finish[user_id] = finish
+        self._queues.setdefault(user_id, deque()).append((finish, waiter))
+
+    def pop(self) -> Optional[asyncio.Future]:
+        """取出下一个仍在等待的请求（跳过已超时/取消的）"""
+        while self._queues:
+            user_id = min(self._queues, key=lambda uid: self._queues[uid][0][0])
+            queue = self._queues[user_id]
+            finish, waiter = queue.popleft()
+            if not queue:
+                del self._queues[user_id]
+            self.vtime = max(self.vtime, finish)
+            if not waiter.done():
+                self._prune()
+                return waiter
+        self._prune()
+        return None
+
+    def _prune(self) -> None:
+        """清理已无排队且完成时间落后于虚拟时钟的用户"""
+        stale = [
+            uid for uid, finish in self._last_finish.items()
+            if uid not in self._queues and finish <= self.vtime
+        ]
+        for uid in stale:
+            del self._last_finish[uid]
+
+
+class SubmissionScheduler:
+    """供应商提交调度器"""
+
+    def __init__(
+        self,
+        rate_per_sec: Optional[float] = None,
+        burst: Optional[int] = None,
+        priority_burst: Optional[int] = None
+    ):
+        self.bucket = TokenBucket(
+            rate_per_sec or settings.VENDOR_SUBMIT_RATE_PER_SEC,
+            burst or settings.VENDOR_SUBMIT_BURST
+        )
+        # 优先通道连续放行多少个后，若普通通道有等待则放行一个普通请求（防饿死）
+        self.priority_burst = priority_burst or settings.VENDOR_SUBMIT_PRIORITY_BURST
+        self.lanes = {LANE_PRIORITY: FairQueue(), LANE_STANDARD: FairQueue()}
+        self._priority_streak = 0
+        self._wakeup = asyncio.Event()
+        self._runner: Optional[asyncio.Task] = None
+
+    def depth(self, lane: Optional[str] = None) -> int:
+        """当前排队数"""
+        if lane:
+            return len(self.lanes[lane])
+        return sum(len(q) for q in self.lanes.values())
+
+    def start(self) -> None:
+        """启动分发循环"""
+        if self._runner is None or self._runner.done():
+            self._wakeup = asyncio.Event()
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止分发循环"""
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+
+    async def acquire(self, user_id: int, priority: bool = False, timeout: Optional[float] = None) -> float:
+        """
+        排队等待一个提交名额
+
+        Args:
+            user_id: 用户ID（同一用户的请求彼此排队）
+            priority: 是否走优先通道（订阅用户）
+            timeout: 最长等待秒数，默认 VENDOR_SUBMIT_MAX_WAIT_SEC
+
+        Returns:
+            实际等待秒数
+
+        Raises:
+            SubmissionQueueTimeout: 超时未获得名额
+        """
+        self.start()
+        lane = LANE_PRIORITY if priority else LANE_STANDARD
+        waiter = asyncio.get_running_loop().create_future()
+        self.lanes[lane].push(user_id, waiter)
+        queue_depth.set(len(self.lanes[lane]), lane=lane)
+        self._wakeup.set()
+
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter, timeout or settings.VENDOR_SUBMIT_MAX_WAIT_SEC)
+        except asyncio.TimeoutError:
+            queue_abandoned.inc(lane=lane)
+            raise SubmissionQueueTimeout(f"排队超过{timeout or settings.VENDOR_SUBMIT_MAX_WAIT_SEC:.0f}秒")
+        except asyncio.CancelledError:
+            queue_abandoned.inc(lane=lane)
+            raise
+
+        waited = time.monotonic() - started
+        queue_wait.observe(waited, lane=lane)
+        queue_granted.inc(lane=lane)
+        return waited
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        priority_lane = self.lanes[LANE_PRIORITY]
+        standard_lane = self.lanes[LANE_STANDARD]
+
+        if len(standard_lane) and (not len(priority_lane) or self._priority_streak >= self.priority_burst):
+            waiter = standard_lane.pop()
+            if waiter is not None:
+                self._priority_streak = 0
+                return waiter
+
+        waiter = priority_lane.pop()
+        if waiter is not None:
+            self._priority_streak += 1
+            return waiter
+
+        return standard_lane.pop()
+
+    async def _run(self) -> None:
+        while True:
+            if not self.depth():
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            await self.bucket.take()
+            waiter = self._next_waiter()
+            for lane, queue in self.lanes.items():
+                queue_depth.set(len(queue), lane=lane)
+
+            if waiter is None:
+                # 排队者都已超时/取消，令牌留给下一个
+                self.bucket.give_back()
+                continue
+            waiter.set_result(None)
+
+
+# 全局调度器实例（首次使用时启动分发循环，应用关闭时停止）
+submission_scheduler = SubmissionScheduler()
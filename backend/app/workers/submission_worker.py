@@ -0,0 +1,104 @@
+"""
+任务提交后台工作器
+把 PENDING_SUBMIT 任务提交给供应商，创建接口因此不再等待供应商响应
+"""
+import asyncio
+from typing import Optional, Set
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import Task
+
+
+class TaskSubmissionWorker:
+    """任务提交工作器（进程内 asyncio 任务池）"""
+
+    def __init__(self, concurrency: Optional[int] = None, recovery_interval_sec: Optional[float] = None):
+        self.concurrency = concurrency or settings.VENDOR_SUBMIT_CONCURRENCY
+        self.recovery_interval_sec = recovery_interval_sec or settings.VENDOR_SUBMIT_RECOVERY_INTERVAL_SEC
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._runner: Optional[asyncio.Task] = None
+        # 本进程正在处理的任务ID，避免恢复循环重复入队
+        self._inflight: Set[int] = set()
+        self._jobs: Set[asyncio.Task] = set()
+
+    def start(self) -> None:
+        """启动恢复循环（启动时立即把中断的待提交任务重新入队）"""
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止恢复循环并取消进行中的提交（任务保持 PENDING_SUBMIT，租约过期后由其他进程恢复）"""
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+
+        for job in list(self._jobs):
+            job.cancel()
+        if self._jobs:
+            await asyncio.gather(*self._jobs, return_exceptions=True)
+
+    def enqueue(self, task_id: int) -> None:
+        """把任务加入提交队列"""
+        if task_id in self._inflight:
+            return
+        self._inflight.add(task_id)
+        job = asyncio.create_task(self._submit(task_id))
+        self._jobs.add(job)
+        job.add_done_callback(self._jobs.discard)
+
+    async def _submit(self, task_id: int) -> None:
+        from app.services.task_service import TaskService  # 避免循环导入
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        db = SessionLocal()
+        try:
+            task = db.query(Task).filter(Task.task_id == task_id).first()
+            if not task:
+                return
+            service = TaskService(db)
+            if await service.submit_to_vendor(task, self._semaphore):
+                print(f"✅ 任务已提交供应商: {task_id} -> {task.vendor_task_id}")
+        except Exception as e:
+            print(f"⚠️ 任务提交异常: {task_id} {e}")
+        finally:
+            db.close()
+            self._inflight.discard(task_id)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                self.recover()
+            except Exception as e:
+                print(f"⚠️ 待提交任务恢复异常: {e}")
+            await asyncio.sleep(self.recovery_interval_sec)
+
+    def recover(self) -> int:
+        """
+        重新入队租约已过期的待提交任务
+
+        Returns:
+            重新入队的任务数
+        """
+        from app.services.task_service import TaskService  # 避免循环导入
+
+        db = SessionLocal()
+        try:
+            task_ids = TaskService(db).recover_pending_submissions()
+        finally:
+            db.close()
+
+        for task_id in task_ids:
+            self.enqueue(task_id)
+        if task_ids:
+            print(f"🔁 重新提交中断的任务: {len(task_ids)} 个")
+        return len(task_ids)
+
+
+# 全局提交器实例（由应用启动/关闭事件管理）
+submission_worker = TaskSubmissionWorker()
@@ -0,0 +1,92 @@
+"""
+任务状态后台轮询器
+周期性扫描到期的进行中任务，批量同步供应商状态
+"""
+import asyncio
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import or_
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import Task
+from app.services.task_service import TaskService
+
+
+class TaskStatusPoller:
+    """任务状态轮询器"""
+
+    def __init__(
+        self,
+        interval_sec: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None
+    ):
+        self.interval_sec = interval_sec or settings.TASK_POLL_INTERVAL_SEC
+        self.batch_size = batch_size or settings.TASK_POLL_BATCH_SIZE
+        self.concurrency = concurrency or settings.TASK_POLL_CONCURRENCY
+        self._runner: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """启动轮询循环"""
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止轮询循环"""
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ 任务轮询异常: {e}")
+            await asyncio.sleep(self.interval_sec)
+
+    async def sweep(self) -> int:
+        """
+        扫描一轮所有进行中的任务
+
+        只处理已到 next_poll_at 的任务（走 idx_tasks_status_next_poll 索引），
+        按 task_id 分批读取，每批内并发查询供应商
+
+        Returns:
+            本轮同步的任务数
+        """
+        db = SessionLocal()
+        try:
+            service = TaskService(db)
+            synced = 0
+            last_task_id = 0
+            now = datetime.utcnow()
+
+            while True:
+                tasks = db.query(Task).filter(
+                    Task.status.in_(TaskService.ACTIVE_STATUSES),
+                    or_(Task.next_poll_at.is_(None), Task.next_poll_at <= now),
+                    Task.vendor_task_id.isnot(None),
+                    Task.task_id > last_task_id
+                ).order_by(Task.task_id).limit(self.batch_size).all()
+
+                if not tasks:
+                    break
+                last_task_id = tasks[-1].task_id
+
+                await service.sync_tasks(tasks, self.concurrency)
+                synced += len(tasks)
+
+            return synced
+        finally:
+            db.close()
+
+
+# 全局轮询器实例（由应用启动/关闭事件管理）
+task_poller = TaskStatusPoller()
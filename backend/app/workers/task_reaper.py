@@ -0,0 +1,124 @@
+"""
+超时任务回收器
+周期性找出超过生成超时时间仍未结束的任务，最后查询一次供应商后批量失败并退款，
+不再依赖有人读取任务状态才触发超时
+"""
+import time
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.db.database import SessionLocal
+from app.db.models import Task
+from app.services.task_service import TaskService
+
+reaper_lag = metrics.gauge(
+    "task_reaper_lag_seconds",
+    "How long past its timeout the oldest task reaped in the last sweep was"
+)
+reaper_reaped = metrics.counter(
+    "task_reaper_reaped_total",
+    "Timed-out tasks handled by the reaper",
+    ["outcome"]
+)
+reaper_sweep_duration = metrics.histogram(
+    "task_reaper_sweep_duration_seconds",
+    "Duration of one reaper sweep"
+)
+
+
+class TaskTimeoutReaper:
+    """超时任务回收器"""
+
+    def __init__(
+        self,
+        interval_sec: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None
+    ):
+        self.interval_sec = interval_sec or settings.TASK_REAPER_INTERVAL_SEC
+        self.batch_size = batch_size or settings.TASK_REAPER_BATCH_SIZE
+        self.concurrency = concurrency or settings.TASK_POLL_CONCURRENCY
+        self._runner: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """启动回收循环"""
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止回收循环"""
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ 超时任务回收异常: {e}")
+            await asyncio.sleep(self.interval_sec)
+
+    async def sweep(self) -> int:
+        """
+        回收一轮超时任务
+
+        按 started_at 从早到晚分批读取（走 idx_tasks_status_started 索引），
+        每批最后查询一次供应商，未完成的在同一事务中失败并退款
+
+        Returns:
+            本轮处理的任务数
+        """
+        started = time.monotonic()
+        db = SessionLocal()
+        try:
+            service = TaskService(db)
+            handled = 0
+            now = datetime.utcnow()
+            deadline = now - timedelta(seconds=settings.TASK_TIMEOUT_SEC)
+            lag = 0.0
+            last_started_at, last_task_id = None, 0
+
+            while True:
+                query = db.query(Task).filter(
+                    Task.status.in_(["QUEUED", "IN_PROGRESS"]),
+                    Task.started_at < deadline
+                )
+                if last_started_at is not None:
+                    # 按 (started_at, task_id) 翻页，跳过本轮已处理但未结束的任务
+                    query = query.filter(
+                        (Task.started_at > last_started_at) |
+                        ((Task.started_at == last_started_at) & (Task.task_id > last_task_id))
+                    )
+                tasks = query.order_by(Task.started_at, Task.task_id).limit(self.batch_size).all()
+
+                if not tasks:
+                    break
+                if not handled:
+                    lag = (deadline - tasks[0].started_at).total_seconds()
+                last_started_at, last_task_id = tasks[-1].started_at, tasks[-1].task_id
+
+                videos, failed = await service.reap_timed_out(tasks, self.concurrency)
+                handled += len(tasks)
+                reaper_reaped.inc(len(videos), outcome="success")
+                reaper_reaped.inc(len(failed), outcome="failure")
+
+            reaper_lag.set(lag)
+            if handled:
+                print(f"⏱️ 回收超时任务: {handled} 个（最久超时 {lag:.0f} 秒）")
+            return handled
+        finally:
+            db.close()
+            reaper_sweep_duration.observe(time.monotonic() - started)
+
+
+# 全局回收器实例（由应用启动/关闭事件管理）
+task_reaper = TaskTimeoutReaper()
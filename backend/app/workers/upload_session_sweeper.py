@@ -0,0 +1,69 @@
+"""
+过期上传会话清理器
+周期性删除过期未完成的分块上传会话及其分块文件；删除文件和数据库操作在线程中执行，不占用事件循环
+"""
+import asyncio
+from typing import Optional
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.services.upload_service import UploadService, SESSION_PURGE_BATCH
+
+
+class UploadSessionSweeper:
+    """过期上传会话清理器"""
+
+    def __init__(self, interval_sec: Optional[float] = None):
+        self.interval_sec = interval_sec or settings.MEDIA_UPLOAD_PURGE_INTERVAL_SEC
+        self._runner: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """启动清理循环"""
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止清理循环"""
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ 上传会话清理异常: {e}")
+            await asyncio.sleep(self.interval_sec)
+
+    def sweep(self) -> int:
+        """
+        分批清理过期未完成的上传会话
+
+        Returns:
+            本轮清理的会话数
+        """
+        db = SessionLocal()
+        try:
+            service = UploadService(db)
+            purged = 0
+            while True:
+                count = service.purge_expired()
+                purged += count
+                if count < SESSION_PURGE_BATCH:
+                    break
+        finally:
+            db.close()
+
+        if purged:
+            print(f"🧹 清理过期上传会话: {purged} 个")
+        return purged
+
+
+# 全局清理器实例（由应用启动/关闭事件管理）
+upload_session_sweeper = UploadSessionSweeper()
@@ -0,0 +1,82 @@
+"""
+本地视频缓存淘汰器
+定期把播放/下载访问记录落库，缓存超过容量上限时按 LRU/LFU 淘汰最冷的视频（回退到供应商地址）
+"""
+import asyncio
+from typing import Optional
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.services.video_cache_service import VideoCacheService
+
+
+class VideoCacheEvictor:
+    """本地视频缓存淘汰器"""
+
+    def __init__(self, interval_sec: Optional[float] = None):
+        self.interval_sec = interval_sec or settings.VIDEO_CACHE_EVICT_INTERVAL_SEC
+        self._runner: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def start(self) -> None:
+        """启动淘汰循环"""
+        if self._runner is None or self._runner.done():
+            self._wakeup = asyncio.Event()
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止淘汰循环（退出前落库剩余的访问记录）"""
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+
+        db = SessionLocal()
+        try:
+            VideoCacheService(db).flush_access_log()
+        except Exception as e:
+            print(f"⚠️ 视频访问记录落库失败: {e}")
+        finally:
+            db.close()
+
+    def wake(self) -> None:
+        """缓存新增文件后调用，尽快检查容量"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"⚠️ 视频缓存淘汰异常: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval_sec)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def sweep(self) -> int:
+        """
+        落库访问记录并按容量淘汰
+
+        Returns:
+            本轮淘汰的视频数
+        """
+        db = SessionLocal()
+        try:
+            service = VideoCacheService(db)
+            service.flush_access_log()
+            evicted, freed = service.evict()
+        finally:
+            db.close()
+
+        if evicted:
+            print(f"🧹 淘汰本地缓存视频: {evicted} 个，释放 {freed / 1024 / 1024:.1f} MB")
+        return evicted
+
+
+# 全局淘汰器实例（由应用启动/关闭事件管理）
+video_cache_evictor = VideoCacheEvictor()
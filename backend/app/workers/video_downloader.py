@@ -0,0 +1,424 @@
+"""
+视频本地缓存下载器
+从持久化的下载任务表中领取任务，有界并发下载，支持断点续传；
+先写入 .part 临时文件，校验大小和校验和后原子重命名，播放接口不会读到半个文件
+
+播放未缓存的视频时，播放请求挂到该视频正在进行的下载上（没有则立即发起一个），
+边写缓存边跟读 .part 文件推给客户端：同一视频同时只有一条回源连接，下载完成后的播放直接走本地文件
+"""
+import os
+import re
+import time
+import base64
+import asyncio
+import hashlib
+from typing import AsyncIterator, Dict, Optional, Tuple
+import httpx
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.db.database import SessionLocal
+from app.db.models import VideoDownloadJob
+from app.services.video_cache_service import VideoCacheService, VIDEO_CACHE_DIR, local_video_path
+from app.workers.video_cache_evictor import video_cache_evictor
+
+CHUNK_SIZE = 256 * 1024
+
+downloads_total = metrics.counter(
+    "video_downloads_total",
+    "Video cache download attempts by outcome",
+    ["outcome"]
+)
+download_bytes = metrics.counter(
+    "video_download_bytes_total",
+    "Bytes written to the local video cache by the downloader"
+)
+download_resumed = metrics.counter(
+    "video_download_resumed_total",
+    "Downloads resumed from a partial file with an HTTP Range request"
+)
+download_inflight = metrics.gauge(
+    "video_downloads_inflight",
+    "Video downloads in progress in this process"
+)
+stream_fills = metrics.counter(
+    "video_stream_fills_total",
+    "Uncached video plays by how they were served (started=began a cache fill, joined=attached to an in-flight fill, proxied=plain proxy without caching)",
+    ["result"]
+)
+download_duration = metrics.histogram(
+    "video_download_duration_seconds",
+    "Duration of one video download attempt",
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+)
+
+
+class CorruptDownload(Exception):
+    """下载内容与源文件不一致（大小/校验和/续传位置），需要从头重新下载"""
+    pass
+
+
+def _parse_content_range(value: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """解析 Content-Range: bytes start-end/total，返回 (start, total)"""
+    match = re.match(r"bytes (\d+)-\d+/(\d+|\*)", value or "")
+    if not match:
+        return None, None
+    total = match.group(2)
+    return int(match.group(1)), (int(total) if total != "*" else None)
+
+
+def _expected_md5(etag: Optional[str], content_md5: Optional[str]) -> Optional[str]:
+    """源站提供的MD5：Content-MD5 头，或形如MD5的强 ETag（对象存储常见）"""
+    if content_md5:
+        try:
+            return base64.b64decode(content_md5).hex()
+        except ValueError:
+            pass
+    if etag and not etag.startswith("W/"):
+        value = etag.strip('"').lower()
+        if re.fullmatch(r"[0-9a-f]{32}", value):
+            return value
+    return None
+
+
+def _file_digests(path: str) -> Tuple[str, str]:
+    """计算文件的 (md5, sha256)"""
+    md5, sha256 = hashlib.md5(), hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            md5.update(chunk)
+            sha256.update(chunk)
+    return md5.hexdigest(), sha256.hexdigest()
+
+
+class CacheFill:
+    """
+    一次进行中的缓存下载（写入 .part 文件），播放请求可以跟读
+
+    只在事件循环线程内使用：写入方每写一块就通知，读取方读到已写入的末尾时等待下一次通知
+    """
+
+    def __init__(self, video_id: int):
+        self.video_id = video_id
+        self.final_path = local_video_path(video_id)
+        self.part_path = self.final_path + ".part"
+        self.written = 0                        # .part 文件中已写入的字节数
+        self.total: Optional[int] = None        # 源文件大小（未知为 None）
+        self.content_type = "video/mp4"
+        self.ready = False                      # 已收到源站响应并打开 .part 文件
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._changed = asyncio.Event()
+
+    def notify(self) -> None:
+        """唤醒所有等待进度的读取方"""
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def wait_ready(self, timeout: float) -> bool:
+        """
+        等待源站响应
+
+        Returns:
+            是否可以跟读（超时或下载在开始前失败返回 False）
+        """
+        deadline = time.monotonic() + timeout
+        while not self.ready and not self.done:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(self._changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+        return self.ready
+
+    def _open(self):
+        try:
+            return open(self.part_path, "rb")
+        except FileNotFoundError:
+            # 下载已完成并重命名为正式文件
+            return open(self.final_path, "rb")
+
+    async def iter_bytes(self, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        """
+        读取 [start, end] 区间（end 为 None 时读到末尾），跟随写入进度直到下载结束
+
+        Raises:
+            IOError: 下载中断（客户端重试时会挂到新的下载上，从断点续传）
+        """
+        position = start
+        with self._open() as f:
+            while end is None or position <= end:
+                available = self.written if end is None else min(self.written, end + 1)
+                if position < available:
+                    f.seek(position)
+                    data = f.read(min(CHUNK_SIZE, available - position))
+                    if not data:
+                        raise IOError("缓存文件读取失败")
+                    position += len(data)
+                    yield data
+                    continue
+                if self.done:
+                    if self.error is not None and (self.total is None or position < self.total):
+                        raise IOError(f"回源下载中断: {self.error}")
+                    return
+                await self._changed.wait()
+
+
+class VideoDownloadManager:
+    """视频缓存下载器（进程内 asyncio 任务池）"""
+
+    def __init__(self, concurrency: Optional[int] = None, poll_interval_sec: Optional[float] = None):
+        self.concurrency = concurrency or settings.VIDEO_DOWNLOAD_CONCURRENCY
+        self.poll_interval_sec = poll_interval_sec or settings.VIDEO_DOWNLOAD_POLL_INTERVAL_SEC
+        self._client: Optional[httpx.AsyncClient] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        # 本进程正在下载的 job_id -> asyncio 任务
+        self._jobs: dict = {}
+        # 本进程正在下载的 video_id -> CacheFill（播放请求据此合并回源）
+        self._fills: Dict[int, CacheFill] = {}
+
+    def start(self) -> None:
+        """启动调度循环（启动时立即接手待下载和中断的任务）"""
+        if self._runner is None or self._runner.done():
+            self._wakeup = asyncio.Event()
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(settings.VIDEO_DOWNLOAD_TIMEOUT_SEC, connect=10.0),
+                follow_redirects=True
+            )
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止下载，未完成的任务交还队列（保留 .part 文件，下次续传）"""
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+
+        job_ids = list(self._jobs)
+        for job in list(self._jobs.values()):
+            job.cancel()
+        if job_ids:
+            await asyncio.gather(*self._jobs.values(), return_exceptions=True)
+            db = SessionLocal()
+            try:
+                VideoCacheService(db).release_jobs(job_ids)
+            finally:
+                db.close()
+
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def wake(self) -> None:
+        """有新的下载任务提交后调用，立即调度（否则等下一次扫描）"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            wait = self.poll_interval_sec
+            try:
+                wait = self._dispatch()
+            except Exception as e:
+                print(f"⚠️ 视频下载调度异常: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def attach(self, video_id: int, timeout: float = 15.0) -> Optional[CacheFill]:
+        """
+        播放未缓存视频：挂到该视频进行中的下载上，没有则立即抢占下载任务发起回源
+
+        Args:
+            video_id: 视频ID
+            timeout: 等待源站响应的最长秒数
+
+        Returns:
+            可跟读的 CacheFill；下载器未运行、其他进程正在下载、任务已放弃或回源失败时返回 None（调用方直接代理）
+        """
+        fill = self._fills.get(video_id)
+        if fill is not None:
+            stream_fills.inc(result="joined")
+        else:
+            if self._client is None:
+                return None
+            db = SessionLocal()
+            try:
+                job_id = VideoCacheService(db).claim_for_playback(video_id)
+            finally:
+                db.close()
+            if job_id is None:
+                return None
+            fill = self._start(job_id, video_id)
+            stream_fills.inc(result="started")
+
+        if not await fill.wait_ready(timeout) or fill.error is not None:
+            return None
+        return fill
+
+    def _start(self, job_id: int, video_id: int) -> CacheFill:
+        fill = CacheFill(video_id)
+        self._fills[video_id] = fill
+        job = asyncio.create_task(self._process(job_id, fill))
+        self._jobs[job_id] = job
+        job.add_done_callback(lambda _, job_id=job_id: self._finish(job_id, video_id))
+        download_inflight.set(len(self._jobs))
+        return fill
+
+    def _dispatch(self) -> float:
+        """
+        按空闲名额领取任务
+
+        Returns:
+            下一次调度前最多等待的秒数（有退避中的任务时提前醒来）
+        """
+        db = SessionLocal()
+        try:
+            service = VideoCacheService(db)
+            claimed = service.claim_due_jobs(self.concurrency - len(self._jobs))
+            next_due = service.seconds_until_next_job()
+        finally:
+            db.close()
+
+        for job_id, video_id in claimed:
+            self._start(job_id, video_id)
+
+        if next_due is None:
+            return self.poll_interval_sec
+        return min(max(next_due, 0.05), self.poll_interval_sec)
+
+    def _finish(self, job_id: int, video_id: int) -> None:
+        self._jobs.pop(job_id, None)
+        fill = self._fills.pop(video_id, None)
+        if fill is not None and not fill.done:
+            # 被取消（进程退出）
+            fill.error = fill.error or IOError("下载已取消")
+            fill.done = True
+            fill.notify()
+        download_inflight.set(len(self._jobs))
+        self.wake()
+
+    async def _process(self, job_id: int, fill: CacheFill) -> None:
+        db = SessionLocal()
+        started = time.monotonic()
+        try:
+            service = VideoCacheService(db)
+            job = db.query(VideoDownloadJob).filter(VideoDownloadJob.job_id == job_id).first()
+            if not job:
+                return
+
+            part_path = local_video_path(job.video_id) + ".part"
+            try:
+                size, sha256 = await self._download(service, job, fill)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                fill.error = e
+                fill.done = True
+                fill.notify()
+                if isinstance(e, CorruptDownload) and os.path.exists(part_path):
+                    os.remove(part_path)
+                downloaded = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+                retry = service.fail_job(job, str(e), downloaded)
+                downloads_total.inc(outcome="retry" if retry else "failed")
+                print(f"⚠️ 视频缓存失败: video={job.video_id} 第{job.attempts}次 {e}{'，稍后重试' if retry else '，放弃缓存'}")
+                return
+
+            fill.done = True
+            fill.notify()
+            service.complete_job(job, size, sha256)
+            downloads_total.inc(outcome="success")
+            video_cache_evictor.wake()
+            print(f"✅ 视频缓存完成: video={job.video_id} {size} bytes")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️ 视频缓存异常: job={job_id} {e}")
+        finally:
+            download_duration.observe(time.monotonic() - started)
+            db.close()
+
+    async def _download(self, service: VideoCacheService, job: VideoDownloadJob, fill: CacheFill) -> Tuple[int, str]:
+        """
+        下载到 .part 文件并校验，成功后原子重命名为正式文件
+
+        已有 .part 文件时用 Range 续传，并通过 If-Range 确认源文件未变（变了会返回完整文件）；
+        写入进度同步到 fill，供跟读的播放请求使用
+
+        Returns:
+            (文件大小, SHA-256)
+
+        Raises:
+            CorruptDownload: 内容校验失败，需要从头下载
+            httpx.HTTPError: 网络错误，下次从断点续传
+        """
+        os.makedirs(VIDEO_CACHE_DIR, exist_ok=True)
+        final_path = fill.final_path
+        part_path = fill.part_path
+
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            if job.etag:
+                headers["If-Range"] = job.etag
+
+        async with self._client.stream("GET", job.source_url, headers=headers) as response:
+            if response.status_code == 416 and offset:
+                raise CorruptDownload("续传位置超出源文件大小")
+            response.raise_for_status()
+
+            if response.status_code == 206:
+                start, total = _parse_content_range(response.headers.get("content-range"))
+                if start != offset:
+                    raise CorruptDownload(f"续传位置不一致: 期望 {offset}，实际 {start}")
+                mode = "ab"
+                download_resumed.inc()
+            else:
+                offset = 0
+                mode = "wb"
+                length = response.headers.get("content-length")
+                total = int(length) if length and length.isdigit() else None
+
+            etag = response.headers.get("etag")
+            # 206 的 Content-MD5 只覆盖本次返回的区间，不能和整个文件比较；ETag 仍对应完整文件
+            content_md5 = response.headers.get("content-md5") if response.status_code == 200 else None
+            service.record_progress(job, offset, total, etag)
+
+            with open(part_path, mode) as f:
+                fill.written = offset
+                fill.total = total
+                fill.content_type = response.headers.get("content-type") or fill.content_type
+                fill.ready = True
+                fill.notify()
+
+                async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                    f.write(chunk)
+                    # 刷到文件，跟读的请求才能读到
+                    f.flush()
+                    fill.written += len(chunk)
+                    fill.notify()
+                    download_bytes.inc(len(chunk))
+
+        size = os.path.getsize(part_path)
+        if total is not None and size != total:
+            raise CorruptDownload(f"文件大小不符: 期望 {total}，实际 {size}")
+
+        md5, sha256 = await asyncio.to_thread(_file_digests, part_path)
+        expected = _expected_md5(etag, content_md5)
+        if expected and md5 != expected:
+            raise CorruptDownload("文件校验和不符")
+
+        os.replace(part_path, final_path)
+        return size, sha256
+
+
+# 全局下载器实例（由应用启动/关闭事件管理）
+video_downloader = VideoDownloadManager()
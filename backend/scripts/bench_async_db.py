@@ -0,0 +1,199 @@
+"""
+异步数据库会话基准
+单个 uvicorn worker 分别用同步 Session（get_db，迁移前的做法）和异步会话（get_async_db + run_sync）
+执行同一个 WorkService.list_feed("hot") 查询，对比：
+- 并发请求的吞吐量和延迟
+- 同时发出的轻量请求（/ping，不访问数据库）的延迟：同步会话查询期间事件循环被占用，
+  同一 worker 上的其他请求、视频流和 SSE 连接都要等查询结束
+
+默认使用临时 SQLite 数据库（aiosqlite）；传 --database-url 可以对 PostgreSQL（asyncpg）测试，
+会向该库写入测试数据
+
+用法：
+    python scripts/bench_async_db.py --works 50000 --duration 10 --concurrency 16
+"""
+import sys
+import os
+import time
+import socket
+import random
+import asyncio
+import argparse
+import tempfile
+import multiprocessing
+from datetime import datetime, timedelta
+
+# 添加父目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+import uvicorn
+
+# app.db.database 在导入时按 DATABASE_URL 创建引擎，以下模块都在设置环境变量之后再导入
+
+
+def create_app():
+    """基准服务：/sync/feed、/async/feed 执行同一查询，/ping 不访问数据库"""
+    from fastapi import Depends, FastAPI
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy.orm import Session
+    from app.db.database import get_db, get_async_db, async_engine
+    from app.schemas.works import WorkResponse
+    from app.services.work_service import WorkService
+
+    app = FastAPI()
+
+    @app.get("/sync/feed")
+    async def sync_feed(db: Session = Depends(get_db)):
+        works = WorkService(db).list_feed(feed_type="hot", limit=20)
+        return [WorkResponse.model_validate(work) for work in works]
+
+    @app.get("/async/feed")
+    async def async_feed(db: AsyncSession = Depends(get_async_db)):
+        return await db.run_sync(lambda session: [
+            WorkResponse.model_validate(work)
+            for work in WorkService(session).list_feed(feed_type="hot", limit=20)
+        ])
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        # aiosqlite 每个连接一个非守护线程，不关闭连接池进程无法退出
+        await async_engine.dispose()
+
+    return app
+
+
+def serve(port: int) -> None:
+    uvicorn.run(create_app(), host="127.0.0.1", port=port, log_level="warning")
+
+
+def seed(count: int) -> None:
+    """写入 count 个已发布作品（点赞数随机，hot 排序需要扫描全部作品）"""
+    from sqlalchemy import insert
+    from app.db.database import SessionLocal, init_db
+    from app.db.models import Work
+
+    init_db()
+    db = SessionLocal()
+    try:
+        start = (db.query(Work.work_id).order_by(Work.work_id.desc()).limit(1).scalar() or 0) + 1
+        now = datetime.utcnow()
+        rows = [
+            {
+                "work_id": start + i,
+                "user_id": 1,
+                "video_id": start + i,
+                "title": f"bench {start + i}",
+                "prompt": "bench",
+                "status": "published",
+                "like_count": random.randint(0, 10000),
+                "published_at": now - timedelta(seconds=i),
+            }
+            for i in range(count)
+        ]
+        for offset in range(0, count, 5000):
+            db.execute(insert(Work), rows[offset:offset + 5000])
+        db.commit()
+    finally:
+        db.close()
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+async def bench_mode(base_url: str, mode: str, duration: float, concurrency: int) -> dict:
+    """concurrency 个客户端持续请求 feed，同时每 10ms 发一次 /ping"""
+    limits = httpx.Limits(max_connections=concurrency + 1)
+    async with httpx.AsyncClient(limits=limits, timeout=60.0) as client:
+        deadline = time.perf_counter() + duration
+        feed_latencies, ping_latencies = [], []
+        errors = 0
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = await client.get(f"{base_url}/{mode}/feed")
+                if response.status_code != 200:
+                    # 同步会话：连接在响应发出后才归还，事件循环被占用时连接池可能耗尽（500）
+                    errors += 1
+                    continue
+                feed_latencies.append(time.perf_counter() - start)
+
+        async def pinger():
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                (await client.get(f"{base_url}/ping")).raise_for_status()
+                ping_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.01)
+
+        start = time.perf_counter()
+        await asyncio.gather(pinger(), *(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "throughput": len(feed_latencies) / elapsed,
+        "errors": errors,
+        "feed_p50": percentile(feed_latencies, 0.5),
+        "feed_p99": percentile(feed_latencies, 0.99),
+        "ping_p50": percentile(ping_latencies, 0.5),
+        "ping_p99": percentile(ping_latencies, 0.99),
+    }
+
+
+async def run(args: argparse.Namespace) -> None:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    # spawn：服务进程重新创建引擎，不继承父进程写入测试数据时打开的连接
+    server = multiprocessing.get_context("spawn").Process(target=serve, args=(port,), daemon=True)
+    server.start()
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        async with httpx.AsyncClient() as client:
+            for _ in range(100):
+                try:
+                    await client.get(f"{base_url}/ping")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+
+        print(f"📊 {args.works} 个作品，hot feed，并发 {args.concurrency}，每种 {args.duration:.0f} 秒（单个 uvicorn worker）")
+        print(f"  {'会话':<8} {'吞吐':>10} {'feed p50':>10} {'feed p99':>10} {'ping p50':>10} {'ping p99':>10} {'失败':>6}")
+        for mode in ("sync", "async"):
+            await bench_mode(base_url, mode, 1.0, 2)  # 预热
+            result = await bench_mode(base_url, mode, args.duration, args.concurrency)
+            print(f"  {mode:<8} {result['throughput']:6.1f} req/s "
+                  f"{result['feed_p50'] * 1000:8.1f}ms {result['feed_p99'] * 1000:8.1f}ms "
+                  f"{result['ping_p50'] * 1000:8.1f}ms {result['ping_p99'] * 1000:8.1f}ms {result['errors']:6d}")
+    finally:
+        server.terminate()
+        server.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="异步数据库会话基准")
+    parser.add_argument("--works", type=int, default=50000)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--database-url", default=None, help="默认使用临时 SQLite 数据库")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(root, 'bench.db')}"
+        os.environ["DEBUG"] = "false"
+        seed(args.works)
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+媒体文件发送方式基准
+单个 uvicorn worker 分别以 app / sendfile / accel 方式发送同一个本地视频，
+对比吞吐量和 worker 进程每发送 1 GB 消耗的 CPU 时间
+
+accel 模式下应用只返回 X-Accel-Redirect，字节由 nginx 发送；不经过 nginx 时这里测的是 worker 侧的开销
+（每秒可完成的鉴权 + 跳转次数）。sendfile 模式需要 ASGI 服务器提供零拷贝扩展，uvicorn 不提供时退化为 app
+
+用法：
+    python scripts/bench_media_delivery.py --size-mb 32 --requests 40 --concurrency 4
+"""
+import sys
+import os
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import multiprocessing
+
+# 添加父目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from app.core.media import media_file_response, ZERO_COPY_EXTENSION
+
+
+def create_app(root: str) -> Starlette:
+    """基准服务：/media/{mode} 发送 root/bench.mp4，/cpu 返回进程 CPU 时间"""
+    path = os.path.join(root, "bench.mp4")
+
+    async def media(request: Request):
+        return media_file_response(path, root, media_type="video/mp4", mode=request.path_params["mode"])
+
+    async def cpu(request: Request):
+        return JSONResponse({
+            "cpu": time.process_time(),
+            "zero_copy": ZERO_COPY_EXTENSION in request.scope.get("extensions", {})
+        })
+
+    return Starlette(routes=[Route("/media/{mode}", media), Route("/cpu", cpu)])
+
+
+def serve(root: str, port: int) -> None:
+    uvicorn.run(create_app(root), host="127.0.0.1", port=port, log_level="warning")
+
+
+async def bench_mode(base_url: str, mode: str, requests: int, concurrency: int) -> dict:
+    """并发请求同一文件，返回吞吐和服务端 CPU 开销"""
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=120.0) as client:
+        before = (await client.get(f"{base_url}/cpu")).json()
+        queue = asyncio.Queue()
+        for _ in range(requests):
+            queue.put_nowait(None)
+        received = 0
+
+        async def worker():
+            nonlocal received
+            while not queue.empty():
+                queue.get_nowait()
+                async with client.stream("GET", f"{base_url}/media/{mode}") as response:
+                    response.raise_for_status()
+                    async for chunk in response.aiter_raw():
+                        received += len(chunk)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        after = (await client.get(f"{base_url}/cpu")).json()
+
+    return {
+        "elapsed": elapsed,
+        "bytes": received,
+        "cpu": after["cpu"] - before["cpu"],
+        "zero_copy": after["zero_copy"]
+    }
+
+
+def report(mode: str, result: dict, requests: int, file_bytes: int) -> None:
+    elapsed, cpu = result["elapsed"], result["cpu"]
+    if result["bytes"]:
+        gb = result["bytes"] / 1024 ** 3
+        print(f"  {mode:<9} {result['bytes'] / 1024 ** 2 / elapsed:9.1f} MB/s  "
+              f"worker CPU {cpu:6.3f}s ({cpu / gb:6.3f}s/GB)  {requests / elapsed:8.1f} req/s")
+    else:
+        # accel：正文为空，字节由 nginx 发送
+        gb = requests * file_bytes / 1024 ** 3
+        print(f"  {mode:<9} {'(nginx)':>9}       worker CPU {cpu:6.3f}s ({cpu / gb:6.3f}s/GB)  {requests / elapsed:8.1f} req/s")
+
+
+async def run(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as root:
+        file_bytes = args.size_mb * 1024 * 1024
+        with open(os.path.join(root, "bench.mp4"), "wb") as f:
+            f.write(os.urandom(file_bytes))
+
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        server = multiprocessing.Process(target=serve, args=(root, port), daemon=True)
+        server.start()
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            async with httpx.AsyncClient() as client:
+                for _ in range(100):
+                    try:
+                        await client.get(f"{base_url}/cpu")
+                        break
+                    except httpx.TransportError:
+                        await asyncio.sleep(0.1)
+
+            print(f"📊 {args.requests} 次请求 × {args.size_mb} MB，并发 {args.concurrency}（单个 uvicorn worker）")
+            for mode in ("app", "sendfile", "accel"):
+                await bench_mode(base_url, mode, 2, 1)  # 预热
+                result = await bench_mode(base_url, mode, args.requests, args.concurrency)
+                report(mode, result, args.requests, file_bytes)
+                if mode == "sendfile" and not result["zero_copy"]:
+                    print("            ↳ 服务器未提供零拷贝扩展，sendfile 退化为 app")
+        finally:
+            server.terminate()
+            server.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="媒体文件发送方式基准")
+    parser.add_argument("--size-mb", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=4)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
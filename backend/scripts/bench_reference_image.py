@@ -0,0 +1,89 @@
+"""
+参考图预处理基准
+对比图生视频提交时参考图的两种处理方式：
+- 原图：整个文件 Base64 编码为 Data URI（预处理之前的做法）
+- 预处理：按目标比例缩小到供应商的最大有效分辨率，重新编码为 JPEG 后再 Base64 编码
+
+输出每种输入图片、每个比例的 Data URI 大小和编码耗时（预处理耗时不含缓存命中，命中后只剩 Base64）
+
+用法：
+    python scripts/bench_reference_image.py --repeat 5
+"""
+import sys
+import os
+import time
+import base64
+import argparse
+import tempfile
+
+# 添加父目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from PIL import Image
+from app.core.config import settings
+from app.core.images import encode_reference_image
+from app.vendors.dyuapi_sora2 import DyuSora2Adapter
+
+# (名称, 尺寸, 格式, 保存参数)
+SAMPLES = [
+    ("手机照片 4032x3024 JPEG", (4032, 3024), "JPEG", {"quality": 95}),
+    ("截图 2048x2048 PNG", (2048, 2048), "PNG", {}),
+    ("小图 640x360 JPEG", (640, 360), "JPEG", {"quality": 80}),
+]
+
+
+def make_sample(path: str, size, fmt: str, options: dict) -> None:
+    """生成带渐变和噪声的测试图（比纯噪声更接近照片的压缩率）"""
+    width, height = size
+    gradient = Image.linear_gradient("L").resize(size)
+    noise = Image.effect_noise(size, 40)
+    image = Image.merge("RGB", (gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    image.save(path, fmt, **options)
+
+
+def timed(fn, repeat: int):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="参考图预处理基准")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        for name, size, fmt, options in SAMPLES:
+            source = os.path.join(root, f"source.{fmt.lower()}")
+            make_sample(source, size, fmt, options)
+
+            def original():
+                with open(source, "rb") as f:
+                    return base64.b64encode(f.read())
+
+            payload, seconds = timed(original, args.repeat)
+            print(f"📷 {name}（{os.path.getsize(source) / 1024:.0f} KB）")
+            print(f"  {'原图':<12} {len(payload) / 1024:9.0f} KB  {seconds * 1000:8.1f} ms")
+
+            for ratio in ("16:9", "9:16", "1:1"):
+                max_width, max_height = DyuSora2Adapter.get_reference_image_size(ratio, None)
+                target = os.path.join(root, f"ref-{max_width}x{max_height}.jpg")
+
+                def preprocess():
+                    result = encode_reference_image(
+                        source, target, max_width, max_height, settings.REFERENCE_IMAGE_QUALITY
+                    )
+                    with open(target, "rb") as f:
+                        return result, base64.b64encode(f.read())
+
+                (result, payload), seconds = timed(preprocess, args.repeat)
+                print(f"  {ratio:<6} {result['width']:>4}x{result['height']:<5} {len(payload) / 1024:7.0f} KB  "
+                      f"{seconds * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+供应商客户端微基准
+对比「每次调用新建 httpx.AsyncClient」与「共享连接池客户端」的单次调用延迟
+
+用法：
+    python scripts/bench_vendor_client.py --calls 500
+"""
+import sys
+import os
+import time
+import socket
+import asyncio
+import argparse
+import statistics
+import threading
+
+# 添加父目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import httpx
+import uvicorn
+from dyuapi_standin import create_app
+from app.vendors.dyuapi_sora2 import DyuSora2Adapter
+
+
+def start_standin() -> tuple:
+    """在后台线程启动替身服务，返回 (server, base_url)"""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+
+    config = uvicorn.Config(create_app(), host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+
+async def bench_fresh_client(base_url: str, task_id: str, calls: int) -> list:
+    """旧实现：每次调用新建客户端（每次都要重新握手）"""
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f"{base_url}/v1/video/generations/{task_id}", timeout=30.0)
+            response.raise_for_status()
+            response.json()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def bench_pooled_client(adapter: DyuSora2Adapter, task_id: str, calls: int) -> list:
+    """新实现：共享连接池客户端（keep-alive 复用连接）"""
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        await adapter.get_task_status(task_id)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def report(name: str, latencies: list) -> None:
+    ms = sorted(x * 1000 for x in latencies)
+    p95 = ms[int(len(ms) * 0.95) - 1]
+    print(f"  {name:<14} mean={statistics.mean(ms):7.3f}ms  p50={statistics.median(ms):7.3f}ms  p95={p95:7.3f}ms")
+
+
+async def run(calls: int) -> None:
+    server, base_url = start_standin()
+    adapter = DyuSora2Adapter(api_key="bench", base_url=base_url)
+    await DyuSora2Adapter.startup()
+    try:
+        created = await adapter.create_text2video(prompt="bench", duration_sec=10)
+        task_id = created["id"]
+
+        # 预热
+        await bench_fresh_client(base_url, task_id, 10)
+        await bench_pooled_client(adapter, task_id, 10)
+
+        print(f"📊 {calls} 次 get_task_status 调用（本地替身服务 {base_url}）")
+        report("fresh client", await bench_fresh_client(base_url, task_id, calls))
+        report("pooled client", await bench_pooled_client(adapter, task_id, calls))
+    finally:
+        await DyuSora2Adapter.shutdown()
+        server.should_exit = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="供应商客户端微基准")
+    parser.add_argument("--calls", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(run(args.calls))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,443 @@
+"""
+DyuAPI 本地替身服务
+实现 DyuSora2Adapter 用到的全部供应商接口，支持延迟/错误/限流注入和状态推进时序配置，
+用于压测、基准测试和离线联调，不消耗供应商额度
+
+已实现接口：
+    POST /v1/video/generations                 创建任务
+    GET  /v1/video/generations                 列出任务
+    GET  /v1/video/generations/{id}            查询任务
+    POST /v1/video/generations/{id}/cancel     取消任务
+    GET  /v1/videos                            列出视频
+    GET  /v1/videos/{id}                       视频详情
+    GET  /v1/videos/{id}/download              获取下载链接
+    GET  /v1/videos/{id}/content               视频内容（MP4，支持 Range）
+
+用法：
+    python scripts/dyuapi_standin.py --port 9000
+    # 然后设置 DYUAPI_BASE_URL=http://127.0.0.1:9000
+
+故障注入示例（平均150ms指数分布延迟、2%的5xx、5%的429、10%的任务生成失败）：
+    python scripts/dyuapi_standin.py --latency-ms 150 --latency-dist exp \\
+        --error-rate 0.02 --rate-limit-rate 0.05 --task-failure-rate 0.1
+
+回调测试：
+    python scripts/dyuapi_standin.py --port 9000 --webhook-secret dev-secret
+    # 后端设置 DYUAPI_CALLBACK_URL=http://127.0.0.1:8000/api/v1/webhooks/dyuapi
+    #         DYUAPI_WEBHOOK_SECRET=dev-secret
+"""
+import sys
+import os
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import hashlib
+from typing import Optional
+
+# 添加父目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response
+from app.vendors.dyuapi_sora2 import DyuSora2Adapter
+
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+
+def build_mp4_payload(size_bytes: int) -> bytes:
+    """
+    生成指定大小的 MP4 容器数据（ftyp + mdat）
+
+    仅用于传输压测，内容不可播放；需要可播放文件时用 --video-file
+    """
+    ftyp = b"ftyp" + b"isom" + (0x200).to_bytes(4, "big") + b"isomiso2avc1mp41"
+    ftyp = (len(ftyp) + 4).to_bytes(4, "big") + ftyp
+
+    body_size = max(size_bytes - len(ftyp) - 8, 0)
+    pattern = bytes(range(256))
+    body = (pattern * (body_size // 256 + 1))[:body_size]
+    mdat = (body_size + 8).to_bytes(4, "big") + b"mdat" + body
+    return ftyp + mdat
+
+
+def parse_range(range_header: Optional[str], total: int) -> Optional[tuple]:
+    """
+    解析单段 Range 请求头
+
+    Returns:
+        (start, end) 闭区间；无 Range 时返回 None
+
+    Raises:
+        ValueError: 无法满足的 Range
+    """
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+    spec = range_header[len("bytes="):].split(",")[0].strip()
+    start_str, _, end_str = spec.partition("-")
+    if start_str:
+        start = int(start_str)
+        end = int(end_str) if end_str else total - 1
+    else:
+        # 后缀形式 bytes=-N：最后 N 个字节
+        start = max(total - int(end_str), 0)
+        end = total - 1
+    end = min(end, total - 1)
+    if start > end or start >= total:
+        raise ValueError("unsatisfiable range")
+    return start, end
+
+
+def create_app(
+    complete_after_sec: float = 30.0,
+    webhook_secret: Optional[str] = None,
+    callback_interval_sec: float = 5.0,
+    duplicate_callbacks: bool = False,
+    queue_sec: float = 0.5,
+    duration_jitter: float = 0.0,
+    task_failure_rate: float = 0.0,
+    latency_ms: float = 0.0,
+    latency_dist: str = "fixed",
+    error_rate: float = 0.0,
+    rate_limit_rate: float = 0.0,
+    video_bytes: int = 256 * 1024,
+    video_file: Optional[str] = None,
+    seed: Optional[int] = None
+) -> FastAPI:
+    """
+    创建替身服务应用
+
+    Args:
+        complete_after_sec: 任务从创建到完成的平均耗时（秒）
+        webhook_secret: 回调签名密钥；创建请求带 callback_url 且设置了密钥时发送回调
+        callback_interval_sec: 进度回调间隔（秒）
+        duplicate_callbacks: 是否重复发送完成回调（用于验证幂等）
+        queue_sec: 任务处于 pending 的时间（秒）
+        duration_jitter: 任务耗时的随机浮动比例（0.2 表示 ±20%）
+        task_failure_rate: 任务最终生成失败的比例
+        latency_ms: 接口平均附加延迟（毫秒）
+        latency_dist: 延迟分布 fixed/uniform/exp
+        error_rate: 接口返回 500 的比例
+        rate_limit_rate: 接口返回 429 的比例
+        video_bytes: 生成的视频内容大小（字节）
+        video_file: 使用真实视频文件作为内容（优先于 video_bytes）
+        seed: 随机种子（便于复现）
+
+    Returns:
+        FastAPI应用
+    """
+    app = FastAPI(title="DyuAPI Stand-in")
+    rng = random.Random(seed)
+    tasks = {}
+    callbacks = set()
+
+    if video_file:
+        with open(video_file, "rb") as f:
+            video_content = f.read()
+    else:
+        video_content = build_mp4_payload(video_bytes)
+    video_etag = f'"{hashlib.md5(video_content).hexdigest()}"'
+
+    app.state.tasks = tasks
+    app.state.stats = {"requests": 0, "errors": 0, "rate_limited": 0}
+
+    # ==================== 延迟与故障注入 ====================
+
+    def sample_latency() -> float:
+        mean = latency_ms / 1000
+        if mean <= 0:
+            return 0.0
+        if latency_dist == "uniform":
+            return rng.uniform(0, 2 * mean)
+        if latency_dist == "exp":
+            return rng.expovariate(1 / mean)
+        return mean
+
+    @app.middleware("http")
+    async def inject_faults(request: Request, call_next):
+        if not request.url.path.startswith("/v1/"):
+            return await call_next(request)
+
+        app.state.stats["requests"] += 1
+        delay = sample_latency()
+        if delay:
+            await asyncio.sleep(delay)
+
+        # 视频内容只注入延迟，不注入错误
+        if not request.url.path.endswith("/content"):
+            roll = rng.random()
+            if roll < rate_limit_rate:
+                app.state.stats["rate_limited"] += 1
+                return JSONResponse(
+                    {"error": {"message": "rate limit exceeded", "type": "rate_limit"}},
+                    status_code=429,
+                    headers={"Retry-After": "1"}
+                )
+            if roll < rate_limit_rate + error_rate:
+                app.state.stats["errors"] += 1
+                return JSONResponse(
+                    {"error": {"message": "injected upstream error", "type": "server_error"}},
+                    status_code=500
+                )
+
+        return await call_next(request)
+
+    # ==================== 任务状态推进 ====================
+
+    def task_view(task: dict) -> dict:
+        elapsed = time.time() - task["created_at"]
+        fail_reason = None
+        if task.get("cancelled"):
+            status, progress = "cancelled", task["progress_at_cancel"]
+        elif elapsed >= task["total_sec"]:
+            if task["will_fail"]:
+                status, progress, fail_reason = "failed", 0, "injected generation failure"
+            else:
+                status, progress = "completed", 100
+        elif elapsed <= queue_sec:
+            status, progress = "pending", 0
+        else:
+            span = max(task["total_sec"] - queue_sec, 0.001)
+            status, progress = "processing", min(int((elapsed - queue_sec) / span * 100), 99)
+        view = {
+            "id": task["id"],
+            "task_id": task["id"],
+            "object": "video.generation",
+            "model": task["model"],
+            "status": status,
+            "progress": progress,
+            "created_at": int(task["created_at"]),
+        }
+        if fail_reason:
+            view["fail_reason"] = fail_reason
+        return view
+
+    def video_view(task: dict, base_url: str) -> dict:
+        return {
+            "id": task["id"],
+            "object": "video",
+            "duration": task["duration"],
+            "aspect_ratio": task["aspect_ratio"],
+            "size": "720x1280" if task["aspect_ratio"] == "9:16" else "1280x720",
+            "file_size": len(video_content),
+            "video_url": f"{base_url}/v1/videos/{task['id']}/content",
+        }
+
+    def get_completed(video_id: str) -> dict:
+        task = tasks.get(video_id)
+        if not task or task_view(task)["status"] != "completed":
+            raise HTTPException(status_code=404, detail="video not found")
+        return task
+
+    # ==================== 回调 ====================
+
+    async def send_callback(client: httpx.AsyncClient, url: str, body: dict) -> None:
+        raw = json.dumps(body).encode("utf-8")
+        timestamp = str(int(time.time()))
+        signature = DyuSora2Adapter.sign_webhook(webhook_secret, timestamp, raw)
+        try:
+            await client.post(url, content=raw, headers={
+                "Content-Type": "application/json",
+                "X-Dyu-Timestamp": timestamp,
+                "X-Dyu-Signature": f"sha256={signature}",
+            })
+        except httpx.HTTPError as e:
+            print(f"⚠️ 回调发送失败: {url} {e}")
+
+    async def fire_callbacks(task_id: str, url: str) -> None:
+        """按间隔推送进度回调，到达终态时推送最终状态"""
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            while True:
+                view = task_view(tasks[task_id])
+                if view["status"] in TERMINAL_STATUSES:
+                    break
+                await send_callback(client, url, view)
+                remaining = tasks[task_id]["created_at"] + tasks[task_id]["total_sec"] - time.time()
+                await asyncio.sleep(max(min(callback_interval_sec, remaining), 0.05))
+
+            final = task_view(tasks[task_id])
+            for _ in range(2 if duplicate_callbacks else 1):
+                await send_callback(client, url, final)
+
+    # ==================== 任务接口 ====================
+
+    @app.post("/v1/video/generations")
+    async def create_generation(request: Request):
+        payload = await request.json()
+        task_id = f"video_{uuid.uuid4()}"
+        jitter = rng.uniform(-duration_jitter, duration_jitter) if duration_jitter else 0.0
+        tasks[task_id] = {
+            "id": task_id,
+            "model": payload.get("model"),
+            "duration": payload.get("duration", 10),
+            "aspect_ratio": payload.get("aspect_ratio", "9:16"),
+            "created_at": time.time(),
+            "total_sec": max(complete_after_sec * (1 + jitter), queue_sec),
+            "will_fail": rng.random() < task_failure_rate,
+        }
+        if webhook_secret and payload.get("callback_url"):
+            job = asyncio.create_task(fire_callbacks(task_id, payload["callback_url"]))
+            callbacks.add(job)
+            job.add_done_callback(callbacks.discard)
+        return task_view(tasks[task_id])
+
+    @app.get("/v1/video/generations")
+    async def list_generations(status: Optional[str] = None, limit: int = 20, after: Optional[str] = None):
+        views = [task_view(task) for task in reversed(list(tasks.values()))]
+        if status:
+            views = [view for view in views if view["status"] == status]
+        if after:
+            ids = [view["id"] for view in views]
+            views = views[ids.index(after) + 1:] if after in ids else []
+        page = views[:limit]
+        return {
+            "object": "list",
+            "data": page,
+            "has_more": len(views) > limit,
+            "last_id": page[-1]["id"] if page else None,
+        }
+
+    @app.get("/v1/video/generations/{task_id}")
+    async def get_generation(task_id: str):
+        task = tasks.get(task_id)
+        if not task:
+            raise HTTPException(status_code=404, detail="task not found")
+        return task_view(task)
+
+    @app.post("/v1/video/generations/{task_id}/cancel")
+    async def cancel_generation(task_id: str):
+        task = tasks.get(task_id)
+        if not task:
+            raise HTTPException(status_code=404, detail="task not found")
+        view = task_view(task)
+        if view["status"] in TERMINAL_STATUSES:
+            raise HTTPException(status_code=409, detail=f"task already {view['status']}")
+        task["cancelled"] = True
+        task["progress_at_cancel"] = view["progress"]
+        return task_view(task)
+
+    # ==================== 视频接口 ====================
+
+    @app.get("/v1/videos")
+    async def list_videos(request: Request, limit: int = 20, after: Optional[str] = None):
+        base_url = str(request.base_url).rstrip("/")
+        completed = [
+            task for task in reversed(list(tasks.values()))
+            if task_view(task)["status"] == "completed"
+        ]
+        if after:
+            ids = [task["id"] for task in completed]
+            completed = completed[ids.index(after) + 1:] if after in ids else []
+        page = [video_view(task, base_url) for task in completed[:limit]]
+        return {
+            "object": "list",
+            "data": page,
+            "has_more": len(completed) > limit,
+            "last_id": page[-1]["id"] if page else None,
+        }
+
+    @app.get("/v1/videos/{video_id}")
+    async def get_video(video_id: str, request: Request):
+        task = get_completed(video_id)
+        return video_view(task, str(request.base_url).rstrip("/"))
+
+    @app.get("/v1/videos/{video_id}/download")
+    async def get_download_url(video_id: str, request: Request, watermark: str = "true"):
+        get_completed(video_id)
+        base_url = str(request.base_url).rstrip("/")
+        return {
+            "download_url": f"{base_url}/v1/videos/{video_id}/content?watermark={watermark}",
+            "expires_in": 3600,
+        }
+
+    @app.api_route("/v1/videos/{video_id}/content", methods=["GET", "HEAD"])
+    async def get_content(video_id: str, request: Request):
+        get_completed(video_id)
+        total = len(video_content)
+        headers = {
+            "Accept-Ranges": "bytes",
+            "ETag": video_etag,
+            "Content-Type": "video/mp4",
+        }
+
+        try:
+            byte_range = parse_range(request.headers.get("range"), total)
+        except ValueError:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{total}"})
+
+        if byte_range is None:
+            body = video_content
+            status_code = 200
+        else:
+            start, end = byte_range
+            body = video_content[start:end + 1]
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{total}"
+
+        headers["Content-Length"] = str(len(body))
+        if request.method == "HEAD":
+            body = b""
+        return Response(content=body, status_code=status_code, headers=headers)
+
+    @app.get("/_standin/stats")
+    async def get_stats():
+        """替身服务自身的统计（请求数、注入的错误数等）"""
+        return {**app.state.stats, "tasks": len(tasks)}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DyuAPI 本地替身服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--seed", type=int, default=None, help="随机种子")
+
+    # 状态推进
+    parser.add_argument("--complete-after", type=float, default=30.0, help="任务完成平均耗时（秒）")
+    parser.add_argument("--queue-sec", type=float, default=0.5, help="任务排队（pending）时长（秒）")
+    parser.add_argument("--duration-jitter", type=float, default=0.0, help="任务耗时浮动比例，如 0.2")
+    parser.add_argument("--task-failure-rate", type=float, default=0.0, help="任务生成失败比例")
+
+    # 接口故障注入
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="接口平均附加延迟（毫秒）")
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "exp"], default="fixed", help="延迟分布")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="接口返回500的比例")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="接口返回429的比例")
+
+    # 视频内容
+    parser.add_argument("--video-bytes", type=int, default=256 * 1024, help="生成的视频大小（字节）")
+    parser.add_argument("--video-file", default=None, help="使用真实MP4文件作为视频内容")
+
+    # 回调
+    parser.add_argument("--webhook-secret", default=None, help="回调签名密钥（设置后发送回调）")
+    parser.add_argument("--callback-interval", type=float, default=5.0, help="进度回调间隔（秒）")
+    parser.add_argument("--duplicate-callbacks", action="store_true", help="重复发送完成回调")
+    args = parser.parse_args()
+
+    import uvicorn
+    app = create_app(
+        complete_after_sec=args.complete_after,
+        webhook_secret=args.webhook_secret,
+        callback_interval_sec=args.callback_interval,
+        duplicate_callbacks=args.duplicate_callbacks,
+        queue_sec=args.queue_sec,
+        duration_jitter=args.duration_jitter,
+        task_failure_rate=args.task_failure_rate,
+        latency_ms=args.latency_ms,
+        latency_dist=args.latency_dist,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        video_bytes=args.video_bytes,
+        video_file=args.video_file,
+        seed=args.seed
+    )
+    print(f"🧪 DyuAPI stand-in on http://{args.host}:{args.port}")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
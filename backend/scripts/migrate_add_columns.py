@@ -0,0 +1,65 @@
+"""
+为已有数据库补齐新增的列和索引
+init_db() 的 create_all 只会创建缺失的表，不会给已存在的表加列，升级后执行一次本脚本
+
+用法：
+    python scripts/migrate_add_columns.py
+"""
+import sqlite3
+import os
+
+DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'skyriff.db')
+
+# (表名, 列名, 列定义)
+NEW_COLUMNS = [
+    ('tasks', 'next_poll_at', 'DATETIME'),
+    ('tasks', 'eta_at', 'DATETIME'),
+    ('tasks', 'last_callback_at', 'DATETIME'),
+    ('tasks', 'submit_key', 'VARCHAR(64)'),
+    ('tasks', 'submit_attempts', 'INTEGER DEFAULT 0'),
+    ('tasks', 'submit_lease_until', 'DATETIME'),
+    ('tasks', 'batch_id', 'VARCHAR(32)'),
+    ('video_assets', 'source_play_url', 'VARCHAR(500)'),
+    ('video_assets', 'cache_status', "VARCHAR(20) DEFAULT 'NONE'"),
+    ('video_assets', 'cache_sha256', 'VARCHAR(64)'),
+    ('video_assets', 'cached_at', 'DATETIME'),
+    ('video_assets', 'cache_last_access_at', 'DATETIME'),
+    ('video_assets', 'cache_hits', 'INTEGER DEFAULT 0'),
+    ('media_assets', 'sha256', 'VARCHAR(64)'),
+    ('media_assets', 'blob_sha256', 'VARCHAR(64)'),
+]
+
+# (索引名, 表名, 列)
+NEW_INDEXES = [
+    ('idx_tasks_status_next_poll', 'tasks', 'status, next_poll_at'),
+    ('idx_tasks_status_submit_lease', 'tasks', 'status, submit_lease_until'),
+    ('idx_tasks_status_started', 'tasks', 'status, started_at'),
+    ('idx_tasks_source', 'tasks', 'source_type, source_id'),
+    ('idx_tasks_batch', 'tasks', 'batch_id'),
+    ('idx_video_assets_cache', 'video_assets', 'cache_status, cache_last_access_at'),
+    ('idx_media_assets_blob', 'media_assets', 'blob_sha256'),
+]
+
+
+def has_column(conn, table, column):
+    cur = conn.execute(f'PRAGMA table_info({table})')
+    return any(row[1] == column for row in cur.fetchall())
+
+
+def main():
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        for table, column, ddl in NEW_COLUMNS:
+            if not has_column(conn, table, column):
+                conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}')
+                print(f'+ {table}.{column}')
+        for name, table, columns in NEW_INDEXES:
+            conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})')
+        conn.commit()
+        print('OK')
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""
+单元测试公共配置
+导入 app 之前把数据库和上传目录指向临时目录，测试不依赖运行中的服务和本地 skyriff.db
+（test_phase0 / test_phase1 是对运行中服务的手动测试脚本，不在此列）
+"""
+import os
+import tempfile
+
+_TEST_DIR = tempfile.mkdtemp(prefix="skyriff-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TEST_DIR, 'test.db')}"
+os.environ["UPLOAD_DIR"] = os.path.join(_TEST_DIR, "uploads")
+os.environ["DEBUG"] = "false"
+os.environ["BACKGROUND_WORKERS_ENABLED"] = "false"
+os.environ["IMAGE_PROCESS_WORKERS"] = "0"
+
+import pytest
+from app.core.config import settings
+from app.db.database import Base, SessionLocal, engine
+
+
+@pytest.fixture(scope="session")
+def schema():
+    """创建所有表（整个测试会话一次）"""
+    from app.db import models  # noqa: F401  导入所有模型
+    Base.metadata.create_all(bind=engine)
+    yield
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    """每个测试使用独立的上传目录"""
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    return str(tmp_path)
+
+
+@pytest.fixture
+def db(schema, upload_dir):
+    """数据库会话，测试结束后清空所有表"""
+    session = SessionLocal()
+    yield session
+    session.close()
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
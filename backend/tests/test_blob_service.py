@@ -0,0 +1,118 @@
+"""
+内容寻址存储的引用计数测试
+覆盖引用归零与新引用并发、删除中断后停在 -1 的存储块恢复
+"""
+import os
+import uuid
+import asyncio
+import hashlib
+from datetime import datetime, timedelta
+import pytest
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import MediaBlob
+from app.services import blob_service
+from app.services.blob_service import BlobService, blob_file_path, derived_dir
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr(blob_service, "ACQUIRE_RETRY_DELAY_SEC", 0)
+
+
+async def acquire(db, content: bytes) -> MediaBlob:
+    """写入临时文件并纳入存储（与上传流程相同）"""
+    # 每次上传是独立的请求，不沿用会话中已加载的存储块
+    db.expunge_all()
+    temp_path = os.path.join(settings.UPLOAD_DIR, f"{uuid.uuid4().hex}.upload")
+    with open(temp_path, "wb") as f:
+        f.write(content)
+    return await BlobService(db).acquire(hashlib.sha256(content).hexdigest(), temp_path, len(content), "image/png")
+
+
+def ref_count(db, sha256: str):
+    db.expire_all()
+    blob = db.get(MediaBlob, sha256)
+    return blob.ref_count if blob else None
+
+
+@pytest.mark.asyncio
+async def test_same_content_is_stored_once(db):
+    first = await acquire(db, b"same")
+    second = await acquire(db, b"same")
+
+    assert first.sha256 == second.sha256
+    assert ref_count(db, first.sha256) == 2
+    assert os.listdir(settings.UPLOAD_DIR) == ["blobs"]
+
+
+@pytest.mark.asyncio
+async def test_acquire_before_release_claims_keeps_blob(db):
+    blob = await acquire(db, b"content")
+    await acquire(db, b"content")
+
+    assert BlobService(db).release(blob.sha256) is False
+    assert ref_count(db, blob.sha256) == 1
+    assert os.path.exists(blob_file_path(blob.storage_path))
+
+
+@pytest.mark.asyncio
+async def test_acquire_waits_for_release_to_zero(db, monkeypatch):
+    blob = await acquire(db, b"content")
+    sha256, path = blob.sha256, blob_file_path(blob.storage_path)
+
+    # 引用归零、已抢占为 -1，删除文件前暂停
+    remove = BlobService._remove
+    pending = []
+    monkeypatch.setattr(BlobService, "_remove", lambda self, sha256: pending.append(sha256))
+    assert BlobService(db).release(sha256) is True
+    assert ref_count(db, sha256) == -1
+
+    # 另一个进程上传相同内容：不能引用正在删除的存储块，等删除完成后重新创建
+    other = SessionLocal()
+    try:
+        task = asyncio.ensure_future(acquire(other, b"content"))
+        await asyncio.sleep(0)
+        assert not task.done()
+
+        remove(BlobService(db), pending.pop())
+        reacquired = await task
+    finally:
+        other.close()
+
+    assert reacquired.ref_count == 1
+    assert ref_count(db, sha256) == 1
+    with open(path, "rb") as f:
+        assert f.read() == b"content"
+
+
+@pytest.mark.asyncio
+async def test_fresh_deleting_blob_is_not_taken_over(db, monkeypatch):
+    sha256 = (await acquire(db, b"content")).sha256
+    monkeypatch.setattr(BlobService, "_remove", lambda self, sha256: None)
+    BlobService(db).release(sha256)
+
+    with pytest.raises(ValueError):
+        await acquire(db, b"content")
+    assert ref_count(db, sha256) == -1
+
+
+@pytest.mark.asyncio
+async def test_stale_deleting_blob_is_recovered(db):
+    sha256 = (await acquire(db, b"content")).sha256
+    derived = derived_dir(sha256)
+    os.makedirs(derived)
+
+    # 删除进程在抢占 -1 之后中断：行和文件都还在
+    db.query(MediaBlob).filter(MediaBlob.sha256 == sha256).update({
+        "ref_count": -1,
+        "updated_at": datetime.utcnow() - timedelta(seconds=blob_service.DELETING_STALE_SEC + 1)
+    })
+    db.commit()
+
+    reacquired = await acquire(db, b"content")
+
+    assert reacquired.ref_count == 1
+    assert ref_count(db, sha256) == 1
+    assert os.path.exists(blob_file_path(reacquired.storage_path))
+    assert not os.path.exists(derived)
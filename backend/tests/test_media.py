@@ -0,0 +1,111 @@
+"""
+媒体文件 Range 响应测试
+覆盖 Range 头解析、If-Range 校验，以及 RangeFileResponse 的 206 / 416 / 304 响应
+"""
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from app.core.media import RangeFileResponse, RangeNotSatisfiable, if_range_matches, parse_range
+
+SIZE = 1000
+CONTENT = bytes(range(256)) * 3 + bytes(range(232))
+ETAG = '"v1"'
+LAST_MODIFIED = "Wed, 01 Jan 2026 00:00:00 GMT"
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, SIZE - 1)),                 # 开放区间
+    ("bytes=900-5000", (900, SIZE - 1)),             # 终点超出按文件末尾截断
+    ("bytes=-100", (SIZE - 100, SIZE - 1)),          # 后缀区间：最后 100 字节
+    ("bytes=-5000", (0, SIZE - 1)),                  # 后缀超过文件大小：整个文件
+    ("bytes=0-1,5-6", None),                         # 多区间按完整内容响应
+    ("bytes=200-100", None),                         # 终点小于起点视为无效
+    ("items=0-1", None),
+    ("bytes=abc", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, SIZE) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=5000-6000", "bytes=-0"])
+def test_parse_range_unsatisfiable(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, SIZE)
+
+
+@pytest.mark.parametrize("if_range, expected", [
+    (None, True),
+    (ETAG, True),
+    ('"v2"', False),
+    ('W/"v1"', False),                               # 弱 ETag 不能用于 If-Range
+    (LAST_MODIFIED, True),
+    ("Thu, 02 Jan 2026 00:00:00 GMT", False),
+])
+def test_if_range_matches(if_range, expected):
+    assert if_range_matches(if_range, ETAG, LAST_MODIFIED) is expected
+
+
+@pytest.fixture
+def client(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(CONTENT)
+
+    async def endpoint(request):
+        return RangeFileResponse(str(path), media_type="video/mp4", etag=ETAG)
+
+    return TestClient(Starlette(routes=[Route("/video", endpoint)]))
+
+
+def test_full_response(client):
+    response = client.get("/video")
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["etag"] == ETAG
+
+
+@pytest.mark.parametrize("header, start, end", [
+    ("bytes=10-19", 10, 19),
+    ("bytes=990-", 990, SIZE - 1),
+    ("bytes=-10", SIZE - 10, SIZE - 1),
+])
+def test_range_response(client, header, start, end):
+    response = client.get("/video", headers={"Range": header})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes {start}-{end}/{SIZE}"
+    assert response.headers["content-length"] == str(end - start + 1)
+    assert response.content == CONTENT[start:end + 1]
+
+
+def test_unsatisfiable_range(client):
+    response = client.get("/video", headers={"Range": "bytes=1000-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{SIZE}"
+    assert response.content == b""
+
+
+def test_multi_range_returns_full_content(client):
+    response = client.get("/video", headers={"Range": "bytes=0-1,5-6"})
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+
+def test_if_range_match_returns_partial(client):
+    response = client.get("/video", headers={"Range": "bytes=0-9", "If-Range": ETAG})
+    assert response.status_code == 206
+    assert response.content == CONTENT[:10]
+
+
+def test_if_range_mismatch_returns_full_content(client):
+    response = client.get("/video", headers={"Range": "bytes=0-9", "If-Range": '"v0"'})
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+
+def test_if_none_match_returns_304(client):
+    response = client.get("/video", headers={"If-None-Match": ETAG})
+    assert response.status_code == 304
+    assert response.content == b""
@@ -0,0 +1,83 @@
+"""
+视频播放/下载签名地址测试
+覆盖签名校验（过期、篡改、换视频、换用户）和 AuthMiddleware 对签名地址的解析
+"""
+import time
+from urllib.parse import urlencode
+import pytest
+from app.core.auth import resolve_principal
+from app.core.config import settings
+from app.core.security import sign_media_url, verify_media_signature
+
+VIDEO_ID = 42
+USER_ID = 7
+
+
+def test_valid_signature():
+    exp, sig = sign_media_url(VIDEO_ID, USER_ID)
+    assert exp > time.time()
+    assert verify_media_signature(VIDEO_ID, USER_ID, exp, sig)
+
+
+def test_expired_signature():
+    exp, sig = sign_media_url(VIDEO_ID, USER_ID, expires_at=int(time.time()) - 1)
+    assert not verify_media_signature(VIDEO_ID, USER_ID, exp, sig)
+
+
+def test_tampered_signature():
+    exp, sig = sign_media_url(VIDEO_ID, USER_ID)
+    tampered = ("A" if sig[0] != "A" else "B") + sig[1:]
+    assert not verify_media_signature(VIDEO_ID, USER_ID, exp, tampered)
+
+
+def test_extended_expiry_is_rejected():
+    exp, sig = sign_media_url(VIDEO_ID, USER_ID)
+    assert not verify_media_signature(VIDEO_ID, USER_ID, exp + 3600, sig)
+
+
+def test_wrong_video_or_user_is_rejected():
+    exp, sig = sign_media_url(VIDEO_ID, USER_ID)
+    assert not verify_media_signature(VIDEO_ID + 1, USER_ID, exp, sig)
+    assert not verify_media_signature(VIDEO_ID, USER_ID + 1, exp, sig)
+
+
+def test_same_window_gives_same_url(monkeypatch):
+    step = settings.MEDIA_URL_EXPIRY_STEP_SEC
+    monkeypatch.setattr(time, "time", lambda: 1_000_000 * step + 1)
+    first = sign_media_url(VIDEO_ID, USER_ID)
+    monkeypatch.setattr(time, "time", lambda: 1_000_000 * step + step - 1)
+    assert sign_media_url(VIDEO_ID, USER_ID) == first
+
+
+def scope(path: str, **query) -> dict:
+    return {"type": "http", "path": path, "query_string": urlencode(query).encode(), "headers": []}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("action", ["stream", "download"])
+async def test_middleware_accepts_signed_url(action):
+    exp, sig = sign_media_url(VIDEO_ID, USER_ID)
+    principal = await resolve_principal(scope(f"/api/v1/assets/videos/{VIDEO_ID}/{action}", uid=USER_ID, exp=exp, sig=sig))
+    assert principal.user_id == USER_ID
+    assert principal.source == "signed"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path, uid_offset, exp_offset", [
+    (f"/api/v1/assets/videos/{VIDEO_ID + 1}/stream", 0, 0),    # 签名用于另一个视频
+    (f"/api/v1/assets/videos/{VIDEO_ID}/stream", 1, 0),        # 改成其他用户
+    (f"/api/v1/assets/videos/{VIDEO_ID}/stream", 0, 600),      # 延长有效期
+    (f"/api/v1/assets/videos/{VIDEO_ID}", 0, 0),               # 签名只对播放/下载地址有效
+])
+async def test_middleware_rejects_misused_signature(path, uid_offset, exp_offset):
+    exp, sig = sign_media_url(VIDEO_ID, USER_ID)
+    principal = await resolve_principal(scope(path, uid=USER_ID + uid_offset, exp=exp + exp_offset, sig=sig))
+    assert principal.user_id is None
+    assert principal.error == "bad_signature"
+
+
+@pytest.mark.asyncio
+async def test_middleware_rejects_expired_signature():
+    exp, sig = sign_media_url(VIDEO_ID, USER_ID, expires_at=int(time.time()) - 1)
+    principal = await resolve_principal(scope(f"/api/v1/assets/videos/{VIDEO_ID}/stream", uid=USER_ID, exp=exp, sig=sig))
+    assert principal.error == "bad_signature"
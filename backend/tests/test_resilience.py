@@ -0,0 +1,265 @@
+"""
+供应商调用容错测试
+熔断器状态机、重试的次数和总耗时上限、对冲请求；时间由假时钟控制
+"""
+import asyncio
+from types import SimpleNamespace
+import httpx
+import pytest
+from app.vendors import resilience
+from app.vendors.resilience import (
+    STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN,
+    CircuitBreaker, CircuitOpenError, call_with_retry, hedged
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float) -> None:
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(resilience, "time", SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+def status_error(status: int, headers: dict = None) -> httpx.HTTPStatusError:
+    request = httpx.Request("GET", "https://vendor.test/v1/tasks")
+    response = httpx.Response(status, headers=headers, request=request)
+    return httpx.HTTPStatusError(f"HTTP {status}", request=request, response=response)
+
+
+def fails_with(exc: BaseException):
+    async def func():
+        raise exc
+    return func
+
+
+async def ok():
+    return "ok"
+
+
+async def trip(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.failure_threshold):
+        with pytest.raises(httpx.HTTPStatusError):
+            await breaker.call(fails_with(status_error(503)))
+
+
+# ==================== 熔断器 ====================
+
+@pytest.mark.asyncio
+async def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout_sec=30)
+    for _ in range(2):
+        with pytest.raises(httpx.HTTPStatusError):
+            await breaker.call(fails_with(status_error(500)))
+    assert breaker.state == STATE_CLOSED
+
+    with pytest.raises(httpx.ConnectError):
+        await breaker.call(fails_with(httpx.ConnectError("refused")))
+    assert breaker.state == STATE_OPEN
+
+    clock.now += 10
+    with pytest.raises(CircuitOpenError) as info:
+        await breaker.call(ok)
+    assert info.value.retry_after == pytest.approx(20)
+
+
+@pytest.mark.asyncio
+async def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3)
+    for _ in range(2):
+        with pytest.raises(httpx.HTTPStatusError):
+            await breaker.call(fails_with(status_error(502)))
+    await breaker.call(ok)
+    with pytest.raises(httpx.HTTPStatusError):
+        await breaker.call(fails_with(status_error(502)))
+    assert breaker.state == STATE_CLOSED
+
+
+@pytest.mark.asyncio
+async def test_client_errors_do_not_open_breaker(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2)
+    for status in (400, 404, 429):
+        with pytest.raises(httpx.HTTPStatusError):
+            await breaker.call(fails_with(status_error(status)))
+    assert breaker.state == STATE_CLOSED
+    assert breaker.failures == 0
+
+
+@pytest.mark.asyncio
+async def test_half_open_allows_limited_probes(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout_sec=30, half_open_max_calls=1)
+    await trip(breaker)
+    clock.now += 30
+
+    probe_started, release = asyncio.Event(), asyncio.Event()
+
+    async def slow_probe():
+        probe_started.set()
+        await release.wait()
+        return "ok"
+
+    probe = asyncio.ensure_future(breaker.call(slow_probe))
+    await probe_started.wait()
+    assert breaker.state == STATE_HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(ok)
+
+    release.set()
+    assert await probe == "ok"
+    assert breaker.state == STATE_CLOSED
+
+
+@pytest.mark.asyncio
+async def test_failed_probe_reopens_breaker(clock):
+    breaker = CircuitBreaker("test", failure_threshold=5, reset_timeout_sec=30)
+    await trip(breaker)
+    clock.now += 30
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await breaker.call(fails_with(status_error(503)))
+    assert breaker.state == STATE_OPEN
+    assert breaker.opened_at == clock.now
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(ok)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_returns_slot(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout_sec=30)
+    await trip(breaker)
+    clock.now += 30
+
+    probe = asyncio.ensure_future(breaker.call(lambda: asyncio.Event().wait()))
+    await asyncio.sleep(0)
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+
+    assert breaker.state == STATE_HALF_OPEN
+    assert await breaker.call(ok) == "ok"
+    assert breaker.state == STATE_CLOSED
+
+
+# ==================== 重试 ====================
+
+@pytest.fixture
+def retry_clock(clock, monkeypatch):
+    """重试等待由假时钟推进，退避固定为 1 秒"""
+    monkeypatch.setattr(resilience, "asyncio", SimpleNamespace(sleep=clock.sleep))
+    monkeypatch.setattr(resilience, "backoff_delay", lambda attempt, base, max_delay: 1.0)
+    return clock
+
+
+def flaky(errors, clock, cost: float = 0.0):
+    """依次抛出 errors 中的异常，之后成功；每次调用耗时 cost 秒"""
+    calls = []
+
+    async def func():
+        calls.append(clock.now)
+        clock.now += cost
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return "ok"
+    return func, calls
+
+
+async def retry(func, attempts=5, deadline_sec=60.0):
+    return await call_with_retry(func, "test", attempts=attempts, base_delay=0.5, max_delay=5.0, deadline_sec=deadline_sec)
+
+
+@pytest.mark.asyncio
+async def test_retry_until_success(retry_clock):
+    func, calls = flaky([status_error(503), httpx.ReadTimeout("slow")], retry_clock)
+    assert await retry(func) == "ok"
+    assert len(calls) == 3
+    assert retry_clock.sleeps == [1.0, 1.0]
+
+
+@pytest.mark.asyncio
+async def test_retry_stops_after_max_attempts(retry_clock):
+    func, calls = flaky([status_error(503)] * 10, retry_clock)
+    with pytest.raises(httpx.HTTPStatusError):
+        await retry(func, attempts=3)
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("error", [status_error(400), CircuitOpenError("test", 10)])
+async def test_non_retryable_errors_raise_immediately(retry_clock, error):
+    func, calls = flaky([error], retry_clock)
+    with pytest.raises(type(error)):
+        await retry(func)
+    assert len(calls) == 1
+    assert retry_clock.sleeps == []
+
+
+@pytest.mark.asyncio
+async def test_retry_stops_before_deadline(retry_clock):
+    # 每次请求 0.5 秒 + 退避 1 秒：第二次失败时 2.0 + 1.0 超过 2.5 秒上限，不再等待
+    func, calls = flaky([status_error(503)] * 10, retry_clock, cost=0.5)
+    with pytest.raises(httpx.HTTPStatusError):
+        await retry(func, deadline_sec=2.5)
+    assert len(calls) == 2
+    assert retry_clock.sleeps == [1.0]
+
+
+@pytest.mark.asyncio
+async def test_retry_after_header_extends_delay(retry_clock):
+    func, calls = flaky([status_error(429, {"Retry-After": "3"})], retry_clock)
+    assert await retry(func) == "ok"
+    assert retry_clock.sleeps == [3.0]
+
+
+# ==================== 对冲 ====================
+
+def slow_then_fast():
+    """第一次调用一直挂起，之后的调用立即返回"""
+    calls = []
+    release = asyncio.Event()
+
+    async def func():
+        calls.append(len(calls))
+        if len(calls) == 1:
+            await release.wait()
+            return "primary"
+        return "hedge"
+    return func, calls, release
+
+
+@pytest.mark.asyncio
+async def test_fast_primary_is_not_hedged():
+    calls = []
+
+    async def func():
+        calls.append(1)
+        return "primary"
+
+    assert await hedged(func, "test", delay_sec=1.0) == "primary"
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_slow_primary_is_hedged():
+    func, calls, _ = slow_then_fast()
+    assert await hedged(func, "test", delay_sec=0.01) == "hedge"
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_hedge_skipped_when_not_allowed():
+    func, calls, release = slow_then_fast()
+    asyncio.get_running_loop().call_later(0.05, release.set)
+    assert await hedged(func, "test", delay_sec=0.01, allow=lambda: False) == "primary"
+    assert len(calls) == 1
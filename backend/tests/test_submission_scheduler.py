@@ -0,0 +1,191 @@
+"""
+供应商提交调度器测试
+覆盖令牌桶补充、按用户公平排队、优先通道防饿死和排队超时；令牌桶时间由假时钟控制
+"""
+import asyncio
+from types import SimpleNamespace
+import pytest
+from app.workers import submission_scheduler as scheduler_module
+from app.workers.submission_scheduler import (
+    LANE_PRIORITY, LANE_STANDARD,
+    FairQueue, SubmissionQueueTimeout, SubmissionScheduler, TokenBucket
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float) -> None:
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(scheduler_module, "time", SimpleNamespace(monotonic=clock.monotonic))
+    monkeypatch.setattr(scheduler_module, "asyncio", SimpleNamespace(sleep=clock.sleep))
+    return clock
+
+
+def waiters(count: int, name: str) -> list:
+    """带名字的 Future，便于断言出队顺序"""
+    loop = asyncio.get_running_loop()
+    futures = []
+    for i in range(count):
+        future = loop.create_future()
+        future.name = f"{name}{i}"
+        futures.append(future)
+    return futures
+
+
+def drain(pop) -> list:
+    order = []
+    while (waiter := pop()) is not None:
+        order.append(waiter.name)
+    return order
+
+
+# ==================== 令牌桶 ====================
+
+@pytest.mark.asyncio
+async def test_bucket_allows_burst_then_waits(clock):
+    bucket = TokenBucket(rate_per_sec=2, burst=2)
+    await bucket.take()
+    await bucket.take()
+    assert clock.sleeps == []
+
+    await bucket.take()
+    assert clock.sleeps == [pytest.approx(0.5)]
+
+
+@pytest.mark.asyncio
+async def test_bucket_refills_up_to_capacity(clock):
+    bucket = TokenBucket(rate_per_sec=2, burst=3)
+    for _ in range(3):
+        await bucket.take()
+
+    clock.now += 1.0
+    bucket._refill()
+    assert bucket.tokens == pytest.approx(2)
+
+    clock.now += 60
+    bucket._refill()
+    assert bucket.tokens == 3
+
+
+@pytest.mark.asyncio
+async def test_give_back_returns_token(clock):
+    bucket = TokenBucket(rate_per_sec=1, burst=1)
+    await bucket.take()
+    bucket.give_back()
+    await bucket.take()
+    assert clock.sleeps == []
+
+
+# ==================== 公平队列 ====================
+
+@pytest.mark.asyncio
+async def test_burst_from_one_user_does_not_starve_another():
+    queue = FairQueue()
+    for waiter in waiters(4, "a"):
+        queue.push(1, waiter)
+    for waiter in waiters(2, "b"):
+        queue.push(2, waiter)
+
+    assert drain(queue.pop) == ["a0", "b0", "a1", "b1", "a2", "a3"]
+
+
+@pytest.mark.asyncio
+async def test_late_user_is_not_queued_behind_backlog():
+    queue = FairQueue()
+    for waiter in waiters(3, "a"):
+        queue.push(1, waiter)
+    assert queue.pop().name == "a0"
+
+    # 后到的用户从当前虚拟时钟开始排，不需要等用户 1 的积压全部处理完
+    late, = waiters(1, "b")
+    queue.push(2, late)
+    assert drain(queue.pop) == ["a1", "b0", "a2"]
+
+
+@pytest.mark.asyncio
+async def test_weight_gives_larger_share():
+    queue = FairQueue()
+    for waiter in waiters(4, "a"):
+        queue.push(1, waiter, weight=2.0)
+    for waiter in waiters(2, "b"):
+        queue.push(2, waiter)
+
+    assert drain(queue.pop) == ["a0", "a1", "b0", "a2", "a3", "b1"]
+
+
+@pytest.mark.asyncio
+async def test_pop_skips_abandoned_waiters():
+    queue = FairQueue()
+    first, second = waiters(2, "a")
+    queue.push(1, first)
+    queue.push(1, second)
+    first.cancel()
+
+    assert queue.pop() is second
+    assert queue.pop() is None
+    assert len(queue) == 0
+    assert queue._last_finish == {}
+
+
+# ==================== 优先通道 ====================
+
+@pytest.mark.asyncio
+async def test_priority_lane_yields_after_burst():
+    scheduler = SubmissionScheduler(rate_per_sec=1, burst=1, priority_burst=2)
+    for i, waiter in enumerate(waiters(5, "p")):
+        scheduler.lanes[LANE_PRIORITY].push(i, waiter)
+    for i, waiter in enumerate(waiters(2, "s")):
+        scheduler.lanes[LANE_STANDARD].push(i, waiter)
+
+    assert drain(scheduler._next_waiter) == ["p0", "p1", "s0", "p2", "p3", "s1", "p4"]
+
+
+@pytest.mark.asyncio
+async def test_standard_lane_served_when_priority_empty():
+    scheduler = SubmissionScheduler(rate_per_sec=1, burst=1, priority_burst=2)
+    for i, waiter in enumerate(waiters(2, "s")):
+        scheduler.lanes[LANE_STANDARD].push(i, waiter)
+    assert scheduler._next_waiter().name == "s0"
+
+    # 普通请求放行后重新计数，优先请求可以再连续放行 priority_burst 个
+    for i, waiter in enumerate(waiters(3, "p")):
+        scheduler.lanes[LANE_PRIORITY].push(i, waiter)
+    assert drain(scheduler._next_waiter) == ["p0", "p1", "s1", "p2"]
+
+
+@pytest.mark.asyncio
+async def test_abandoned_standard_waiter_does_not_reset_streak():
+    scheduler = SubmissionScheduler(rate_per_sec=1, burst=1, priority_burst=1)
+    for i, waiter in enumerate(waiters(3, "p")):
+        scheduler.lanes[LANE_PRIORITY].push(i, waiter)
+    abandoned, = waiters(1, "s")
+    scheduler.lanes[LANE_STANDARD].push(0, abandoned)
+    abandoned.cancel()
+
+    assert drain(scheduler._next_waiter) == ["p0", "p1", "p2"]
+
+
+# ==================== 排队 ====================
+
+@pytest.mark.asyncio
+async def test_acquire_times_out_without_token():
+    scheduler = SubmissionScheduler(rate_per_sec=0.001, burst=1)
+    try:
+        await scheduler.acquire(1, timeout=1)
+        with pytest.raises(SubmissionQueueTimeout):
+            await scheduler.acquire(1, timeout=0.05)
+        assert scheduler.depth() == 1
+    finally:
+        await scheduler.stop()
@@ -0,0 +1,43 @@
+"""
+任务剩余耗时预测测试
+历史耗时固定为 p50=100 秒、p90=200 秒
+"""
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import pytest
+from app.services.task_schedule_service import TaskScheduleService
+
+NOW = datetime(2026, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    service = TaskScheduleService(db=None)
+    monkeypatch.setattr(service, "get_duration_stats", lambda model, duration_sec: (100.0, 200.0))
+    return service
+
+
+def remaining(service, elapsed: float, progress: int) -> float:
+    task = SimpleNamespace(
+        model="sora2", duration_sec=10, progress=progress,
+        started_at=NOW - timedelta(seconds=elapsed)
+    )
+    return service.estimate_remaining(task, NOW)
+
+
+@pytest.mark.parametrize("elapsed, progress, expected", [
+    (0, 0, 100.0),       # 未开始：历史中位耗时
+    (30, 0, 70.0),       # 无进度：只按历史
+    (50, 50, 50.0),      # 进度和历史一致
+    (20, 50, 50.0),      # 比历史快：进度估计 20 秒，历史 80 秒各占一半
+    (80, 50, 50.0),      # 比历史慢：进度估计 80 秒，历史 20 秒各占一半
+    (60, 20, 80.0),      # 进度低时主要信任历史：0.2 × 240 + 0.8 × 40
+    (90, 90, 10.0),      # 进度高：0.9 × 10 + 0.1 × 10
+    (150, 50, 100.0),    # 超过 p50 改用 p90：0.5 × 150 + 0.5 × 50
+])
+def test_estimate_remaining(service, elapsed, progress, expected):
+    assert remaining(service, elapsed, progress) == pytest.approx(expected)
+
+
+def test_estimate_remaining_is_never_negative(service):
+    assert remaining(service, 250, 0) == 0.0
@@ -0,0 +1,100 @@
+"""
+分块上传会话接口测试
+覆盖偏移不一致返回 409、重复完成返回同一资产、过期会话清理
+"""
+import io
+import os
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+from app.api.dependencies import get_current_user
+from app.db.models import MediaBlob, UploadSession
+from app.main import app
+from app.services import upload_service
+from app.workers.upload_session_sweeper import UploadSessionSweeper
+
+USER_ID = 1
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    """不触发启动事件（后台任务、建表）的测试客户端，登录用户固定为 USER_ID"""
+    monkeypatch.setattr(upload_service, "schedule_thumbnails", lambda sha256, path: None)
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(user_id=USER_ID)
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def png_bytes() -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (16, 16), (200, 30, 30)).save(buf, "PNG")
+    return buf.getvalue()
+
+
+def create_session(client, content: bytes) -> str:
+    response = client.post("/api/v1/assets/media/uploads", json={
+        "filename": "a.png", "mime_type": "image/png", "total_bytes": len(content)
+    })
+    assert response.status_code == 200
+    return response.json()["data"]["upload_id"]
+
+
+def test_offset_mismatch_returns_409(client):
+    content = png_bytes()
+    upload_id = create_session(client, content)
+    url = f"/api/v1/assets/media/uploads/{upload_id}"
+
+    response = client.patch(url, headers={"Upload-Offset": "0"}, content=content[:10])
+    assert response.json()["data"]["offset"] == 10
+
+    # 重发已确认的分块
+    response = client.patch(url, headers={"Upload-Offset": "0"}, content=content[:10])
+    assert response.status_code == 409
+    assert response.headers["Upload-Offset"] == "10"
+
+    # 跳过未上传的部分
+    response = client.patch(url, headers={"Upload-Offset": "20"}, content=content[20:])
+    assert response.status_code == 409
+    assert response.headers["Upload-Offset"] == "10"
+
+    assert client.get(url).json()["data"]["offset"] == 10
+
+
+def test_repeated_complete_returns_same_asset(client, db):
+    content = png_bytes()
+    upload_id = create_session(client, content)
+    url = f"/api/v1/assets/media/uploads/{upload_id}"
+    client.patch(url, headers={"Upload-Offset": "0"}, content=content)
+
+    first = client.post(f"{url}/complete")
+    second = client.post(f"{url}/complete")
+
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert first.json()["data"]["asset_id"] == second.json()["data"]["asset_id"]
+    assert db.get(UploadSession, upload_id).status == "COMPLETED"
+    assert db.query(MediaBlob).one().ref_count == 1
+
+
+def test_sweep_purges_only_expired_uploading_sessions(client, db):
+    content = png_bytes()
+    uploading, finalizing, completed = (create_session(client, content) for _ in range(3))
+    for upload_id in (uploading, finalizing, completed):
+        client.patch(f"/api/v1/assets/media/uploads/{upload_id}", headers={"Upload-Offset": "0"}, content=content)
+    asset_id = client.post(f"/api/v1/assets/media/uploads/{completed}/complete").json()["data"]["asset_id"]
+    db.query(UploadSession).filter(UploadSession.upload_id == finalizing).update({"status": "FINALIZING"})
+    db.query(UploadSession).update({"expires_at": datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+
+    assert UploadSessionSweeper().sweep() == 1
+
+    db.expire_all()
+    assert db.get(UploadSession, uploading) is None
+    assert not os.path.exists(upload_service.UploadService(db)._part_path(uploading))
+    assert db.get(UploadSession, finalizing).status == "FINALIZING"
+    # 过期后重复完成仍返回同一资产
+    response = client.post(f"/api/v1/assets/media/uploads/{completed}/complete")
+    assert response.status_code == 200
+    assert response.json()["data"]["asset_id"] == asset_id
@@ -0,0 +1,65 @@
+"""
+用户资料接口测试
+覆盖用已上传图片设置头像（生成缩略图、只能使用自己的图片）
+"""
+import io
+import os
+from types import SimpleNamespace
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+from app.api.dependencies import get_current_user
+from app.db.models import User
+from app.main import app
+from app.services import upload_service
+from app.services.thumbnail_service import AVATAR_THUMBNAIL_SIZE, thumbnail_path
+
+USER_ID = 1
+OTHER_USER_ID = 2
+
+
+@pytest.fixture
+def login(db, monkeypatch):
+    """切换登录用户的测试客户端（不触发启动事件）"""
+    monkeypatch.setattr(upload_service, "schedule_thumbnails", lambda sha256, path: None)
+    db.add_all([User(user_id=USER_ID, nickname="a"), User(user_id=OTHER_USER_ID, nickname="b")])
+    db.commit()
+
+    def login(user_id: int) -> TestClient:
+        app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(user_id=user_id)
+        return TestClient(app)
+
+    yield login
+    app.dependency_overrides.clear()
+
+
+def upload_image(client) -> dict:
+    buf = io.BytesIO()
+    Image.new("RGB", (600, 400), (30, 120, 200)).save(buf, "PNG")
+    response = client.post("/api/v1/assets/media/upload", files={"file": ("a.png", buf.getvalue(), "image/png")})
+    assert response.status_code == 200
+    return response.json()["data"]
+
+
+def test_avatar_from_uploaded_image(login, db):
+    client = login(USER_ID)
+    media = upload_image(client)
+
+    response = client.patch("/api/v1/users/me", json={"avatar_asset_id": media["asset_id"]})
+
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["avatar_thumbnail_urls"] == media["thumbnail_urls"]
+    assert data["avatar_url"] == media["thumbnail_urls"][str(AVATAR_THUMBNAIL_SIZE)]
+    assert os.path.exists(thumbnail_path(media["sha256"], AVATAR_THUMBNAIL_SIZE, "webp"))
+    assert db.get(User, USER_ID).avatar_url == data["avatar_url"]
+
+
+@pytest.mark.parametrize("owner", [OTHER_USER_ID, None])
+def test_avatar_requires_own_image(login, db, owner):
+    asset_id = upload_image(login(owner))["asset_id"] if owner else 999
+
+    response = login(USER_ID).patch("/api/v1/users/me", json={"avatar_asset_id": asset_id})
+
+    assert response.status_code == 400
+    assert db.get(User, USER_ID).avatar_url is None
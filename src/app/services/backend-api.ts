@@ -151,7 +151,8 @@ export interface CreateTaskPayload {
 
 export interface TaskStatusResponse {
   task_id: number;
-  status: 'QUEUED' | 'IN_PROGRESS' | 'SUCCESS' | 'FAILURE';
+  batch_id?: string;
+  status: 'PENDING_SUBMIT' | 'QUEUED' | 'IN_PROGRESS' | 'SUCCESS' | 'FAILURE';
   progress: number;
   video_id?: number;
   error_message?: string;
@@ -204,10 +205,57 @@ export function getVideoDownloadUrl(videoId: number): string {
   return `${API_CONFIG.BASE_URL}/api/v1/assets/videos/${videoId}/download`;
 }
 
+// 签名播放/下载地址缓存（视频详情接口签发，播放时不需要在 URL 中携带 JWT）
+interface SignedVideoUrls {
+  streamUrl: string;
+  downloadUrl: string;
+  expiresAt: number;
+}
+const signedVideoUrls = new Map<string, SignedVideoUrls>();
+// 距过期不足该秒数时重新签发，避免播放中途过期
+const SIGNED_URL_REFRESH_MARGIN_SEC = 300;
+
+function getCachedSignedUrls(videoId: number | string): SignedVideoUrls | null {
+  const cached = signedVideoUrls.get(String(videoId));
+  if (cached && cached.expiresAt - SIGNED_URL_REFRESH_MARGIN_SEC > Date.now() / 1000) {
+    return cached;
+  }
+  return null;
+}
+
+/**
+ * 获取视频的签名播放/下载地址（带缓存）
+ */
+export async function getSignedVideoUrls(videoId: number | string): Promise<SignedVideoUrls> {
+  const cached = getCachedSignedUrls(videoId);
+  if (cached) return cached;
+
+  const detail = await getVideoAsset(Number(videoId));
+  const data = detail?.data;
+  if (!data?.stream_url) {
+    throw new Error('视频签名地址获取失败');
+  }
+  const urls = {
+    streamUrl: `${API_CONFIG.BASE_URL}${data.stream_url}`,
+    downloadUrl: `${API_CONFIG.BASE_URL}${data.download_url}`,
+    expiresAt: data.url_expires_at,
+  };
+  signedVideoUrls.set(String(videoId), urls);
+  return urls;
+}
+
 /**
  * 获取视频流播放链接（后端代理/本地缓存）
+ *
+ * 已签发过签名地址时直接使用；否则先返回旧的 token 地址，同时后台签发，下次渲染即切换到签名地址
  */
 export function getVideoStreamUrl(videoId: number | string): string {
+  const signed = getCachedSignedUrls(videoId);
+  if (signed) {
+    return signed.streamUrl;
+  }
+  getSignedVideoUrls(videoId).catch(() => {});
+
   // 注意：这个URL需要带上Authorization header才能访问，
   // 但 <video src="..."> 不支持自定义Header。
   // 解决方案：
@@ -239,9 +287,7 @@ export function getVideoStreamUrl(videoId: number | string): string {
  * 获取视频Blob对象URL（用于绕过浏览器跨域/ORB拦截）
  */
 export async function getVideoBlobUrl(videoId: number | string): Promise<string> {
-  const token = await getAuthToken();
-  const base = `${API_CONFIG.BASE_URL}/api/v1/assets/videos/${videoId}/stream`;
-  const url = token ? `${base}?token=${token}` : base;
+  const { streamUrl: url } = await getSignedVideoUrls(videoId);
   console.log('[Video Blob] Fetching', url);
   const resp = await fetch(url, {
     method: 'GET',